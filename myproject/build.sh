@@ -4,3 +4,7 @@ set -o errexit
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
 python manage.py migrate
+python manage.py load_gazetteer
+python manage.py backfill_salary_experience
+python manage.py backfill_skills
+python manage.py build_similar_jobs
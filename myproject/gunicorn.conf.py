@@ -0,0 +1,22 @@
+"""
+Gunicorn settings, read from the working directory.
+
+The app is loaded once in the master process, which builds the in-process
+search indexes before forking: every worker, including the ones started
+again after --max-requests, begins with them instead of building them in
+its first search request (see myapp/indexing.py).
+"""
+preload_app = True
+
+
+def when_ready(server):
+    from django.db import connections
+    from myapp import ranking, suggest, trigram
+
+    indexes = [suggest, ranking]
+    if not trigram.enabled_in_database():
+        indexes.append(trigram)
+    for module in indexes:
+        module.get_index()
+    # Workers must open their own database connections
+    connections.close_all()
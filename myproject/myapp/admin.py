@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserMaster, Company, Candidate, Job, JobApplication, SavedJob, JobAlert
+from .models import UserMaster, Company, Candidate, Job, JobApplication, SavedJob, JobAlert, JobAlertMatch, EmailOutbox, Location, LocationAlias, Skill
 
 @admin.register(UserMaster)
 class UserMasterAdmin(admin.ModelAdmin):
@@ -41,6 +41,34 @@ class SavedJobAdmin(admin.ModelAdmin):
 
 @admin.register(JobAlert)
 class JobAlertAdmin(admin.ModelAdmin):
-    list_display = ['candidate', 'keywords', 'location', 'job_type', 'is_active', 'created_at']
-    list_filter = ['is_active', 'job_type']
-    search_fields = ['candidate__first_name', 'keywords']
\ No newline at end of file
+    list_display = ['candidate', 'keywords', 'location', 'job_type', 'frequency', 'is_active', 'created_at']
+    list_filter = ['is_active', 'job_type', 'frequency']
+    search_fields = ['candidate__first_name', 'keywords']
+
+@admin.register(JobAlertMatch)
+class JobAlertMatchAdmin(admin.ModelAdmin):
+    list_display = ['alert', 'job', 'created_at', 'notified_at']
+    list_filter = ['created_at', 'notified_at']
+    search_fields = ['alert__keywords', 'job__title']
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to_email', 'created_at', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['created_at', 'sent_at']
+    search_fields = ['to_email', 'subject']
+
+class LocationAliasInline(admin.TabularInline):
+    model = LocationAlias
+    extra = 1
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'state', 'country', 'latitude', 'longitude']
+    list_filter = ['country']
+    search_fields = ['name', 'aliases__alias']
+    inlines = [LocationAliasInline]
+
+@admin.register(Skill)
+class SkillAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
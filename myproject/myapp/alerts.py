@@ -0,0 +1,161 @@
+"""
+Matching new jobs against candidates' job alerts.
+
+``JobAlert.keywords`` is a comma-separated list of alternatives, each a
+set of words that must all appear in the job's title, company, skills or
+description: "python django, golang" matches jobs mentioning both python
+and django, or golang. The alert's location and job type, when set, must
+match as well, and only jobs posted after the alert count.
+
+Rather than testing every alert against every job, an AlertIndex maps
+each keyword to the alert clauses containing it. A job's words are looked
+up and a clause matches once all of its words have been seen, so the work
+per job grows with the alerts it could satisfy rather than with the
+number of alerts.
+
+match_new_jobs() walks the active jobs saved since its last run in
+(updated_at, id) order and records matches in JobAlertMatch, where the
+digests pick them up. Going by updated_at rather than id, a job that is
+activated or edited later is matched then. Its position, the updated_at
+reached in microseconds, is kept in a Checkpoint saved in the same
+transaction as each batch's matches, so an interrupted run resumes where
+it stopped. Each run starts MATCH_OVERLAP before the checkpoint, because a
+save's updated_at is taken before its transaction commits: a job saved
+just before the checkpoint may only have become visible since. Jobs seen
+twice are skipped by the existing JobAlertMatch rows.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Q
+
+from .geo import normalize_place, resolve_location
+from .job_query import normalize_job_type
+from .models import Checkpoint, Job, JobAlert, JobAlertMatch
+from .search import tokenize
+
+CHECKPOINT = 'job_alerts'
+MATCH_OVERLAP = timedelta(minutes=5)
+MATCH_FIELDS = ('title', 'company_name', 'skills_required', 'description')
+
+
+def keyword_clauses(keywords):
+    """Word sets of the comma-separated alternatives in ``keywords``"""
+    clauses = []
+    for part in (keywords or '').split(','):
+        words = frozenset(tokenize(part))
+        if words and words not in clauses:
+            clauses.append(words)
+    return clauses
+
+
+class AlertIndex:
+    def __init__(self):
+        # word -> clause numbers containing it
+        self.postings = defaultdict(list)
+        # clause number -> (alert id, number of words)
+        self.clauses = []
+        # alert id -> (created_at, location id, normalized location, job type)
+        self.filters = {}
+        # Alerts without keywords, matched on their filters alone
+        self.unconditional = []
+
+    def __len__(self):
+        return len(self.filters)
+
+    @classmethod
+    def build(cls, alerts=None):
+        """Index ``alerts``, by default every active JobAlert"""
+        if alerts is None:
+            alerts = JobAlert.objects.filter(is_active=True)
+        index = cls()
+        for alert in alerts.only('id', 'keywords', 'location', 'job_type', 'created_at'):
+            index.add_alert(alert)
+        return index
+
+    def add_alert(self, alert):
+        location = resolve_location(alert.location) if alert.location else None
+        job_type = normalize_job_type(alert.job_type) or (alert.job_type or '').strip().lower()
+        self.filters[alert.pk] = (
+            alert.created_at, location.pk if location else None,
+            normalize_place(alert.location), job_type,
+        )
+        clauses = keyword_clauses(alert.keywords)
+        if not clauses:
+            self.unconditional.append(alert.pk)
+        for words in clauses:
+            number = len(self.clauses)
+            self.clauses.append((alert.pk, len(words)))
+            for word in words:
+                self.postings[word].append(number)
+
+    def _passes_filters(self, alert_id, job):
+        created_at, location_id, place, job_type = self.filters[alert_id]
+        if job.created_at < created_at:
+            return False
+        if job_type and job.job_type != job_type:
+            return False
+        if location_id is not None and job.resolved_location_id is not None:
+            return job.resolved_location_id == location_id
+        return not place or place in normalize_place(job.location)
+
+    def match(self, job):
+        """IDs of the alerts ``job`` satisfies, in ascending order"""
+        words = set()
+        for field in MATCH_FIELDS:
+            words.update(tokenize(getattr(job, field)))
+        hits = Counter()
+        for word in words:
+            clauses = self.postings.get(word)
+            if clauses:
+                hits.update(clauses)
+
+        clauses = self.clauses
+        alert_ids = {clauses[number][0] for number, seen in hits.items() if seen == clauses[number][1]}
+        alert_ids.update(self.unconditional)
+        return sorted(alert_id for alert_id in alert_ids if self._passes_filters(alert_id, job))
+
+
+def _to_position(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def _from_position(position):
+    return datetime.fromtimestamp(position / 1_000_000, tz=dt_timezone.utc)
+
+
+def match_new_jobs(batch_size=500, index=None):
+    """
+    Record the alerts satisfied by jobs saved since the last run.
+    Returns ``(jobs processed, new matches recorded)``.
+    """
+    if index is None:
+        index = AlertIndex.build()
+    checkpoint, _ = Checkpoint.objects.get_or_create(name=CHECKPOINT)
+    jobs = Job.objects.filter(is_active=True).only(
+        'id', 'job_type', 'location', 'resolved_location', 'created_at', 'updated_at', *MATCH_FIELDS,
+    ).order_by('updated_at', 'pk')
+
+    after = (_from_position(checkpoint.position) - MATCH_OVERLAP, 0)
+    processed = matched = 0
+    while True:
+        batch = list(jobs.filter(
+            Q(updated_at__gt=after[0]) | Q(updated_at=after[0], pk__gt=after[1])
+        )[:batch_size])
+        if not batch:
+            return processed, matched
+        after = (batch[-1].updated_at, batch[-1].pk)
+        seen = set(JobAlertMatch.objects.filter(job__in=batch).values_list('alert_id', 'job_id'))
+        rows = [
+            JobAlertMatch(alert_id=alert_id, job=job)
+            for job in batch
+            for alert_id in index.match(job)
+            if (alert_id, job.pk) not in seen
+        ]
+        with transaction.atomic():
+            JobAlertMatch.objects.bulk_create(rows, ignore_conflicts=True)
+            checkpoint.position = max(checkpoint.position, _to_position(after[0]))
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        processed += len(batch)
+        matched += len(rows)
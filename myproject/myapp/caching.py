@@ -0,0 +1,86 @@
+"""
+Cache key helpers shared by the job listing caches.
+
+Instead of deleting individual entries when a job changes, every cached
+value is keyed under a namespace generation number. Bumping the generation
+(see signals.py) makes all older keys unreachable at once, and they simply
+age out of the cache.
+
+The generations live in CacheGeneration rows, so a job saved by one
+gunicorn worker moves the generation every other worker and send_outbox
+reads, even though the caches themselves are per process. Each process
+remembers a generation for CACHE_GENERATION_TIMEOUT seconds to save a
+query per cache lookup; that is how long another process's edit can take
+to show.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import CacheGeneration
+
+JOBS_NAMESPACE = 'jobs'
+# Keyset cursors are base64 tokens, so their case matters
+CASE_SENSITIVE_PARAMS = frozenset({'after', 'before'})
+
+
+def _generation_key(namespace):
+    return f'generation:{namespace}'
+
+
+def _fresh_generation():
+    # Start from the clock rather than 1, so a generation lost with its row
+    # (a flushed database) never comes back with a value seen before
+    return time.time_ns() // 1000
+
+
+def _remember(namespace, generation):
+    cache.set(_generation_key(namespace), generation,
+              timeout=getattr(settings, 'CACHE_GENERATION_TIMEOUT', 2))
+
+
+def get_generation(namespace=JOBS_NAMESPACE):
+    generation = cache.get(_generation_key(namespace))
+    if generation is None:
+        generation = CacheGeneration.objects.filter(namespace=namespace).values_list('value', flat=True).first()
+        if generation is None:
+            row, _ = CacheGeneration.objects.get_or_create(
+                namespace=namespace, defaults={'value': _fresh_generation()}
+            )
+            generation = row.value
+        _remember(namespace, generation)
+    return generation
+
+
+def bump_generation(namespace=JOBS_NAMESPACE):
+    with transaction.atomic():
+        rows = CacheGeneration.objects.filter(namespace=namespace)
+        if not rows.update(value=F('value') + 1):
+            CacheGeneration.objects.get_or_create(namespace=namespace, defaults={'value': _fresh_generation()})
+        generation = rows.values_list('value', flat=True).get()
+    _remember(namespace, generation)
+    return generation
+
+
+def normalize_params(params):
+    """Lowercase (except cursors), trim and collapse whitespace; drop empty values"""
+    normalized = {}
+    for name, value in params.items():
+        value = ' '.join(str(value or '').split())
+        if name not in CASE_SENSITIVE_PARAMS:
+            value = value.lower()
+        if value:
+            normalized[name] = value
+    return normalized
+
+
+def make_key(prefix, params, namespace=JOBS_NAMESPACE):
+    """Build a cache key for ``params`` under the current namespace generation"""
+    payload = json.dumps(normalize_params(params), sort_keys=True)
+    digest = hashlib.sha1(payload.encode()).hexdigest()
+    return f'{prefix}:{get_generation(namespace)}:{digest}'
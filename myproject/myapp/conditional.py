@@ -0,0 +1,56 @@
+"""
+Conditional GET (ETag / Last-Modified) for the job pages.
+
+A page's ETag hashes everything it renders from: the job's ``updated_at``
+(or, for listings, the version of the jobs they list; see
+CompiledJobQuery.version()), the request's query string, and the session
+fields the page header shows. A client revalidating with ``If-None-Match``
+or ``If-Modified-Since`` gets a 304 before any template is rendered.
+
+Responses carry ``Cache-Control: no-cache``, so browsers and proxies
+always revalidate rather than serve a stale page. A request with pending
+flash messages is always rendered in full, so the messages are shown.
+"""
+import hashlib
+import json
+
+from django.contrib import messages
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+# Session fields rendered by the page header (base templates)
+VIEWER_SESSION_KEYS = ('email', 'role', 'firstname', 'lastname')
+
+
+def viewer(request):
+    """The session fields a page shows about its viewer"""
+    return [request.session.get(key) for key in VIEWER_SESSION_KEYS]
+
+
+def make_etag(*parts):
+    payload = json.dumps(parts, default=str, sort_keys=True)
+    return '"%s"' % hashlib.sha1(payload.encode()).hexdigest()
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add ETag/Last-Modified to ``response``; returns it"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """The 304 (or 412) response when the request's validators match, else None"""
+    if len(messages.get_messages(request)):
+        return None
+    validators = set_validators(HttpResponse(), etag, last_modified)
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+        response=validators,
+    )
+    return None if response is validators else response
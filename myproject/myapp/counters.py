@@ -0,0 +1,87 @@
+"""
+Buffered job view counts.
+
+``job_detail`` only bumps an in-process counter; a background thread adds
+the buffered counts to ``Job.views_count`` every JOB_VIEW_FLUSH_INTERVAL
+seconds with ``UPDATE ... SET views_count = views_count + n``. Counting a
+view therefore writes nothing on the request path, increments from
+concurrent requests are not lost, and the update bypasses ``save()``, so
+``updated_at`` (and every cache keyed on it) is left alone.
+
+Jobs viewed the same number of times share one UPDATE. Counts still
+buffered when the process exits are flushed by an ``atexit`` hook; a
+failed flush keeps them for the next one.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def __len__(self):
+        return len(self._counts)
+
+    def record(self, job_id):
+        """Count one view of ``job_id``"""
+        with self._lock:
+            self._counts[job_id] += 1
+            if self._flusher is None:
+                self._start_flusher()
+
+    def _start_flusher(self):
+        interval = getattr(settings, 'JOB_VIEW_FLUSH_INTERVAL', 30)
+        if not interval:
+            return
+        self._flusher = threading.Thread(target=self._run, args=(interval,), daemon=True,
+                                         name='job-view-flusher')
+        self._flusher.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write the buffered counts. Returns the number of views written."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+
+        by_views = defaultdict(list)
+        for job_id, views in counts.items():
+            by_views[views].append(job_id)
+        try:
+            with transaction.atomic():
+                for views, job_ids in by_views.items():
+                    Job.objects.filter(pk__in=job_ids).update(views_count=F('views_count') + views)
+        except Exception as e:
+            logger.error(f"❌ Failed to flush job view counts: {str(e)}")
+            with self._lock:
+                self._counts.update(counts)
+            return 0
+        return sum(counts.values())
+
+
+_counter = ViewCounter()
+record_view = _counter.record
+flush = _counter.flush
+atexit.register(flush)
@@ -0,0 +1,164 @@
+"""
+Job alert digest emails.
+
+Pending JobAlertMatch rows (see alerts.py) are mailed as one digest per
+candidate and frequency, instead of one message per match. Each matched
+job's card (the job-card.html email template) is rendered once per run
+and shared by every digest listing it, and the digests go out in batches
+over a single SMTP connection.
+
+Candidates are served in id order, one message at a time. After each
+batch the matches of the digests the server accepted are marked notified
+and the candidate id reached is saved in a Checkpoint, both in one
+transaction: an interrupted run resumes after the last candidate served,
+so nobody gets a second digest for the same period, and the checkpoint is
+reset once the run completes. A digest that failed keeps its matches
+pending for the next run. A run also stops when
+the email send budget is used up (see governor.py), leaving the rest to
+the next run.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from . import governor
+from .emails import render_email
+from .mailer import STALE_CONNECTION_ERRORS
+from .models import Candidate, Checkpoint, Job, JobAlertMatch
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS_PER_DIGEST = 20
+CARD_FIELDS = ('id', 'title', 'company_name', 'location', 'job_type', 'salary')
+
+
+def checkpoint_name(frequency):
+    return f'alert_digest_{frequency}'
+
+
+def job_card(job):
+    """``(html, text)`` blocks for one job, shared by every digest listing it"""
+    url = settings.SITE_URL + reverse('job_detail', args=[job.pk])
+    meta = f'📍 {job.location} · {job.get_job_type_display()}'
+    if job.salary:
+        meta += f' · 💰 {job.salary}'
+    html = render_email('job-card.html', {
+        'url': url, 'title': job.title, 'company_name': job.company_name, 'meta': meta,
+    })
+    text = f'- {job.title} at {job.company_name} ({job.location})\n  {url}'
+    return html, text
+
+
+def digest_message(candidate, cards):
+    """One candidate's digest listing ``cards``, newest job first"""
+    shown = cards[:MAX_JOBS_PER_DIGEST]
+    more = len(cards) - len(shown)
+    summary = f'{len(cards)} new job{"s" if len(cards) != 1 else ""} matching your alerts'
+    html = render_email('alert-digest.html', {
+        'summary': summary,
+        'name': candidate.first_name,
+        'cards': [card_html for card_html, _ in shown],
+        'more': more,
+    })
+    text = '\n'.join([f'Hi {candidate.first_name}!', '', f'{summary}:', ''] + [card_text for _, card_text in shown])
+    if more:
+        text += f'\n\n…and {more} more on JobBoard.'
+    message = EmailMultiAlternatives(
+        subject=f'🔔 {summary} - JobBoard',
+        body=text + '\n\nJobBoard Team',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[candidate.email],
+    )
+    message.attach_alternative(html, 'text/html')
+    return message
+
+
+def deliver(connection, message):
+    """Send one digest over ``connection``; returns whether the server accepted it"""
+    try:
+        try:
+            return bool(connection.send_messages([message]))
+        except STALE_CONNECTION_ERRORS:
+            connection.close()
+            connection.open()
+            return bool(connection.send_messages([message]))
+    except Exception as e:
+        logger.error(f"❌ Failed to send alert digest to {', '.join(message.to)}: {str(e)}")
+        return False
+
+
+def send_digests(frequency='daily', batch_size=None, connection=None):
+    """
+    Mail pending matches of ``frequency`` alerts, one digest per candidate.
+    Returns ``(digests sent, matches notified)``.
+    """
+    batch_size = batch_size or getattr(settings, 'ALERT_DIGEST_BATCH_SIZE', 50)
+    checkpoint, _ = Checkpoint.objects.get_or_create(name=checkpoint_name(frequency))
+    pending = JobAlertMatch.objects.filter(
+        notified_at__isnull=True, alert__is_active=True, alert__frequency=frequency,
+    )
+    # job id -> card, or None for a job that is no longer active
+    cards = {}
+    sent = notified = 0
+
+    connection = connection or get_connection()
+    # One SMTP session for the whole run
+    with connection:
+        while True:
+            # A token per candidate served; digests never eat into the critical reserve
+            granted = governor.take(batch_size, keep=governor.reserve_for(critical=False), partial=True)
+            if not granted:
+                return sent, notified
+            candidate_ids = list(
+                pending.filter(alert__candidate_id__gt=checkpoint.position)
+                .order_by('alert__candidate_id')
+                .values_list('alert__candidate_id', flat=True)
+                .distinct()[:granted]
+            )
+            if not candidate_ids:
+                governor.give_back(granted)
+                break
+            matches = list(
+                pending.filter(alert__candidate_id__in=candidate_ids)
+                .values_list('id', 'alert__candidate_id', 'job_id')
+            )
+
+            new_jobs = {job_id for _, _, job_id in matches} - cards.keys()
+            for job in Job.objects.filter(pk__in=new_jobs, is_active=True).only(*CARD_FIELDS):
+                cards[job.pk] = job_card(job)
+            for job_id in new_jobs:
+                cards.setdefault(job_id, None)
+
+            # Several alerts may match the same job
+            job_ids = defaultdict(set)
+            for _, candidate_id, job_id in matches:
+                if cards[job_id] is not None:
+                    job_ids[candidate_id].add(job_id)
+            candidates = Candidate.objects.only('id', 'first_name', 'email').in_bulk(candidate_ids)
+            messages = {
+                candidate_id: digest_message(candidates[candidate_id],
+                                             [cards[job_id] for job_id in sorted(ids, reverse=True)])
+                for candidate_id, ids in job_ids.items()
+                if candidate_id in candidates and candidates[candidate_id].email
+            }
+
+            # Matches with nothing left to send are done as well
+            failed = {candidate_id for candidate_id, message in messages.items()
+                      if not deliver(connection, message)}
+            governor.give_back(granted - len(messages) + len(failed))
+            done = [match_id for match_id, candidate_id, _ in matches if candidate_id not in failed]
+            with transaction.atomic():
+                JobAlertMatch.objects.filter(pk__in=done).update(notified_at=timezone.now())
+                checkpoint.position = candidate_ids[-1]
+                checkpoint.save(update_fields=['position', 'updated_at'])
+            sent += len(messages) - len(failed)
+            notified += len(done)
+
+    checkpoint.position = 0
+    checkpoint.save(update_fields=['position', 'updated_at'])
+    return sent, notified
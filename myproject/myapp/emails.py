@@ -0,0 +1,136 @@
+"""
+Email templates, compiled once per process with their CSS inlined.
+
+The HTML emails are Django templates under ``myapp/emails/``, sharing the
+rules in ``email.css``. Mail clients ignore or strip ``<style>`` blocks,
+so the rules are written into each element's ``style`` attribute. That
+happens once, on the template source, when a template is first loaded:
+rendering an email is then a plain render of a compiled template with a
+small context, and the message carries only the styles it uses instead of
+the whole stylesheet.
+
+The inliner handles what email.css uses: type and class selectors, and
+descendant combinations of them (``.header h1``). Rules it cannot inline
+(``:hover``) stay in a ``<style>`` block in the head. A ``style`` attribute
+already on an element is kept after the inlined rules, so it wins. The
+template markup must keep its tags balanced outside ``{% if %}`` branches.
+"""
+import functools
+import re
+
+from django.template import engines
+from django.template.loader import get_template
+
+TEMPLATE_DIR = 'myapp/emails/'
+STYLESHEET = TEMPLATE_DIR + 'email.css'
+
+VOID_ELEMENTS = {'area', 'br', 'col', 'hr', 'img', 'input', 'link', 'meta', 'wbr'}
+RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+# A type and/or classes: "h1", ".header", "p.job-title"
+SIMPLE_SELECTOR_RE = re.compile(r'^([a-z][a-z0-9]*)?((?:\.[\w-]+)*)$')
+TAG_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9]*)((?:[^<>"\']|"[^"]*"|\'[^\']*\')*?)(/?)>')
+CLASS_RE = re.compile(r'\bclass\s*=\s*(["\'])(.*?)\1', re.S)
+STYLE_RE = re.compile(r'\sstyle\s*=\s*(["\'])(.*?)\1', re.S)
+
+
+def parse_selector(selector):
+    """``[(tag, classes), ...]`` for a descendant selector, or None if it cannot be inlined"""
+    parts = []
+    for part in selector.split():
+        match = SIMPLE_SELECTOR_RE.match(part)
+        if not match or not (match.group(1) or match.group(2)):
+            return None
+        parts.append((match.group(1), frozenset(filter(None, match.group(2).split('.')))))
+    return parts or None
+
+
+def parse_css(css):
+    """``(rules, leftover)``: inlinable rules as ``(specificity, order, parts, declarations)``,
+    and the CSS of the rest"""
+    rules, leftover = [], []
+    for order, (selectors, declarations) in enumerate(RULE_RE.findall(COMMENT_RE.sub('', css))):
+        declarations = declarations.strip().rstrip(';')
+        for selector in selectors.split(','):
+            selector = selector.strip()
+            parts = parse_selector(selector)
+            if parts is None:
+                leftover.append(f'{selector} {{ {declarations}; }}')
+                continue
+            specificity = (sum(len(classes) for _, classes in parts), sum(bool(tag) for tag, _ in parts))
+            rules.append((specificity, order, parts, declarations))
+    return rules, '\n'.join(leftover)
+
+
+def _matches(part, element):
+    tag, classes = part
+    return (not tag or tag == element[0]) and classes <= element[1]
+
+
+def _selects(parts, element, ancestors):
+    if not _matches(parts[-1], element):
+        return False
+    remaining = len(parts) - 2
+    for ancestor in reversed(ancestors):
+        if remaining < 0:
+            break
+        if _matches(parts[remaining], ancestor):
+            remaining -= 1
+    return remaining < 0
+
+
+def inline_css(html, css):
+    """``html`` with the rules of ``css`` written into its elements' style attributes"""
+    rules, leftover = parse_css(css)
+    rules.sort(key=lambda rule: rule[:2])
+    ancestors = []
+
+    def inline(match):
+        closing, tag, attrs, self_closing = match.groups()
+        tag = tag.lower()
+        if closing:
+            # Pop back to the matching open element
+            for depth in range(len(ancestors) - 1, -1, -1):
+                if ancestors[depth][0] == tag:
+                    del ancestors[depth:]
+                    break
+            return match.group(0)
+
+        class_match = CLASS_RE.search(attrs)
+        element = (tag, frozenset(class_match.group(2).split()) if class_match else frozenset())
+        declarations = [declarations for _, _, parts, declarations in rules
+                        if _selects(parts, element, ancestors)]
+        if not self_closing and tag not in VOID_ELEMENTS:
+            ancestors.append(element)
+        if not declarations:
+            return match.group(0)
+
+        style_match = STYLE_RE.search(attrs)
+        if style_match:
+            declarations.append(style_match.group(2).strip().rstrip(';'))
+            attrs = attrs[:style_match.start()] + attrs[style_match.end():]
+        style = '; '.join(declarations).replace('"', "'")
+        return f'<{tag}{attrs.rstrip()} style="{style};"{self_closing}>'
+
+    html = TAG_RE.sub(inline, html)
+    if leftover and '</head>' in html:
+        html = html.replace('</head>', f'<style>{leftover}</style></head>', 1)
+    return html
+
+
+def load_source(name):
+    return get_template(name).template.source
+
+
+@functools.lru_cache(maxsize=None)
+def get_email_template(name):
+    """The compiled template ``myapp/emails/<name>``, with email.css inlined"""
+    source = inline_css(load_source(TEMPLATE_DIR + name), load_source(STYLESHEET))
+    # Indentation is only bytes on the wire
+    source = re.sub(r'\n\s+', '\n', source).strip()
+    return engines['django'].from_string(source)
+
+
+def render_email(name, context):
+    """HTML of the email template ``name`` for ``context``"""
+    return get_email_template(name).render(context)
@@ -0,0 +1,84 @@
+"""
+Filter counts for the job listing page.
+
+All facet counts come from a single GROUP BY (job_type, experience_required,
+location) over the searched jobs. Each facet is then rolled up in Python
+while applying the *other* active filters, so a visitor can see how many
+jobs they would get by switching, say, from Full Time to Contract.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .caching import make_key
+from .models import Job
+
+TOP_LOCATIONS = 10
+
+
+def _location_matches(location_filter, location_ids, location, resolved_location_id):
+    if location_ids is not None and resolved_location_id is not None:
+        return resolved_location_id in location_ids
+    return not location_filter or location_filter.lower() in (location or '').lower()
+
+
+def compute_facets(queryset, job_type='', experience='', location='', location_ids=None):
+    """
+    Return facet counts for ``queryset``, which should carry every filter
+    except job_type, experience and location.
+
+    ``location_ids`` are the gazetteer Locations the location filter
+    resolved to (see geo.filter_by_location); without them the location
+    filter is matched as a substring.
+    """
+    rows = (
+        queryset.order_by()
+        .values_list('job_type', 'experience_required', 'location', 'resolved_location_id')
+        .annotate(total=Count('id'))
+    )
+
+    type_counts = {}
+    experience_counts = {}
+    location_counts = {}
+    for row_type, row_experience, row_location, resolved_location_id, total in rows:
+        type_ok = not job_type or row_type == job_type
+        experience_ok = not experience or row_experience == experience
+        location_ok = _location_matches(location, location_ids, row_location, resolved_location_id)
+
+        if experience_ok and location_ok:
+            type_counts[row_type] = type_counts.get(row_type, 0) + total
+        if type_ok and location_ok:
+            experience_counts[row_experience] = experience_counts.get(row_experience, 0) + total
+        if type_ok and experience_ok:
+            location_counts[row_location] = location_counts.get(row_location, 0) + total
+
+    top_locations = sorted(location_counts.items(), key=lambda item: (-item[1], item[0]))
+    return {
+        'job_type': [(value, label, type_counts.get(value, 0)) for value, label in Job.JOB_TYPE_CHOICES],
+        'experience': [(value, label, experience_counts.get(value, 0)) for value, label in Job.EXPERIENCE_CHOICES],
+        'locations': top_locations[:TOP_LOCATIONS],
+    }
+
+
+def get_facets(queryset, search_query='', job_type='', experience='', location='',
+               radius='', location_ids=None, skills=(), ranges=None):
+    """
+    Cached compute_facets(), keyed by the normalized filter set.
+
+    ``ranges`` holds any other filters already applied to ``queryset``
+    (salary, experience bounds) so they become part of the key.
+    """
+    key = make_key('facets', {
+        **(ranges or {}),
+        'search': search_query,
+        'skills': ','.join(skills),
+        'job_type': job_type,
+        'experience': experience,
+        'location': location,
+        'radius': radius,
+    })
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset, job_type, experience, location, location_ids)
+        cache.set(key, facets, getattr(settings, 'JOB_FACET_CACHE_TIMEOUT', 300))
+    return facets
@@ -0,0 +1,173 @@
+"""
+Structured job locations.
+
+Free-text ``Job.location`` values ("Bengaluru, India", "Gurgaon") are matched
+against an offline gazetteer (data/gazetteer.json) of cities with aliases
+and coordinates. The match is stored on ``Job.resolved_location`` so listing
+filters can use an indexed foreign key instead of ``icontains``, and
+"within N km" searches only have to look at the (small) Location table.
+"""
+import json
+import math
+import re
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .caching import bump_generation, make_key
+from .models import Job, Location, LocationAlias
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.json'
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+LOCATIONS_NAMESPACE = 'locations'
+
+
+def normalize_place(text):
+    text = re.sub(r'\(.*?\)', ' ', (text or '').lower())
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+def place_candidates(text):
+    """Alias keys to try for a free-text location, most specific first"""
+    candidates = []
+    for part in [text] + (text or '').split(','):
+        key = normalize_place(part)
+        if key and key not in candidates:
+            candidates.append(key)
+    return candidates
+
+
+def resolve_location(text):
+    """Return the gazetteer Location for a free-text location, or None"""
+    candidates = place_candidates(text)
+    if not candidates:
+        return None
+
+    # Listing filters resolve the same few places over and over
+    key = make_key('place', {'candidates': '|'.join(candidates)}, namespace=LOCATIONS_NAMESPACE)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached or None
+
+    aliases = {
+        alias.alias: alias.location
+        for alias in LocationAlias.objects.filter(alias__in=candidates).select_related('location')
+    }
+    location = next((aliases[key] for key in candidates if key in aliases), None)
+    cache.set(key, location or False, 3600)
+    return location
+
+
+@transaction.atomic
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Create/update Locations and aliases from the gazetteer file. Returns the count."""
+    with open(path, encoding='utf-8') as handle:
+        entries = json.load(handle)
+
+    for entry in entries:
+        location, _ = Location.objects.update_or_create(
+            name=entry['name'],
+            country=entry['country'],
+            defaults={
+                'state': entry.get('state'),
+                'latitude': entry['latitude'],
+                'longitude': entry['longitude'],
+            },
+        )
+        for alias in [entry['name']] + entry.get('aliases', []):
+            LocationAlias.objects.update_or_create(
+                alias=normalize_place(alias), defaults={'location': location}
+            )
+    bump_generation(LOCATIONS_NAMESPACE)
+    return len(entries)
+
+
+def link_jobs(queryset=None):
+    """Resolve and store resolved_location for existing jobs. Returns how many matched."""
+    queryset = queryset if queryset is not None else Job.objects.all()
+    matched = 0
+    for job in queryset.only('id', 'location', 'resolved_location'):
+        location = resolve_location(job.location)
+        if location is not None:
+            matched += 1
+        if job.resolved_location_id != (location.pk if location else None):
+            Job.objects.filter(pk=job.pk).update(resolved_location=location)
+    return matched
+
+
+# ============================================
+# RADIUS SEARCH
+# ============================================
+
+def haversine_km(lat, lon, points):
+    """
+    Great-circle distances (km) from (lat, lon) to each (lat, lon) in ``points``.
+
+    Works on the whole batch at once so the trigonometry for the centre
+    point is only done one time.
+    """
+    phi1 = math.radians(lat)
+    cos_phi1 = math.cos(phi1)
+    lam1 = math.radians(lon)
+    distances = []
+    for point_lat, point_lon in points:
+        phi2 = math.radians(point_lat)
+        a = (math.sin((phi2 - phi1) / 2) ** 2
+             + cos_phi1 * math.cos(phi2) * math.sin((math.radians(point_lon) - lam1) / 2) ** 2)
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a))))
+    return distances
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the radius circle"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    lon_delta = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return lat - lat_delta, lat + lat_delta, lon - lon_delta, lon + lon_delta
+
+
+def locations_within(center, radius_km):
+    """IDs of Locations within ``radius_km`` of ``center`` (a Location)"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(center.latitude, center.longitude, radius_km)
+    rows = list(
+        Location.objects.filter(
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lon, longitude__lte=max_lon,
+        ).values_list('id', 'latitude', 'longitude')
+    )
+    distances = haversine_km(center.latitude, center.longitude, [(la, lo) for _, la, lo in rows])
+    return [row[0] for row, distance in zip(rows, distances) if distance <= radius_km]
+
+
+def parse_radius(value):
+    """Radius in km from a request parameter, or None"""
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        return None
+    return radius if 0 < radius <= 1000 else None
+
+
+def filter_by_location(queryset, text, radius_km=None):
+    """
+    Apply a location filter to a Job queryset.
+
+    Returns ``(queryset, location_ids)``. When the text matches the
+    gazetteer the filter is an indexed ``resolved_location`` lookup
+    (widened to every Location within ``radius_km`` if given), plus
+    ``icontains`` for jobs whose own location did not resolve; otherwise
+    it is only ``icontains`` and ``location_ids`` is None.
+    """
+    if not text:
+        return queryset, None
+    center = resolve_location(text)
+    if center is None:
+        return queryset.filter(location__icontains=text), None
+    location_ids = locations_within(center, radius_km) if radius_km else [center.pk]
+    return queryset.filter(
+        Q(resolved_location_id__in=location_ids)
+        | Q(resolved_location__isnull=True, location__icontains=text)
+    ), location_ids
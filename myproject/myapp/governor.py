@@ -0,0 +1,118 @@
+"""
+Outgoing email rate governor.
+
+Gmail throttles senders that burst, so every email goes through a pair of
+token buckets first: one refilling EMAIL_RATE_PER_MINUTE tokens a minute,
+one EMAIL_RATE_PER_DAY a day, each holding at most a full period's worth.
+Sending a message takes a token from both. The buckets live in RateBucket
+rows, locked while they are updated, so the web workers and send_outbox
+share one budget.
+
+Mail over budget is deferred, never dropped: outbox emails wait in
+EmailOutbox, where send_outbox sends them most urgent first as tokens come
+back, and alert digests stop at their checkpoint until the next run.
+Only critical mail (OTP, password reset) may take the last
+EMAIL_RATE_CRITICAL_RESERVE tokens, so a burst of notifications cannot
+hold up a login.
+
+A budget set to 0 or None is not enforced.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RateBucket
+
+# Bucket name, setting with its budget, period in seconds
+BUCKETS = (
+    ('email_minute', 'EMAIL_RATE_PER_MINUTE', 60),
+    ('email_day', 'EMAIL_RATE_PER_DAY', 24 * 60 * 60),
+)
+
+
+def reserve_for(critical):
+    """Tokens a send must leave in each bucket"""
+    return 0 if critical else getattr(settings, 'EMAIL_RATE_CRITICAL_RESERVE', 0)
+
+
+def _budgets():
+    """``{bucket name: (capacity, period)}`` of the enforced budgets"""
+    budgets = {}
+    for name, setting, period in BUCKETS:
+        capacity = getattr(settings, setting, None)
+        if capacity:
+            budgets[name] = (capacity, period)
+    return budgets
+
+
+def _locked_buckets(budgets, now):
+    """The buckets of ``budgets``, locked and refilled up to ``now``"""
+    for name, (capacity, _) in budgets.items():
+        RateBucket.objects.get_or_create(name=name, defaults={'tokens': capacity, 'updated_at': now})
+    buckets = list(RateBucket.objects.select_for_update().filter(name__in=budgets).order_by('name'))
+    for bucket in buckets:
+        capacity, period = budgets[bucket.name]
+        elapsed = max((now - bucket.updated_at).total_seconds(), 0)
+        bucket.tokens = min(capacity, bucket.tokens + elapsed * capacity / period)
+        bucket.updated_at = now
+    return buckets
+
+
+def take(count, keep=0, partial=False):
+    """
+    Take ``count`` tokens from every bucket, leaving at least ``keep``.
+    With ``partial``, takes as many as are available instead of none.
+    Returns the number taken.
+    """
+    budgets = _budgets()
+    if not budgets or count <= 0:
+        return count
+    now = timezone.now()
+    with transaction.atomic():
+        buckets = _locked_buckets(budgets, now)
+        available = max(math.floor(min(bucket.tokens for bucket in buckets) - keep), 0)
+        taken = min(count, available) if partial else (count if available >= count else 0)
+        for bucket in buckets:
+            bucket.tokens -= taken
+        RateBucket.objects.bulk_update(buckets, ['tokens', 'updated_at'])
+    return taken
+
+
+def acquire(count=1, critical=False):
+    """Take ``count`` tokens for sending now. Returns False (and takes none) if over budget."""
+    return take(count, keep=reserve_for(critical)) == count
+
+
+def wait_time(count=1, critical=False):
+    """
+    Seconds until ``count`` tokens could be taken, going by the buckets as
+    they are now, or None if the budgets are too small to ever allow it
+    """
+    budgets = _budgets()
+    needed = count + reserve_for(critical)
+    now = timezone.now()
+    wait = 0
+    for bucket in RateBucket.objects.filter(name__in=budgets):
+        capacity, period = budgets[bucket.name]
+        if needed > capacity:
+            return None
+        elapsed = max((now - bucket.updated_at).total_seconds(), 0)
+        tokens = min(capacity, bucket.tokens + elapsed * capacity / period)
+        wait = max(wait, (needed - tokens) * period / capacity)
+    return wait
+
+
+def give_back(count):
+    """Return tokens taken for messages that were not sent after all"""
+    budgets = _budgets()
+    if not budgets or count <= 0:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        buckets = _locked_buckets(budgets, now)
+        for bucket in buckets:
+            bucket.tokens = min(budgets[bucket.name][0], bucket.tokens + count)
+        RateBucket.objects.bulk_update(buckets, ['tokens', 'updated_at'])
+
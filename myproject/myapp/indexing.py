@@ -0,0 +1,136 @@
+"""
+Lifecycle of the in-process job indexes (typeahead suggestions, relevance
+ranking, trigrams, similar jobs).
+
+Each index is built from active jobs, before the gunicorn workers fork
+(see gunicorn.conf.py) or else on first use, and patched from the Job
+signals. When another process changed jobs (the jobs generation,
+shared through the database, moved on without us) the index catches up
+instead of being rebuilt: jobs that are gone or inactive are dropped and
+jobs saved since the last sync are re-added. A get() notices within
+CACHE_GENERATION_TIMEOUT seconds (see caching.py).
+
+An index class provides ``add_job(job_id, texts, _bulk=False)``,
+``remove_job(job_id)``, ``finish_bulk()``, ``job_ids()`` and
+``needs_rebuild()``, where ``texts`` maps each of the indexed Job fields
+to its value.
+
+An index that needs rebuilding (removed jobs piling up) keeps serving
+while a background thread builds its replacement, unless
+SEARCH_INDEX_BACKGROUND_REBUILD is off.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .caching import get_generation
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Saves committed this long before a sync may still have been invisible to it
+SYNC_OVERLAP = timedelta(minutes=1)
+CHUNK_SIZE = 2000
+
+
+class LiveIndex:
+    def __init__(self, index_class, fields):
+        self.index_class = index_class
+        self.fields = tuple(fields)
+        self._index = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def _add_rows(self, index, rows, bulk=False):
+        for job_id, *texts in rows:
+            index.add_job(job_id, dict(zip(self.fields, texts)), _bulk=bulk)
+
+    def build(self):
+        index = self.index_class()
+        index.generation = get_generation()
+        index.synced_at = timezone.now()
+        rows = Job.objects.filter(is_active=True).values_list('id', *self.fields)
+        self._add_rows(index, rows.iterator(chunk_size=CHUNK_SIZE), bulk=True)
+        index.finish_bulk()
+        return index
+
+    def refresh(self, index):
+        """Catch up with jobs changed by other processes since the last sync"""
+        generation = get_generation()
+        synced_at = timezone.now()
+        active = set(Job.objects.filter(is_active=True).values_list('id', flat=True))
+        indexed = index.job_ids()
+        for job_id in indexed - active:
+            index.remove_job(job_id)
+
+        changed = Job.objects.filter(is_active=True, updated_at__gte=index.synced_at - SYNC_OVERLAP)
+        changed = list(changed.values_list('id', *self.fields))
+        self._add_rows(index, changed)
+        missing = list(active - indexed - {row[0] for row in changed})
+        for start in range(0, len(missing), CHUNK_SIZE):
+            rows = Job.objects.filter(pk__in=missing[start:start + CHUNK_SIZE])
+            self._add_rows(index, rows.values_list('id', *self.fields))
+
+        index.generation = generation
+        index.synced_at = synced_at
+
+    @staticmethod
+    def _advance(index):
+        # The signal has just bumped the generation. Only an index that was
+        # current before the bump is current now; otherwise leave it behind
+        # so the next get() catches up on whatever else it missed.
+        generation = get_generation()
+        if index.generation == generation - 1:
+            index.generation = generation
+
+    def get(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self.build()
+            elif self._index.generation != get_generation():
+                self.refresh(self._index)
+            if self._index.needs_rebuild() and not self._rebuilding:
+                if getattr(settings, 'SEARCH_INDEX_BACKGROUND_REBUILD', True):
+                    self._rebuilding = True
+                    threading.Thread(target=self._rebuild, daemon=True,
+                                     name=f'{self.index_class.__name__}-rebuild').start()
+                else:
+                    self._index = self.build()
+            return self._index
+
+    def _rebuild(self):
+        try:
+            index = self.build()
+        except Exception as e:
+            logger.error(f"❌ Rebuilding {self.index_class.__name__} failed: {str(e)}")
+        else:
+            # Built from a snapshot: the next get() catches up with the
+            # saves since, as the generation it recorded is behind
+            with self._lock:
+                self._index = index
+        finally:
+            self._rebuilding = False
+            close_old_connections()
+
+    def job_changed(self, job):
+        """Patch the index after a save; called from the Job post_save signal"""
+        with self._lock:
+            if self._index is None:
+                return
+            if job.is_active:
+                self._index.add_job(job.pk, {field: getattr(job, field) for field in self.fields})
+            else:
+                self._index.remove_job(job.pk)
+            self._advance(self._index)
+
+    def job_removed(self, job_id):
+        """Drop a deleted job from the index; called from the Job post_delete signal"""
+        with self._lock:
+            if self._index is None:
+                return
+            self._index.remove_job(job_id)
+            self._advance(self._index)
@@ -0,0 +1,288 @@
+"""
+One query pipeline for every job listing.
+
+``browse_jobs`` and ``search_jobs`` (and anything else that lists jobs)
+parse their GET parameters into a canonical JobQuery, which compiles to a
+CompiledJobQuery holding the cheapest ORM plan for it:
+
+* exact, indexed lookups wherever the value can be normalized (job type
+  labels from the home page form, gazetteer locations, skill slugs);
+* a ``.only()`` projection of the columns the listing cards render;
+* a keyset order (newest, salary) or in-memory relevance ranking;
+* a count strategy, so the total is not recounted when it is already
+  known (ranking, a single page of results, or an earlier page);
+* a typo-tolerant fallback when a search finds almost nothing.
+
+Both parameter vocabularies are accepted: ``search``/``title``,
+``location``/``region`` and ``job_type``/``type``.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import Count, Max
+
+from . import geo, ranking, search, trigram
+from .caching import make_key
+from .facets import get_facets
+from .models import Job
+from .parsing import parse_amount, parse_years
+from .result_cache import RESULTS_CACHE, cached_job_page
+from .skills import filter_by_skills, parse_skill_filter
+
+# Columns used by the listing templates (job-listings.html, search-results.html)
+LISTING_FIELDS = (
+    'id', 'title', 'company_name', 'location', 'job_type', 'salary',
+    'salary_max', 'is_featured', 'created_at',
+)
+
+SORT_KEYS = {
+    '': 'created_at',
+    'salary': 'salary_max',
+}
+
+# Most queries each plan may issue for one page, used by the tests and
+# bench_job_queries. "cold" is with empty result caches, "warm" a repeat.
+QUERY_BUDGETS = {
+    'recent': {'cold': 2, 'warm': 1},
+    'filtered': {'cold': 2, 'warm': 1},
+    'search': {'cold': 2, 'warm': 1},
+    'salary': {'cold': 2, 'warm': 1},
+    'relevance': {'cold': 2, 'warm': 1},
+    # Exact page plus the similarity ranked one
+    'fuzzy': {'cold': 3, 'warm': 1},
+}
+
+
+def normalize_job_type(value):
+    """Map a job type key or label ('full-time', 'Full Time') to its key, or ''"""
+    folded = '-'.join((value or '').lower().replace('_', ' ').replace('-', ' ').split())
+    for key, label in Job.JOB_TYPE_CHOICES:
+        if folded in (key, '-'.join(label.lower().split())):
+            return key
+    return ''
+
+
+class JobQuery:
+    def __init__(self, search='', location='', radius=None, job_type='', experience='',
+                 skills=(), min_salary=None, currency='', max_experience=None, sort=''):
+        self.search = ' '.join((search or '').split())
+        self.location = ' '.join((location or '').split())
+        self.radius = radius
+        self.job_type = job_type
+        self.experience = experience
+        self.skills = tuple(skills)
+        self.min_salary = min_salary
+        self.currency = currency
+        self.max_experience = max_experience
+        # Relevance needs something to be relevant to
+        self.sort = sort if sort in SORT_KEYS or (sort == 'relevance' and self.search) else ''
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a query from request GET parameters, dropping invalid values"""
+        experience = params.get('experience', '')
+        currency = params.get('currency', '')
+        return cls(
+            search=params.get('search') or params.get('title', ''),
+            location=params.get('location') or params.get('region', ''),
+            radius=geo.parse_radius(params.get('radius')),
+            job_type=normalize_job_type(params.get('job_type') or params.get('type', '')),
+            experience=experience if experience in dict(Job.EXPERIENCE_CHOICES) else '',
+            skills=parse_skill_filter(params.get('skills', '')),
+            min_salary=parse_amount(params.get('min_salary')),
+            currency=currency if currency in dict(Job.SALARY_CURRENCY_CHOICES) else '',
+            max_experience=parse_years(params.get('max_experience')),
+            sort=params.get('sort', ''),
+        )
+
+    @property
+    def plan(self):
+        """Name of the execution plan, see QUERY_BUDGETS"""
+        if self.sort:
+            return self.sort
+        if self.search:
+            return 'search'
+        if self.filters():
+            return 'filtered'
+        return 'recent'
+
+    def filters(self):
+        """The canonical filter values, used as result/count cache key parts"""
+        values = {
+            'search': self.search,
+            'location': self.location,
+            'radius': self.radius,
+            'job_type': self.job_type,
+            'experience': self.experience,
+            'skills': ','.join(self.skills),
+            'min_salary': self.min_salary,
+            'currency': self.currency,
+            'max_experience': self.max_experience,
+        }
+        return {name: value for name, value in values.items() if value not in ('', None)}
+
+    def ranges(self):
+        """Filters applied before the facets, besides search/skills/location"""
+        return {
+            'min_salary': self.min_salary,
+            'currency': self.currency,
+            'max_experience': self.max_experience,
+            'sort': self.sort,
+        }
+
+    def compile(self, queryset=None):
+        jobs = queryset if queryset is not None else Job.objects.filter(is_active=True)
+        jobs = filter_by_skills(jobs, self.skills)
+
+        # Range filters use the parsed columns (see parsing.py)
+        if self.min_salary:
+            jobs = jobs.filter(salary_max__gte=self.min_salary)
+        if self.currency:
+            jobs = jobs.filter(salary_currency=self.currency)
+        if self.max_experience is not None:
+            jobs = jobs.filter(experience_min__lte=self.max_experience)
+        if self.sort == 'salary':
+            # Postings without a parseable salary cannot be ranked by it
+            jobs = jobs.filter(salary_max__isnull=False)
+
+        located, location_ids = geo.filter_by_location(jobs, self.location, self.radius)
+        if self.job_type:
+            located = located.filter(job_type=self.job_type)
+        if self.experience:
+            located = located.filter(experience_required=self.experience)
+
+        # Facet counts respect the search, skills and ranges but not the
+        # sidebar filters themselves
+        unsearched = jobs
+        if self.search:
+            jobs = search.apply_search(jobs, self.search)
+            matches = search.apply_search(located, self.search)
+        else:
+            matches = located
+
+        return CompiledJobQuery(
+            self, matches.only(*LISTING_FIELDS), jobs, location_ids,
+            unsearched_queryset=located.only(*LISTING_FIELDS),
+            version_queryset=unsearched,
+        )
+
+
+class CompiledJobQuery:
+    def __init__(self, query, queryset, facet_queryset, location_ids, unsearched_queryset=None,
+                 version_queryset=None):
+        self.query = query
+        self.queryset = queryset
+        self.facet_queryset = facet_queryset
+        self.location_ids = location_ids
+        # Every filter but the search, for the typo-tolerant fallback
+        self.unsearched_queryset = unsearched_queryset
+        # Every job the page (results, facets, fallback) can depend on
+        self.version_queryset = version_queryset if version_queryset is not None else facet_queryset
+        # Plan actually executed by page(), and the fallback's spelling
+        self.plan = query.plan
+        self.corrected_search = ''
+
+    def facets(self):
+        query = self.query
+        return get_facets(
+            self.facet_queryset, query.search, query.job_type, query.experience, query.location,
+            query.radius, self.location_ids, query.skills, query.ranges(),
+        )
+
+    def count(self, page):
+        """
+        Total matches for ``page``'s query. Ranking already knows it, a lone
+        page is its own total, and otherwise the count is computed once per
+        filter set and shared by all of its pages.
+        """
+        if page.total is not None:
+            return page.total
+        if not page.has_previous and not page.has_next:
+            return len(page)
+        counts = caches[RESULTS_CACHE]
+        # The sort is part of the key: sort=salary leaves out unsalaried jobs
+        key = make_key('count', dict(self.query.filters(), sort=self.query.sort))
+        total = counts.get(key)
+        if total is None:
+            total = self.queryset.count()
+            counts.set(key, total)
+        return total
+
+    def version(self):
+        """
+        ``(latest updated_at, count)`` of the jobs the listing depends on,
+        the validator for conditional GETs. It is shared by every filter set
+        with the same skills and ranges and recomputed once per jobs cache
+        generation, so an unrelated job's edit leaves it unchanged.
+        """
+        key = make_key('version', dict(self.query.ranges(), skills=','.join(self.query.skills)))
+        version = cache.get(key)
+        if version is None:
+            version = self.version_queryset.aggregate(updated_at=Max('updated_at'), count=Count('id'))
+            version = (version['updated_at'], version['count'])
+            cache.set(key, version, getattr(settings, 'JOB_FACET_CACHE_TIMEOUT', 300))
+        return version
+
+    def paginator(self):
+        if self.query.sort == 'relevance':
+            return ranking.paginator(self.query.search, only=LISTING_FIELDS)
+        return None
+
+    def page(self, request):
+        """
+        ``(page, total)`` for the request's cursor, through the result cache.
+
+        A search with fewer than JOB_FUZZY_MIN_RESULTS exact matches falls
+        back to trigram similarity (see trigram.py) when that finds more;
+        its pagination links carry ``fuzzy=1`` to stay on the fallback.
+        """
+        if self.query.search and request.GET.get('fuzzy'):
+            return self.fuzzy_page(request)
+
+        filters = dict(self.query.filters(), sort=self.query.sort)
+        page, total = cached_job_page(
+            self.queryset, request, filters,
+            key=SORT_KEYS.get(self.query.sort, 'created_at'),
+            paginator=self.paginator(),
+            count=self.count,
+            only=LISTING_FIELDS,
+        )
+        # The similarity matches bound the fallback's total, so it is only
+        # paginated when it could beat the exact results
+        if (self.query.search and not page.has_previous
+                and total < getattr(settings, 'JOB_FUZZY_MIN_RESULTS', 3)
+                and len(self.similar_jobs()[0]) > total):
+            fuzzy_page, fuzzy_total = self.fuzzy_page(request)
+            if fuzzy_total > total:
+                return fuzzy_page, fuzzy_total
+            self.plan = self.query.plan
+            self.corrected_search = ''
+        return page, total
+
+    def similar_jobs(self):
+        """Cached trigram.similar_jobs() for the search text"""
+        key = make_key('similar', {'search': self.query.search})
+        similar = cache.get(key)
+        if similar is None:
+            similar = trigram.similar_jobs(self.query.search)
+            cache.set(key, similar, getattr(settings, 'JOB_FACET_CACHE_TIMEOUT', 300))
+        return similar
+
+    def fuzzy_page(self, request):
+        self.plan = 'fuzzy'
+        scores, self.corrected_search = self.similar_jobs()
+        candidates = self.unsearched_queryset.filter(pk__in=list(scores))
+
+        def paginator(queryset, request):
+            return ranking.rank_by(
+                queryset, lambda job_ids: {job_id: scores[job_id] for job_id in job_ids},
+                after=request.GET.get('after'), before=request.GET.get('before'),
+                page_size=request.GET.get('page_size'), only=LISTING_FIELDS,
+            )
+
+        filters = dict(self.query.filters(), fuzzy=True)
+        page, total = cached_job_page(candidates, request, filters, paginator=paginator,
+                                      only=LISTING_FIELDS)
+        params = request.GET.copy()
+        params['fuzzy'] = '1'
+        page.build_links(params)
+        return page, total
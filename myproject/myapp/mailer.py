@@ -0,0 +1,208 @@
+"""
+Background email sending through a bounded worker pool.
+
+``send_email`` (views.py) hands messages to a MailQueue instead of
+starting a thread per message. The queue holds at most EMAIL_QUEUE_SIZE
+messages and is served by EMAIL_WORKERS threads, started with the first
+message. When the queue is full, submit() waits up to EMAIL_QUEUE_TIMEOUT
+seconds for room and then gives up, so a burst of registrations or status
+updates slows its requests down rather than piling up unbounded threads
+and SMTP connections; callers already fall back to showing the OTP when a
+message cannot be sent.
+
+Each worker keeps one SMTP connection open and sends every message it
+takes over it, instead of a TLS handshake and login per message. A
+connection that has gone stale (the server hung up, a socket error) is
+reopened and the message retried once; connections idle for
+EMAIL_CONNECTION_IDLE_TIMEOUT seconds are closed before the server drops
+them.
+
+At process exit (a gunicorn worker shutting down) drain() lets the workers
+finish the queued messages, for up to EMAIL_DRAIN_TIMEOUT seconds.
+
+stats() reports queue depth, messages in flight, sent/failed/rejected
+counts, SMTP connections opened and recent send latency; it is logged when the queue is more than
+half full and after draining. With EMAIL_WORKERS = 0 messages are sent
+synchronously, as the tests do.
+"""
+import atexit
+import logging
+import queue
+import smtplib
+import statistics
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Send latencies kept for stats()
+LATENCY_WINDOW = 200
+# Tells a worker to exit
+_STOP = object()
+# Errors after which a connection is reopened and the message retried
+STALE_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class MailQueue:
+    def __init__(self):
+        self._queue = None
+        self._workers = []
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {'sent': 0, 'failed': 0, 'rejected': 0, 'connections': 0}
+        self._in_flight = 0
+
+    def _start(self):
+        workers = getattr(settings, 'EMAIL_WORKERS', 2)
+        self._queue = queue.Queue(maxsize=getattr(settings, 'EMAIL_QUEUE_SIZE', 100))
+        self._workers = [
+            threading.Thread(target=self._run, args=(self._queue,), daemon=True,
+                             name=f'email-worker-{number}')
+            for number in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, message, on_sent=None):
+        """
+        Queue an EmailMessage. Returns False if the queue stayed full.
+        ``on_sent(sent)`` is called once the message was sent or failed.
+        """
+        if not getattr(settings, 'EMAIL_WORKERS', 2):
+            sent, connection = self._send(message, time.monotonic(), None)
+            self._close(connection)
+            self._report(on_sent, sent)
+            return sent
+        with self._lock:
+            if self._queue is None:
+                self._start()
+            pending = self._queue
+        try:
+            pending.put((message, time.monotonic(), on_sent), timeout=getattr(settings, 'EMAIL_QUEUE_TIMEOUT', 2))
+        except queue.Full:
+            with self._lock:
+                self._counts['rejected'] += 1
+            logger.error(f"❌ Email queue full, dropping email to {', '.join(message.to)}")
+            return False
+        if pending.qsize() * 2 > pending.maxsize:
+            logger.warning(f"⚠️ Email queue backing up: {self.stats()}")
+        return True
+
+    def _run(self, pending):
+        idle_timeout = getattr(settings, 'EMAIL_CONNECTION_IDLE_TIMEOUT', 60)
+        connection = None
+        try:
+            while True:
+                try:
+                    item = pending.get(timeout=idle_timeout if connection else None)
+                except queue.Empty:
+                    self._close(connection)
+                    connection = None
+                    continue
+                if item is _STOP:
+                    return
+                message, queued_at, on_sent = item
+                sent, connection = self._send(message, queued_at, connection)
+                self._report(on_sent, sent)
+                if on_sent:
+                    # Callbacks use the database from this thread
+                    close_old_connections()
+        finally:
+            self._close(connection)
+
+    def _report(self, on_sent, sent):
+        if on_sent:
+            try:
+                on_sent(sent)
+            except Exception as e:
+                logger.error(f"❌ Email callback failed: {str(e)}")
+
+    def _open(self):
+        connection = get_connection()
+        connection.open()
+        with self._lock:
+            self._counts['connections'] += 1
+        return connection
+
+    def _close(self, connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _send(self, message, queued_at, connection):
+        """Send over ``connection`` (opened if None). Returns ``(sent, connection to reuse)``."""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if connection is None:
+                connection = self._open()
+            try:
+                connection.send_messages([message])
+            except STALE_CONNECTION_ERRORS:
+                self._close(connection)
+                connection = None
+                connection = self._open()
+                connection.send_messages([message])
+            outcome = 'sent'
+            logger.info(f"✅ Email sent successfully to {', '.join(message.to)}")
+        except Exception as e:
+            outcome = 'failed'
+            logger.error(f"❌ Failed to send email to {', '.join(message.to)}: {str(e)}")
+            # The connection's state is unknown, start the next message afresh
+            self._close(connection)
+            connection = None
+        with self._lock:
+            self._in_flight -= 1
+            self._counts[outcome] += 1
+            # From submit() to delivery, so time spent queued counts too
+            self._latencies.append(time.monotonic() - queued_at)
+        return outcome == 'sent', connection
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'queued': self._queue.qsize() if self._queue is not None else 0,
+                'in_flight': self._in_flight,
+                'workers': sum(worker.is_alive() for worker in self._workers),
+                **self._counts,
+                'latency_median': statistics.median(latencies) if latencies else None,
+                'latency_max': latencies[-1] if latencies else None,
+            }
+
+    def drain(self, timeout=None):
+        """Send what is queued and stop the workers. Returns True if all were sent."""
+        with self._lock:
+            pending, workers = self._queue, self._workers
+            self._queue, self._workers = None, []
+        if pending is None:
+            return True
+        if timeout is None:
+            timeout = getattr(settings, 'EMAIL_DRAIN_TIMEOUT', 10)
+        deadline = time.monotonic() + timeout
+        try:
+            for _ in workers:
+                pending.put(_STOP, timeout=max(deadline - time.monotonic(), 0))
+        except queue.Full:
+            pass
+        for worker in workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+        left = sum(item is not _STOP for item in list(pending.queue))
+        if left:
+            logger.error(f"❌ Email queue drain timed out with {left} messages unsent")
+        logger.info(f"📧 Email queue drained: {self.stats()}")
+        return not left
+
+
+_mail_queue = MailQueue()
+submit = _mail_queue.submit
+stats = _mail_queue.stats
+drain = _mail_queue.drain
+atexit.register(drain)
@@ -61,7 +61,6 @@ class Command(BaseCommand):
                     user = UserMaster.objects.create(
                         email=comp_data['email'],
                         password='company123',  # Simple password for demo
-                        otp=0,
                         role='company',
                         is_active=True,
                         is_verified=True
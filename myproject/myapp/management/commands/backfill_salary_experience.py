@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from myapp import parsing
+from myapp.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Parse salary and experience_required of existing jobs into the numeric columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of jobs fetched and updated per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔧 Backfilling salary and experience columns...')
+        updated = parsing.backfill(batch_size=options['batch_size'])
+        with_salary = Job.objects.filter(salary_max__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Updated {updated} jobs ({with_salary} with a parsed salary)'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from myapp import skills
+from myapp.models import Skill
+
+
+class Command(BaseCommand):
+    help = 'Parse skills_required of existing jobs into the normalized skills tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of jobs fetched per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔧 Backfilling job skills...')
+        processed = skills.backfill(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Synced {processed} jobs ({Skill.objects.count()} distinct skills)'
+        ))
@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.template import engines
+from myapp.emails import STYLESHEET, TEMPLATE_DIR, get_email_template, load_source, render_email
+
+# A representative context for each email template
+SAMPLE_EMAILS = {
+    'otp.html': {'name': 'Jane', 'otp': '48213', 'valid_minutes': 10},
+    'password-reset.html': {'name': 'Jane', 'otp': '48213', 'valid_minutes': 10},
+    'welcome.html': {'name': 'Jane', 'role': 'candidate', 'role_message': 'start applying for your dream jobs'},
+    'application-received.html': {
+        'candidate_name': 'Jane', 'job_title': 'Senior Python Developer', 'company_name': 'Acme Corp',
+    },
+    'new-application.html': {
+        'employer_name': 'Hiring', 'candidate_name': 'Jane Doe', 'job_title': 'Senior Python Developer',
+    },
+    'application-status.html': {
+        'emoji': '⭐', 'color': '#28a745', 'message': 'Congratulations! You have been shortlisted',
+        'candidate_name': 'Jane', 'job_title': 'Senior Python Developer', 'company_name': 'Acme Corp',
+        'status_label': 'Shortlisted', 'next_steps': True,
+    },
+}
+
+
+def median_us(render, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def render_plain(name, context):
+    """
+    The email as it was built before the templates were precompiled: the
+    whole stylesheet in a <style> block, put together on every send
+    """
+    source = load_source(TEMPLATE_DIR + name).replace(
+        '</head>', f'<style>{load_source(STYLESHEET)}</style></head>', 1)
+    return engines['django'].from_string(source).render(context)
+
+
+def message_bytes(html):
+    message = EmailMultiAlternatives('Subject', 'Plain text body', 'from@example.com', ['to@example.com'])
+    message.attach_alternative(html, 'text/html')
+    return len(message.message().as_bytes())
+
+
+class Command(BaseCommand):
+    help = 'Measure render time and payload size of each email template'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500, help='Renders per template')
+        parser.add_argument(
+            '--baseline',
+            action='store_true',
+            help='Also time the plain render (stylesheet in a <style> block, compiled per send)',
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        header = f'📊 {"template":<26} {"load µs":>9} {"render µs":>10} {"html B":>7} {"message B":>10}'
+        if options['baseline']:
+            header += f' {"plain µs":>9} {"plain msg B":>11}'
+        self.stdout.write(header)
+        for name, context in SAMPLE_EMAILS.items():
+            def load():
+                get_email_template.cache_clear()
+                get_email_template(name)
+
+            # Compiling and inlining, paid once per process
+            load_us = median_us(load, max(repeat // 10, 1))
+            render_us = median_us(lambda: render_email(name, context), repeat)
+
+            html = render_email(name, context)
+            row = (
+                f'   {name:<26} {load_us:>9.0f} {render_us:>10.1f} '
+                f'{len(html.encode()):>7} {message_bytes(html):>10}'
+            )
+            if options['baseline']:
+                plain_us = median_us(lambda: render_plain(name, context), repeat)
+                row += f' {plain_us:>9.1f} {message_bytes(render_plain(name, context)):>11}'
+            self.stdout.write(row)
+        self.stdout.write(self.style.SUCCESS('✅ Done'))
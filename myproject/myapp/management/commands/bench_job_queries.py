@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from myapp.job_query import QUERY_BUDGETS, JobQuery
+from myapp.result_cache import RESULTS_CACHE
+
+# Sample parameters for each plan in QUERY_BUDGETS
+PLAN_PARAMS = {
+    'recent': {},
+    'filtered': {'job_type': 'full-time', 'experience': '1-3'},
+    'search': {'search': 'developer'},
+    'salary': {'sort': 'salary'},
+    'relevance': {'search': 'developer', 'sort': 'relevance'},
+    'fuzzy': {'search': 'devloper'},
+}
+
+
+def run_plan(params):
+    """Compile and fetch one listing page. Returns (queries, milliseconds)."""
+    request = RequestFactory().get('/jobs/', params)
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        JobQuery.from_params(request.GET).compile().page(request)
+        elapsed = (time.perf_counter() - started) * 1000
+    return len(captured), elapsed
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and time per job listing plan and fail if a budget is exceeded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per plan and cache state')
+        parser.add_argument('--max-ms', type=float, default=100.0,
+                            help='Fail when a plan\'s median time exceeds this')
+
+    def handle(self, *args, **options):
+        results_cache = caches[RESULTS_CACHE]
+        failures = []
+        self.stdout.write(f'📊 {"plan":<10} {"state":<5} {"queries":>7} {"median ms":>10} {"max ms":>8}')
+
+        for plan, params in PLAN_PARAMS.items():
+            # Warm the process-level state (FTS probe, ranking index, place lookups)
+            run_plan(params)
+            for state in ('cold', 'warm'):
+                queries, timings = [], []
+                for _ in range(options['repeat']):
+                    if state == 'cold':
+                        results_cache.clear()
+                    count, elapsed = run_plan(params)
+                    queries.append(count)
+                    timings.append(elapsed)
+
+                budget = QUERY_BUDGETS[plan][state]
+                median = statistics.median(timings)
+                self.stdout.write(
+                    f'   {plan:<10} {state:<5} {max(queries):>7} {median:>10.2f} {max(timings):>8.2f}'
+                )
+                if max(queries) > budget:
+                    failures.append(f'{plan}/{state}: {max(queries)} queries (budget {budget})')
+                if median > options['max_ms']:
+                    failures.append(f'{plan}/{state}: {median:.1f} ms (budget {options["max_ms"]} ms)')
+
+        if failures:
+            raise CommandError('❌ Over budget: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('✅ All plans within budget'))
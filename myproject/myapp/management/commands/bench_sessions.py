@@ -0,0 +1,102 @@
+import statistics
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from myapp.models import Candidate, Company, Job, UserMaster
+
+ENGINES = ('db', 'cached_db', 'cache')
+
+
+def session_queries(captured):
+    return sum('django_session' in query['sql'] for query in captured)
+
+
+def create_sample_rows():
+    """A candidate and a job to benchmark with, rolled back afterwards"""
+    company = Company.objects.create(
+        user_id=UserMaster.objects.create(email='bench-company@example.invalid', password='-', role='company'),
+        firstname='Bench', lastname='Company', company_name='Bench Corp',
+    )
+    candidate = Candidate.objects.create(
+        user_id=UserMaster.objects.create(email='bench-candidate@example.invalid', password='-', role='candidate'),
+        first_name='Bench', last_name='Candidate', email='bench-candidate@example.invalid',
+    )
+    job = Job.objects.create(
+        company=company, company_name=company.company_name, title='Benchmark Engineer',
+        description='Measure session backends.', location='Bangalore', job_type='full-time',
+    )
+    return candidate, job
+
+
+def login_session(store, candidate):
+    """A session laid out the way the login view stores it"""
+    store.update({
+        'email': candidate.email,
+        'role': 'candidate',
+        'user_id': candidate.user_id_id,
+        'profile_id': candidate.pk,
+        'firstname': candidate.first_name,
+        'lastname': candidate.last_name,
+    })
+    store.save()
+    return store
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request queries and time for each session backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per page and backend')
+
+    def handle(self, *args, **options):
+        # Everything the benchmark writes (its own candidate and job, the
+        # sessions, views of the job) is rolled back at the end
+        with transaction.atomic():
+            self.benchmark(options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS(f'✅ Active backend: {settings.SESSION_ENGINE}'))
+
+    def benchmark(self, repeat):
+        candidate, job = create_sample_rows()
+        pages = [reverse('home'), reverse('browse_jobs'), reverse('job_detail', args=[job.pk]),
+                 reverse('my_applications')]
+
+        self.stdout.write(f'📊 {"backend":<10} {"page":<24} {"queries":>7} {"session":>7} {"median ms":>10}')
+        for engine in ENGINES:
+            with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+                                   ALLOWED_HOSTS=['testserver']):
+                caches[settings.SESSION_CACHE_ALIAS].clear()
+                store = login_session(import_module(settings.SESSION_ENGINE).SessionStore(), candidate)
+                client = Client()
+                client.cookies[settings.SESSION_COOKIE_NAME] = store.session_key
+                try:
+                    for page in pages:
+                        # First request warms the process-level caches
+                        client.get(page)
+                        queries, sessions, timings = [], [], []
+                        for _ in range(repeat):
+                            with CaptureQueriesContext(connection) as captured:
+                                started = time.perf_counter()
+                                client.get(page)
+                                timings.append((time.perf_counter() - started) * 1000)
+                            queries.append(len(captured))
+                            sessions.append(session_queries(captured))
+                        self.stdout.write(
+                            f'   {engine:<10} {page:<24} {max(queries):>7} {max(sessions):>7} '
+                            f'{statistics.median(timings):>10.2f}'
+                        )
+
+                    # What a login (or any session change) costs
+                    with CaptureQueriesContext(connection) as captured:
+                        store.save()
+                    self.stdout.write(f'   {engine:<10} {"(session save)":<24} {len(captured):>7} '
+                                      f'{session_queries(captured):>7}')
+                finally:
+                    store.delete()
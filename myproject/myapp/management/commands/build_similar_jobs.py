@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from myapp import similar
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed similar jobs of every active job'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of jobs whose neighbours are replaced per transaction',
+        )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Only refresh jobs saved since their neighbours were computed',
+        )
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            refreshed = 0
+            while True:
+                batch = similar.refresh_stale(batch_size=options['batch_size'])
+                if not batch:
+                    break
+                refreshed += batch
+            self.stdout.write(self.style.SUCCESS(f'✅ Refreshed similar jobs of {refreshed} saved jobs'))
+            return
+        self.stdout.write('🔧 Building similar jobs...')
+        stored = similar.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Stored {stored} neighbours for {len(similar.get_index())} jobs'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from myapp import geo
+
+
+class Command(BaseCommand):
+    help = 'Load the bundled city gazetteer and link jobs to structured locations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=str(geo.GAZETTEER_PATH),
+            help='Gazetteer JSON file to load',
+        )
+
+    def handle(self, *args, **options):
+        count = geo.load_gazetteer(options['path'])
+        self.stdout.write(f'📍 Loaded {count} locations')
+
+        matched = geo.link_jobs()
+        self.stdout.write(self.style.SUCCESS(f'✅ Linked {matched} jobs to a structured location'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from myapp import alerts
+
+
+class Command(BaseCommand):
+    help = 'Match jobs posted or edited since the last run against active job alerts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of jobs matched and checkpointed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        index = alerts.AlertIndex.build()
+        self.stdout.write(f'🔔 Matching new jobs against {len(index)} active alerts...')
+        processed, matched = alerts.match_new_jobs(batch_size=options['batch_size'], index=index)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Processed {processed} jobs ({matched} pending alert matches)'
+        ))
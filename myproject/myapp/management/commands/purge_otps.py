@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from myapp import otp
+
+
+class Command(BaseCommand):
+    help = 'Delete expired one-time codes'
+
+    def handle(self, *args, **options):
+        deleted = otp.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'✅ Deleted {deleted} expired one-time codes'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from myapp import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for jobs'
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write(
+                f'ℹ️  No FTS table to rebuild on {connection.vendor} '
+                f'(PostgreSQL maintains its GIN index automatically)'
+            )
+            return
+
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {count} jobs'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from myapp import digests
+from myapp.models import JobAlert
+
+
+class Command(BaseCommand):
+    help = 'Email pending job alert matches as one digest per candidate'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency',
+            choices=[key for key, _ in JobAlert.FREQUENCY_CHOICES],
+            default='daily',
+            help='Digest alerts with this frequency (schedule hourly or daily to match)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Candidates whose digests are sent and checkpointed together',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'📧 Sending {options["frequency"]} job alert digests...')
+        sent, notified = digests.send_digests(options['frequency'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Sent {sent} digests covering {notified} matches'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from myapp import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send due outbox emails, most urgent first and within the send rate budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Number of emails claimed per transaction (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep running, as a worker process')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = outbox.send_due(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'✅ Sent {sent} outbox emails ({failed} failed)'))
+            deferred = outbox.due().count()
+            if deferred:
+                self.stdout.write(f'⏳ {deferred} emails deferred by the send rate budget')
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
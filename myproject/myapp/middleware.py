@@ -0,0 +1,90 @@
+"""
+Per-request user and profile resolution.
+
+PortalUserMiddleware gives every request ``request.portal_user`` (the
+logged-in UserMaster, or None) and ``request.profile`` (their Candidate or
+Company, or None). Both resolve lazily on first use, from the ``user_id``
+and ``profile_id`` the login view stores in the session, through a
+short-lived cache (PORTAL_USER_CACHE_TIMEOUT seconds), so views no longer
+look the user up by email on every request. Saves and deletes of users and
+profiles evict their cache entries (see signals.py).
+
+Sessions from before ``user_id``/``profile_id`` were stored fall back to
+the email and get the ids filled in.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import Candidate, Company, UserMaster
+
+PROFILE_MODELS = {
+    'candidate': Candidate,
+    'company': Company,
+}
+
+
+def user_cache_key(user_id):
+    return f'portal:user:{user_id}'
+
+
+def profile_cache_key(role, profile_id):
+    return f'portal:{role}:{profile_id}'
+
+
+def resolve(session):
+    """``(user, profile)`` for a session; either may be None"""
+    email = session.get('email')
+    if not email:
+        return None, None
+    timeout = getattr(settings, 'PORTAL_USER_CACHE_TIMEOUT', 60)
+    user_id = session.get('user_id')
+    profile_id = session.get('profile_id')
+    role = session.get('role')
+
+    keys = []
+    if user_id:
+        keys.append(user_cache_key(user_id))
+    if profile_id and role in PROFILE_MODELS:
+        keys.append(profile_cache_key(role, profile_id))
+    cached = cache.get_many(keys) if keys else {}
+
+    user = cached.get(user_cache_key(user_id))
+    if user is None or user.email != email:
+        users = UserMaster.objects.filter(email=email)
+        user = (users.filter(pk=user_id) if user_id else users).first()
+        if user is None:
+            return None, None
+        cache.set(user_cache_key(user.pk), user, timeout)
+        if user_id != user.pk:
+            session['user_id'] = user.pk
+
+    model = PROFILE_MODELS.get(user.role)
+    if model is None:
+        return user, None
+    profile = cached.get(profile_cache_key(user.role, profile_id))
+    if profile is None or profile.user_id_id != user.pk:
+        profile = model.objects.filter(user_id=user).first()
+        if profile is None:
+            return user, None
+        cache.set(profile_cache_key(user.role, profile.pk), profile, timeout)
+        if profile_id != profile.pk:
+            session['profile_id'] = profile.pk
+    return user, profile
+
+
+class PortalUserMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        resolved = []
+
+        def identity():
+            if not resolved:
+                resolved.extend(resolve(request.session))
+            return resolved
+
+        request.portal_user = SimpleLazyObject(lambda: identity()[0])
+        request.profile = SimpleLazyObject(lambda: identity()[1])
+        return self.get_response(request)
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS myapp_job_fts USING fts5("
+                "title, company_name, skills_required, description, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except Exception:
+            # SQLite built without FTS5 - search falls back to icontains
+            return
+        schema_editor.execute(
+            "INSERT INTO myapp_job_fts (rowid, title, company_name, skills_required, description) "
+            "SELECT id, title, company_name, coalesce(skills_required, ''), description FROM myapp_job"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS myapp_job_search_gin ON myapp_job USING GIN ("
+            "to_tsvector('simple', "
+            "coalesce(\"myapp_job\".\"title\", '') || ' ' || "
+            "coalesce(\"myapp_job\".\"company_name\", '') || ' ' || "
+            "coalesce(\"myapp_job\".\"skills_required\", '') || ' ' || "
+            "coalesce(\"myapp_job\".\"description\", '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS myapp_job_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS myapp_job_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_alter_job_options_job_application_deadline_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_job_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='job_active_recent_idx'),
+        ),
+    ]
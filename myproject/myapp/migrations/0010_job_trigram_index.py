@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # SQLite and others use the in-process index in trigram.py
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS myapp_job_title_trgm ON myapp_job USING GIN (title gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS myapp_job_company_trgm ON myapp_job USING GIN (company_name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS myapp_job_title_trgm")
+    schema_editor.execute("DROP INDEX IF EXISTS myapp_job_company_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_job_salary_experience'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
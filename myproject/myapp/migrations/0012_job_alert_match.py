@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_similar_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobAlertMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='myapp.jobalert')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_matches', to='myapp.job')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['alert'], name='alertmatch_pending_idx')],
+                'unique_together': {('alert', 'job')},
+            },
+        ),
+    ]
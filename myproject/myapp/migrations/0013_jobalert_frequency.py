@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_job_alert_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobalert',
+            name='frequency',
+            field=models.CharField(choices=[('hourly', 'Hourly'), ('daily', 'Daily')], default='daily', max_length=10),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_jobalert_frequency'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usermaster',
+            name='otp',
+        ),
+        migrations.CreateModel(
+            name='OneTimeCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=50)),
+                ('purpose', models.CharField(choices=[('verify', 'Account verification'), ('reset', 'Password reset')], max_length=10)),
+                ('code', models.CharField(max_length=5)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='otp_expires_idx')],
+                'unique_together': {('email', 'purpose')},
+            },
+        ),
+    ]
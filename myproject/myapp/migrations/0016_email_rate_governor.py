@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='emailoutbox',
+            name='outbox_due_idx',
+        ),
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Critical (OTP, password reset)'), (5, 'Normal')], default=5),
+        ),
+        migrations.AddIndex(
+            model_name='emailoutbox',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['priority', 'next_attempt_at'], name='outbox_due_idx'),
+        ),
+    ]
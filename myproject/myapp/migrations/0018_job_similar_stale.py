@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_cache_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='similar_stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('similar_stale', True)), fields=['id'], name='job_similar_stale_idx'),
+        ),
+    ]
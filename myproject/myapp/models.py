@@ -3,7 +3,6 @@ from django.db import models
 class UserMaster(models.Model):
     email = models.EmailField(max_length=50)
     password = models.CharField(max_length=50)
-    otp = models.IntegerField()
     role = models.CharField(max_length=50)
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
@@ -32,6 +31,41 @@ class Candidate(models.Model):
     gender = models.CharField(max_length=50, blank=True, null=True)
     profile_pic = models.ImageField(upload_to='app/img/candidate', blank=True, null=True)
 
+class Location(models.Model):
+    name = models.CharField(max_length=100)
+    state = models.CharField(max_length=100, blank=True, null=True)
+    country = models.CharField(max_length=100)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    
+    class Meta:
+        ordering = ['name']
+        unique_together = ['name', 'country']
+        indexes = [
+            # Bounding-box prefilter for radius searches
+            models.Index(fields=['latitude', 'longitude'], name='location_lat_lon_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name}, {self.country}"
+
+class LocationAlias(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100, unique=True)  # normalized, lowercase
+    
+    def __str__(self):
+        return f"{self.alias} -> {self.location.name}"
+
+class Skill(models.Model):
+    name = models.CharField(max_length=100)
+    slug = models.CharField(max_length=100, unique=True)  # normalized key, see skills.py
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
 class Job(models.Model):
     JOB_TYPE_CHOICES = [
         ('full-time', 'Full Time'),
@@ -49,16 +83,43 @@ class Job(models.Model):
         ('10+', '10+ years'),
     ]
     
+    SALARY_CURRENCY_CHOICES = [
+        ('INR', 'INR'),
+        ('USD', 'USD'),
+        ('EUR', 'EUR'),
+        ('GBP', 'GBP'),
+    ]
+    
+    SALARY_PERIOD_CHOICES = [
+        ('year', 'Per year'),
+        ('month', 'Per month'),
+        ('week', 'Per week'),
+        ('day', 'Per day'),
+        ('hour', 'Per hour'),
+    ]
+    
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
     title = models.CharField(max_length=255)
     company_name = models.CharField(max_length=255)
     description = models.TextField()
     location = models.CharField(max_length=255)
+    # Gazetteer entry matched from `location` on save (see geo.py)
+    resolved_location = models.ForeignKey(Location, on_delete=models.SET_NULL, related_name='jobs', null=True, blank=True)
     job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES)
     experience_required = models.CharField(max_length=20, choices=EXPERIENCE_CHOICES, default='0-1')
     salary = models.CharField(max_length=100, blank=True, null=True)
+    # Parsed from `salary` and `experience_required` on save (see parsing.py).
+    # Salary amounts are annualized.
+    salary_min = models.PositiveBigIntegerField(blank=True, null=True)
+    salary_max = models.PositiveBigIntegerField(blank=True, null=True)
+    salary_currency = models.CharField(max_length=3, choices=SALARY_CURRENCY_CHOICES, blank=True, null=True)
+    salary_period = models.CharField(max_length=10, choices=SALARY_PERIOD_CHOICES, blank=True, null=True)
+    experience_min = models.PositiveSmallIntegerField(blank=True, null=True)
+    experience_max = models.PositiveSmallIntegerField(blank=True, null=True)
     requirements = models.TextField(blank=True, null=True)
     skills_required = models.TextField(blank=True, null=True)
+    # Parsed from skills_required when a job is saved (see signals.py)
+    skills = models.ManyToManyField(Skill, through='JobSkill', related_name='jobs', blank=True)
     responsibilities = models.TextField(blank=True, null=True)
     benefits = models.TextField(blank=True, null=True)
     application_deadline = models.DateField(blank=True, null=True)
@@ -66,11 +127,23 @@ class Job(models.Model):
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     views_count = models.IntegerField(default=0)
+    # Saved since its similar jobs were last computed (see similar.py)
+    similar_stale = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(similar_stale=True), name='job_similar_stale_idx'),
+            # Alert matching and index catch-up walk jobs saved since a point in time
+            models.Index(fields=['updated_at', 'id'], name='job_updated_idx'),
+            # Keyset pagination scans (is_active, created_at, id) in order
+            models.Index(fields=['is_active', '-created_at', '-id'], name='job_active_recent_idx'),
+            # "Sort by salary" pages and "salary >= X" filters
+            models.Index(fields=['is_active', '-salary_max', '-id'], name='job_active_salary_idx'),
+            models.Index(fields=['is_active', 'experience_min'], name='job_active_experience_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} at {self.company_name}"
@@ -78,6 +151,35 @@ class Job(models.Model):
     def get_applications_count(self):
         return self.applications.count()
 
+class JobSkill(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='job_skills')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='job_skills')
+    
+    class Meta:
+        unique_together = ['job', 'skill']
+        indexes = [
+            # Skill -> jobs lookups for skill filters and popularity counts
+            models.Index(fields=['skill', 'job'], name='jobskill_skill_job_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.job.title} requires {self.skill.name}"
+
+class SimilarJob(models.Model):
+    """A job's precomputed content neighbours, best first (see similar.py)"""
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='similar_jobs')
+    similar = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['job', 'rank']
+        # Also the (job, rank) index job_detail reads through
+        unique_together = ['job', 'rank']
+    
+    def __str__(self):
+        return f"{self.similar.title} is like {self.job.title}"
+
 class JobApplication(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -117,12 +219,120 @@ class SavedJob(models.Model):
         return f"{self.candidate.first_name} saved {self.job.title}"
 
 class JobAlert(models.Model):
+    FREQUENCY_CHOICES = [
+        ('hourly', 'Hourly'),
+        ('daily', 'Daily'),
+    ]
+    
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='job_alerts')
     keywords = models.CharField(max_length=255)
     location = models.CharField(max_length=255, blank=True, null=True)
     job_type = models.CharField(max_length=20, blank=True, null=True)
+    # How often matches are mailed as a digest (see digests.py)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='daily')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"Alert for {self.candidate.first_name}: {self.keywords}"
\ No newline at end of file
+        return f"Alert for {self.candidate.first_name}: {self.keywords}"
+
+
+class JobAlertMatch(models.Model):
+    """A job that satisfied an alert, pending until the candidate is notified (see alerts.py)"""
+    alert = models.ForeignKey(JobAlert, on_delete=models.CASCADE, related_name='matches')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='alert_matches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        unique_together = ['alert', 'job']
+        indexes = [
+            # Digests scan only the matches not yet sent
+            models.Index(fields=['alert'], condition=models.Q(notified_at__isnull=True),
+                         name='alertmatch_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.job.title} for alert {self.alert_id}"
+
+class Checkpoint(models.Model):
+    """Where a resumable batch job (alert matching, digests) got to"""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} at {self.position}"
+
+class CacheGeneration(models.Model):
+    """Current generation of a cache namespace, shared by every process (see caching.py)"""
+    namespace = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"{self.namespace} at {self.value}"
+
+class OneTimeCode(models.Model):
+    """A pending OTP for an email address, one per purpose (see otp.py)"""
+    PURPOSE_CHOICES = [
+        ('verify', 'Account verification'),
+        ('reset', 'Password reset'),
+    ]
+    
+    email = models.EmailField(max_length=50)
+    purpose = models.CharField(max_length=10, choices=PURPOSE_CHOICES)
+    code = models.CharField(max_length=5)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        # Also the index verification looks codes up through
+        unique_together = ['email', 'purpose']
+        indexes = [
+            # purge_expired() deletes by expiry
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_purpose_display()} code for {self.email}"
+
+class EmailOutbox(models.Model):
+    """An outgoing email, written in the transaction that caused it (see outbox.py)"""
+    # Lower goes first when the send rate is limited (see governor.py)
+    PRIORITY_CRITICAL = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_CHOICES = [
+        (PRIORITY_CRITICAL, 'Critical (OTP, password reset)'),
+        (PRIORITY_NORMAL, 'Normal'),
+    ]
+    
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When send_outbox may (re)try it; None once it has given up
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        indexes = [
+            # send_outbox claims only unsent rows, most urgent first
+            models.Index(fields=['priority', 'next_attempt_at'], condition=models.Q(sent_at__isnull=True),
+                         name='outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} to {self.to_email}"
+
+class RateBucket(models.Model):
+    """Tokens left in a send-rate budget shared by every process (see governor.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f} tokens"
@@ -0,0 +1,63 @@
+"""
+One-time codes for account verification and password resets.
+
+Codes live in OneTimeCode, one row per email address and purpose, rather
+than on UserMaster: issuing a code rewrites that narrow row (a resend
+replaces the previous code and resets its attempts) and never touches the
+user. A code expires OTP_TTL_SECONDS after it was issued, as the emails
+promise, and stops being accepted after OTP_MAX_ATTEMPTS wrong guesses.
+
+Checking a code is one lookup on (email, purpose); a correct code is
+deleted as it is accepted, so it cannot be used twice. Expired rows are
+removed by purge_expired() (the purge_otps command).
+"""
+from datetime import timedelta
+from random import randint
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .models import OneTimeCode
+
+VERIFY = 'verify'
+RESET = 'reset'
+
+# check() results
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+def issue(email, purpose):
+    """A new code for ``email``, replacing any pending one for ``purpose``"""
+    code = str(randint(10000, 99999))
+    ttl = getattr(settings, 'OTP_TTL_SECONDS', 600)
+    OneTimeCode.objects.update_or_create(
+        email=email, purpose=purpose,
+        defaults={'code': code, 'attempts': 0, 'expires_at': timezone.now() + timedelta(seconds=ttl)},
+    )
+    return code
+
+
+def check(email, purpose, code):
+    """VALID (and the code is used up), INVALID, EXPIRED or LOCKED"""
+    pending = OneTimeCode.objects.filter(email=email, purpose=purpose).first()
+    if pending is None or pending.expires_at <= timezone.now():
+        return EXPIRED
+    if pending.attempts >= getattr(settings, 'OTP_MAX_ATTEMPTS', 5):
+        return LOCKED
+    if not constant_time_compare(pending.code, str(code)):
+        OneTimeCode.objects.filter(pk=pending.pk).update(attempts=F('attempts') + 1)
+        return INVALID
+    # Only one of two concurrent requests with the right code gets to delete it
+    deleted, _ = OneTimeCode.objects.filter(pk=pending.pk, code=pending.code).delete()
+    return VALID if deleted else EXPIRED
+
+
+def purge_expired():
+    """Delete expired codes. Returns the number deleted."""
+    deleted, _ = OneTimeCode.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
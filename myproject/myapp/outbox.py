@@ -0,0 +1,188 @@
+"""
+Durable outgoing email.
+
+send_email() (views.py) writes every message to EmailOutbox within the
+caller's transaction: an application, status change or registration that
+rolls back takes its email with it, and one that commits has its email on
+disk even if the process dies before it is sent.
+
+Once the transaction commits the message is handed to the in-process mail
+workers (mailer.py), which mark the row sent, if the send-rate budget
+allows (see governor.py). Over budget, the process tries once more when
+the tokens are back, if that is within EMAIL_RATE_MAX_DEFER seconds;
+otherwise, or if it is still over budget then, the row is due right away.
+Rows the workers do not get to (a full queue, a killed worker, an SMTP
+error) become due EMAIL_OUTBOX_GRACE seconds after they were written.
+
+``manage.py send_outbox`` sends the due rows, critical ones (OTP, password
+reset) first, as far as the budget goes. It claims them in batches with
+SELECT ... FOR UPDATE SKIP LOCKED, so concurrent runs never claim the same
+row, and pushes each claimed row's next attempt back by an exponential
+backoff before sending it. After
+EMAIL_OUTBOX_MAX_ATTEMPTS attempts a row is given up on
+(``next_attempt_at`` is cleared) and left for inspection in the admin.
+"""
+import logging
+import threading
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import governor, mailer
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# Retry delays: RETRY_BASE after the first attempt, doubling up to RETRY_MAX
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=6)
+
+
+def backoff(attempts):
+    """Delay before the attempt after ``attempts`` tries"""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def build_message(row):
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[row.to_email],
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def enqueue(to_email, subject, body, html_body='', priority=EmailOutbox.PRIORITY_NORMAL):
+    """Write an outbox row in the current transaction; it is sent once that commits"""
+    grace = getattr(settings, 'EMAIL_OUTBOX_GRACE', 120)
+    # A savepoint, so a failed write does not break the caller's transaction
+    with transaction.atomic():
+        row = EmailOutbox.objects.create(
+            to_email=to_email, subject=subject, body=body, html_body=html_body, priority=priority,
+            next_attempt_at=timezone.now() + timedelta(seconds=grace),
+        )
+        transaction.on_commit(partial(_dispatch, row))
+    return row
+
+
+def _dispatch(row, retry=True):
+    critical = row.priority == EmailOutbox.PRIORITY_CRITICAL
+    if governor.acquire(critical=critical):
+        if not mailer.submit(build_message(row), on_sent=partial(_sent, row.pk)):
+            # Not sent (the queue stayed full): send_outbox needs the token
+            governor.give_back(1)
+        return
+    wait = governor.wait_time(critical=critical) if retry else None
+    if wait is not None and wait <= getattr(settings, 'EMAIL_RATE_MAX_DEFER', 60):
+        # Try again here once the tokens are back; send_outbox only steps
+        # in after the usual grace period from then
+        grace = getattr(settings, 'EMAIL_OUTBOX_GRACE', 120)
+        EmailOutbox.objects.filter(pk=row.pk).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=wait + grace),
+        )
+        timer = threading.Timer(wait, _retry, args=(row,))
+        timer.daemon = True
+        timer.start()
+        return
+    # send_outbox sends it, in priority order, as tokens come back
+    logger.warning(f"⏳ Email send rate over budget, deferring email {row.pk} to {row.to_email}")
+    EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+
+
+def _retry(row):
+    try:
+        _dispatch(row, retry=False)
+    except Exception as e:
+        logger.error(f"❌ Retrying email {row.pk} failed: {str(e)}")
+    finally:
+        # Runs in the timer's thread
+        close_old_connections()
+
+
+def _sent(row_id, sent):
+    # Failures are left to send_outbox, due once the grace period is over
+    if sent:
+        EmailOutbox.objects.filter(pk=row_id, sent_at__isnull=True).update(sent_at=timezone.now())
+
+
+def due(now=None):
+    return EmailOutbox.objects.filter(sent_at__isnull=True, next_attempt_at__lte=now or timezone.now())
+
+
+def claim(batch_size, critical=False):
+    """
+    Due rows of one class (critical or the rest), up to ``batch_size``, with
+    their next attempt already pushed back
+    """
+    now = timezone.now()
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+    if critical:
+        rows = due(now).filter(priority__lte=EmailOutbox.PRIORITY_CRITICAL)
+    else:
+        rows = due(now).filter(priority__gt=EmailOutbox.PRIORITY_CRITICAL)
+    with transaction.atomic():
+        rows = list(
+            rows.select_for_update(skip_locked=True)
+            .order_by('priority', 'next_attempt_at')[:batch_size]
+        )
+        for row in rows:
+            row.attempts += 1
+            row.next_attempt_at = now + backoff(row.attempts) if row.attempts < max_attempts else None
+        EmailOutbox.objects.bulk_update(rows, ['attempts', 'next_attempt_at'])
+    return rows
+
+
+def send_due(batch_size=None, connection=None):
+    """
+    Send due outbox rows, critical ones first, a batch at a time, over one
+    SMTP connection, until none are left or the send budget runs out.
+    Returns ``(sent, failed)``.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    connection = connection or get_connection()
+    sent = failed = 0
+    try:
+        for critical in (True, False):
+            while True:
+                granted = governor.take(batch_size, keep=governor.reserve_for(critical), partial=True)
+                rows = claim(granted, critical) if granted else []
+                governor.give_back(granted - len(rows))
+                if not rows:
+                    break
+                batch_sent, batch_failed = _send_rows(rows, connection)
+                sent += batch_sent
+                failed += batch_failed
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _send_rows(rows, connection):
+    sent_ids = []
+    for row in rows:
+        message = build_message(row)
+        try:
+            # Opens the connection for the first row and after a failure, and
+            # is a no-op otherwise; left closed, the SMTP backend would open
+            # and close a connection per message
+            connection.open()
+            try:
+                connection.send_messages([message])
+            except mailer.STALE_CONNECTION_ERRORS:
+                connection.close()
+                connection.open()
+                connection.send_messages([message])
+            sent_ids.append(row.pk)
+        except Exception as e:
+            logger.error(f"❌ Outbox email {row.pk} to {row.to_email} failed: {str(e)}")
+            EmailOutbox.objects.filter(pk=row.pk).update(last_error=str(e))
+            connection.close()
+    EmailOutbox.objects.filter(pk__in=sent_ids).update(sent_at=timezone.now(), last_error='')
+    return len(sent_ids), len(rows) - len(sent_ids)
@@ -0,0 +1,136 @@
+"""
+Keyset (cursor) pagination for job listings.
+
+Pages are addressed by the (sort key, id) of the last row seen instead of
+an OFFSET, so every page costs one indexed range scan no matter how deep the
+visitor goes. The default key is created_at, matching Job.Meta.ordering,
+with id as a tie-breaker; rows are always listed in descending order.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+DEFAULT_KEY = 'created_at'
+
+
+def get_page_size(value=None):
+    """Resolve the requested page size, clamped to the configured maximum"""
+    default = getattr(settings, 'JOB_LIST_PAGE_SIZE', 20)
+    maximum = getattr(settings, 'JOB_LIST_MAX_PAGE_SIZE', 100)
+    try:
+        size = int(value) if value else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(obj, key=DEFAULT_KEY):
+    value = getattr(obj, key)
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = json.dumps([key, value, obj.pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, key=DEFAULT_KEY):
+    """Return (key value, id) for a cursor token, or None if it is malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_key, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if cursor_key != key or value is None:
+            return None
+        try:
+            field = model._meta.get_field(key)
+        except FieldDoesNotExist:
+            # Computed keys, such as relevance scores, are plain numbers
+            return float(value), int(pk)
+        return field.to_python(value), int(pk)
+    except (ValueError, TypeError, ValidationError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, page_size, key=DEFAULT_KEY, cursors=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.page_size = page_size
+        if cursors is not None:
+            self.next_cursor, self.prev_cursor = cursors
+        else:
+            self.next_cursor = encode_cursor(object_list[-1], key) if has_next and object_list else None
+            self.prev_cursor = encode_cursor(object_list[0], key) if has_previous and object_list else None
+        # Set by paginators that learn the match count for free
+        self.total = None
+        self.next_query = None
+        self.prev_query = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def build_links(self, params):
+        """Set next_query/prev_query querystrings, keeping the current filters"""
+        for attr, direction, cursor in (('next_query', 'after', self.next_cursor),
+                                        ('prev_query', 'before', self.prev_cursor)):
+            if not cursor:
+                continue
+            query = params.copy()
+            query.pop('after', None)
+            query.pop('before', None)
+            query[direction] = cursor
+            setattr(self, attr, query.urlencode())
+
+
+def paginate(queryset, after=None, before=None, page_size=None, key=DEFAULT_KEY):
+    """
+    Return one KeysetPage of ``queryset`` ordered by ``key`` descending.
+
+    ``after`` continues past the given cursor, ``before`` goes back to the
+    rows preceding it. Invalid cursors are treated as the first page.
+    ``key`` must not be NULL for any row in ``queryset``.
+    """
+    page_size = get_page_size(page_size)
+    after_key = decode_cursor(after, queryset.model, key)
+    before_key = decode_cursor(before, queryset.model, key)
+
+    if before_key and not after_key:
+        value, pk = before_key
+        rows = list(
+            queryset.filter(Q(**{f'{key}__gt': value}) | Q(**{key: value, 'id__gt': pk}))
+            .order_by(key, 'id')[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_previous=has_previous, page_size=page_size, key=key)
+
+    queryset = queryset.order_by(f'-{key}', '-id')
+    if after_key:
+        value, pk = after_key
+        queryset = queryset.filter(Q(**{f'{key}__lt': value}) | Q(**{key: value, 'id__lt': pk}))
+    rows = list(queryset[:page_size + 1])
+    has_next = len(rows) > page_size
+    return KeysetPage(rows[:page_size], has_next=has_next, has_previous=bool(after_key),
+                      page_size=page_size, key=key)
+
+
+def paginate_request(queryset, request, key=DEFAULT_KEY):
+    """Paginate using the after/before/page_size GET parameters of ``request``"""
+    page = paginate(
+        queryset,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=request.GET.get('page_size'),
+        key=key,
+    )
+    page.build_links(request.GET)
+    return page
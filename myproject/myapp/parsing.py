@@ -0,0 +1,191 @@
+"""
+Structured salary and experience values for jobs.
+
+``Job.salary`` is whatever the employer typed ("₹15,00,000 - ₹25,00,000 per
+annum", "10-15 LPA", "$50k - $70k", "INR 40,000/month") and
+``experience_required`` is a choice like '3-5' or '10+'. The parsers here
+turn them into numbers that are stored in indexed columns on save, so
+listing filters and sorting by salary are plain range scans.
+
+Salary amounts are stored annualized, so a monthly and a yearly posting in
+the same currency can be compared directly; ``salary_period`` keeps the
+period the employer quoted.
+"""
+import re
+
+from .caching import bump_generation
+from .models import Job
+
+# Text that identifies a currency, checked in order. '???' is how the
+# rupee sign was mangled in older rows (see scripts/fix_salary.py).
+CURRENCY_MARKERS = [
+    ('INR', ('₹', '???', 'inr', 'rs.', 'rs ', 'rupee', 'lpa', 'lakh', 'lac', 'crore')),
+    ('USD', ('$', 'usd')),
+    ('EUR', ('€', 'eur')),
+    ('GBP', ('£', 'gbp')),
+]
+
+# Multiplier to turn an amount for the period into a yearly amount
+ANNUAL_FACTORS = {
+    'year': 1,
+    'month': 12,
+    'week': 52,
+    'day': 260,
+    'hour': 2080,
+}
+
+PERIOD_PATTERNS = [
+    ('hour', re.compile(r'(\bper\s+hour|\bhourly|/\s*(hr|hour)|\ban?\s+hour|\bp\.?h)\b')),
+    ('day', re.compile(r'(\bper\s+day|\bdaily|/\s*day|\ba\s+day)\b')),
+    ('week', re.compile(r'(\bper\s+week|\bweekly|/\s*(wk|week)|\ba\s+week)\b')),
+    ('month', re.compile(r'(\bper\s+month|\bmonthly|/\s*(mo|month)|\ba\s+month|\bp\.?m)\b')),
+]
+
+UNIT_MULTIPLIERS = {
+    'k': 1_000,
+    'thousand': 1_000,
+    'l': 100_000,
+    'lpa': 100_000,
+    'lac': 100_000,
+    'lacs': 100_000,
+    'lakh': 100_000,
+    'lakhs': 100_000,
+    'cr': 10_000_000,
+    'crore': 10_000_000,
+    'crores': 10_000_000,
+    'm': 1_000_000,
+    'mn': 1_000_000,
+    'million': 1_000_000,
+}
+
+AMOUNT_RE = re.compile(
+    r'(\d[\d,]*(?:\.\d+)?)\s*'
+    r'(k|thousand|lpa|lakhs?|lacs?|l|crores?|cr|million|mn|m)?\b',
+    re.IGNORECASE,
+)
+
+# What may sit between the two ends of a range: "10 - 15", "₹10L to ₹15L"
+RANGE_SEPARATOR_RE = re.compile(r'^[\s\W]*(-|–|—|to)[\s\W]*(inr|usd|eur|gbp|rs)?[\s.]*$', re.IGNORECASE)
+
+EXPERIENCE_RE = re.compile(r'(\d+)\s*(?:-|to)?\s*(\d+)?\s*(\+)?')
+
+
+def parse_currency(text):
+    lowered = (text or '').lower()
+    for code, markers in CURRENCY_MARKERS:
+        if any(marker in lowered for marker in markers):
+            return code
+    return None
+
+
+def parse_period(text):
+    lowered = (text or '').lower()
+    for period, pattern in PERIOD_PATTERNS:
+        if pattern.search(lowered):
+            return period
+    return 'year'
+
+
+def parse_salary(text):
+    """
+    Parse a free-text salary into a dict with ``salary_min``, ``salary_max``
+    (annualized whole amounts), ``salary_currency`` and ``salary_period``.
+
+    Returns None when no amount can be found. A unit on the last number
+    applies to bare numbers before it, so "10-15 LPA" is 10 to 15 lakh.
+    """
+    text = text or ''
+    matches = list(AMOUNT_RE.finditer(text))[:2]
+    if not matches:
+        return None
+    # Only a second number joined by a range separator is the upper end;
+    # anything else ("12 LPA, 2 openings") is not part of the salary
+    if len(matches) == 2 and not RANGE_SEPARATOR_RE.match(text[matches[0].end():matches[1].start()]):
+        matches = matches[:1]
+
+    amounts = []
+    for match in matches:
+        try:
+            value = float(match.group(1).replace(',', ''))
+        except ValueError:
+            return None
+        amounts.append((value, (match.group(2) or '').lower()))
+
+    last_unit = amounts[-1][1]
+    values = [value * UNIT_MULTIPLIERS.get(unit or last_unit, 1) for value, unit in amounts]
+    low, high = min(values), max(values)
+    if high <= 0:
+        return None
+
+    period = parse_period(text)
+    factor = ANNUAL_FACTORS[period]
+    return {
+        'salary_min': int(round(low * factor)),
+        'salary_max': int(round(high * factor)),
+        'salary_currency': parse_currency(text),
+        'salary_period': period,
+    }
+
+
+def parse_experience(value):
+    """Return ``(min_years, max_years)`` for '3-5', '10+' or '2'; max is None when open-ended"""
+    match = EXPERIENCE_RE.search(value or '')
+    if not match:
+        return None, None
+    low = int(match.group(1))
+    if match.group(3):
+        return low, None
+    high = int(match.group(2)) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+
+def parse_amount(value):
+    """A whole number from a request parameter like '1500000' or '15 lakh', or None"""
+    parsed = parse_salary(value) if value else None
+    return parsed['salary_min'] if parsed else None
+
+
+def parse_years(value):
+    """Whole years from a request parameter, or None"""
+    try:
+        years = int(value)
+    except (TypeError, ValueError):
+        return None
+    return years if 0 <= years <= 50 else None
+
+
+def structured_fields(job):
+    """Values of the parsed salary/experience columns for ``job``"""
+    salary = parse_salary(job.salary) or {
+        'salary_min': None, 'salary_max': None, 'salary_currency': None, 'salary_period': None,
+    }
+    experience_min, experience_max = parse_experience(job.experience_required)
+    return dict(salary, experience_min=experience_min, experience_max=experience_max)
+
+
+STRUCTURED_FIELDS = (
+    'salary_min', 'salary_max', 'salary_currency', 'salary_period',
+    'experience_min', 'experience_max',
+)
+
+
+def backfill(queryset=None, batch_size=500):
+    """Fill the parsed columns for every job in ``queryset``. Returns how many changed."""
+    queryset = queryset if queryset is not None else Job.objects.all()
+    changed = []
+    updated = 0
+    for job in queryset.only('id', 'salary', 'experience_required', *STRUCTURED_FIELDS).iterator(chunk_size=batch_size):
+        values = structured_fields(job)
+        if all(getattr(job, field) == value for field, value in values.items()):
+            continue
+        for field, value in values.items():
+            setattr(job, field, value)
+        changed.append(job)
+        if len(changed) >= batch_size:
+            updated += Job.objects.bulk_update(changed, STRUCTURED_FIELDS)
+            changed = []
+    if changed:
+        updated += Job.objects.bulk_update(changed, STRUCTURED_FIELDS)
+    if updated:
+        bump_generation()
+    return updated
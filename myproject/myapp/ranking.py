@@ -0,0 +1,260 @@
+"""
+Relevance ranking for job search (``sort=relevance``).
+
+The database still decides *which* jobs match (search.apply_search plus the
+listing filters); this module decides their order. Matches are scored with
+field-weighted BM25, so a "Python Developer" title outranks a description
+that mentions python once.
+
+Term statistics live in an in-process index over active jobs. Postings are
+kept per field as parallel ``array`` columns (document numbers and term
+frequencies) rather than Python objects, which keeps 100k jobs in a few MB.
+New and edited jobs are appended (document numbers only grow, so postings
+stay sorted) and replaced ones are tombstoned; the index is rebuilt when the
+tombstones pile up. Document frequencies count live documents only, so
+idf does not drift while tombstones wait for that rebuild.
+indexing.LiveIndex keeps the index in step with other processes, and
+gunicorn.conf.py builds it before the web workers fork, so no request
+pays for the build.
+"""
+import bisect
+import heapq
+import math
+from array import array
+from collections import Counter
+
+from .indexing import LiveIndex
+from .models import Job
+from .pagination import KeysetPage, decode_cursor, get_page_size
+from .search import TOKEN_RE, tokenize
+
+# Field weights: a title hit counts three times a description hit
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'skills_required': 2.0,
+    'company_name': 1.5,
+    'description': 1.0,
+}
+K1 = 1.2
+B = 0.75
+# Query words also match index terms they are a prefix of ("pyth" ->
+# "python"), like the FTS search does; cap the expansion per word
+MAX_EXPANSIONS = 32
+# Rebuild once this share of document numbers belongs to removed jobs
+MAX_TOMBSTONE_RATIO = 0.25
+MAX_TF = 65535
+
+
+class FieldIndex:
+    def __init__(self):
+        # term -> (array of document numbers, array of term frequencies)
+        self.postings = {}
+        # term -> term id; term id -> number of live documents containing it
+        self.term_ids = {}
+        self.df = array('I')
+        # Term ids of each document, back to back: those of document n are
+        # doc_terms[doc_offsets[n]:doc_offsets[n + 1]]
+        self.doc_terms = array('I')
+        self.doc_offsets = array('Q', [0])
+        # document number -> token count
+        self.lengths = array('H')
+        self.total_length = 0
+
+    def add(self, docno, tokens):
+        counts = Counter(tokens)
+        postings = self.postings
+        for term, tf in counts.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array('I'), array('H'))
+                self.term_ids[term] = len(self.df)
+                self.df.append(0)
+            entry[0].append(docno)
+            entry[1].append(tf if tf < MAX_TF else MAX_TF)
+            term_id = self.term_ids[term]
+            self.df[term_id] += 1
+            self.doc_terms.append(term_id)
+        self.doc_offsets.append(len(self.doc_terms))
+        length = min(len(tokens), MAX_TF)
+        self.lengths.append(length)
+        self.total_length += length
+        return counts.keys()
+
+    def remove(self, docno):
+        """Take a tombstoned document out of the statistics"""
+        for term_id in self.doc_terms[self.doc_offsets[docno]:self.doc_offsets[docno + 1]]:
+            self.df[term_id] -= 1
+        self.total_length -= self.lengths[docno]
+
+
+class RelevanceIndex:
+    def __init__(self):
+        self.fields = {name: FieldIndex() for name in FIELD_WEIGHTS}
+        # document number -> job id (0 once the job is removed)
+        self.doc_ids = array('q')
+        self.docnos = {}
+        self.vocabulary = []
+        self.generation = None
+        # Set by indexing.LiveIndex
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self.docnos)
+
+    @property
+    def tombstones(self):
+        return len(self.doc_ids) - len(self.docnos)
+
+    def add_job(self, job_id, texts, _bulk=False):
+        """Index one job; ``texts`` maps field name to its text"""
+        self.remove_job(job_id)
+        docno = len(self.doc_ids)
+        self.doc_ids.append(job_id)
+        self.docnos[job_id] = docno
+        for name, field in self.fields.items():
+            for term in field.add(docno, TOKEN_RE.findall((texts.get(name) or '').lower())):
+                if _bulk:
+                    continue
+                position = bisect.bisect_left(self.vocabulary, term)
+                if position == len(self.vocabulary) or self.vocabulary[position] != term:
+                    self.vocabulary.insert(position, term)
+
+    def job_ids(self):
+        return set(self.docnos)
+
+    def needs_rebuild(self):
+        return self.tombstones > MAX_TOMBSTONE_RATIO * max(len(self), 1)
+
+    def remove_job(self, job_id):
+        docno = self.docnos.pop(job_id, None)
+        if docno is None:
+            return
+        self.doc_ids[docno] = 0
+        for field in self.fields.values():
+            field.remove(docno)
+
+    def finish_bulk(self):
+        terms = set()
+        for field in self.fields.values():
+            terms.update(field.postings)
+        self.vocabulary = sorted(terms)
+
+    def expand(self, word):
+        """Index terms equal to or starting with ``word``"""
+        terms = []
+        position = bisect.bisect_left(self.vocabulary, word)
+        while (position < len(self.vocabulary) and len(terms) < MAX_EXPANSIONS
+               and self.vocabulary[position].startswith(word)):
+            terms.append(self.vocabulary[position])
+            position += 1
+        return terms
+
+    def score(self, query, job_ids):
+        """BM25 scores for ``job_ids`` against ``query`` as ``{job_id: score}``"""
+        scores = dict.fromkeys(job_ids, 0.0)
+        wanted = {self.docnos[job_id] for job_id in job_ids if job_id in self.docnos}
+        if not wanted:
+            return scores
+
+        live = len(self.docnos)
+        doc_ids = self.doc_ids
+        for word in set(tokenize(query)):
+            for term in self.expand(word):
+                for name, weight in FIELD_WEIGHTS.items():
+                    field = self.fields[name]
+                    entry = field.postings.get(term)
+                    if entry is None:
+                        continue
+                    docnos, tfs = entry
+                    df = field.df[field.term_ids[term]]
+                    if not df:
+                        continue
+                    idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                    average = (field.total_length / live) or 1.0
+                    lengths = field.lengths
+                    for docno, tf in zip(docnos, tfs):
+                        if docno not in wanted:
+                            continue
+                        norm = K1 * (1 - B + B * lengths[docno] / average)
+                        scores[doc_ids[docno]] += weight * idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+
+_live = LiveIndex(RelevanceIndex, FIELD_WEIGHTS)
+get_index = _live.get
+job_changed = _live.job_changed
+job_removed = _live.job_removed
+
+
+# ============================================
+# RANKED PAGES
+# ============================================
+
+def rank_by(queryset, scorer, after=None, before=None, page_size=None, only=None):
+    """
+    Return one KeysetPage of ``queryset`` ordered by ``scorer(job_ids)``,
+    a ``{job_id: score}`` mapping (jobs it leaves out are dropped).
+
+    Only the matching IDs are read from the database; they are scored in
+    memory and just the page's rows are fetched. Cursors carry the
+    (score, id) of the edge row. ``page.total`` is the number of matches.
+    ``only`` limits the columns loaded for the page's rows.
+    """
+    page_size = get_page_size(page_size)
+    job_ids = list(queryset.order_by().values_list('id', flat=True))
+    scores = scorer(job_ids)
+    ranked = ((score, job_id) for job_id, score in scores.items())
+
+    after_key = decode_cursor(after, Job, 'relevance')
+    before_key = decode_cursor(before, Job, 'relevance')
+    if before_key and not after_key:
+        top = heapq.nsmallest(page_size + 1, (item for item in ranked if item > before_key))
+        has_previous = len(top) > page_size
+        top = top[:page_size]
+        top.reverse()
+        has_next = True
+    else:
+        if after_key:
+            ranked = (item for item in ranked if item < after_key)
+        top = heapq.nlargest(page_size + 1, ranked)
+        has_next = len(top) > page_size
+        top = top[:page_size]
+        has_previous = bool(after_key)
+
+    manager = queryset.model.objects
+    rows = (manager.only(*only) if only else manager).in_bulk([job_id for _, job_id in top])
+    jobs = []
+    for score, job_id in top:
+        job = rows.get(job_id)
+        if job is not None:
+            job.relevance = score
+            jobs.append(job)
+    page = KeysetPage(jobs, has_next=has_next, has_previous=has_previous,
+                      page_size=page_size, key='relevance')
+    page.total = len(scores)
+    return page
+
+
+def rank(queryset, query, after=None, before=None, page_size=None, only=None):
+    """rank_by() BM25 relevance to ``query``"""
+    return rank_by(queryset, lambda job_ids: get_index().score(query, job_ids),
+                   after, before, page_size, only)
+
+
+def paginate_request(queryset, request, query, only=None):
+    """rank() using the after/before/page_size GET parameters of ``request``"""
+    page = rank(
+        queryset,
+        query,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=request.GET.get('page_size'),
+        only=only,
+    )
+    page.build_links(request.GET)
+    return page
+
+
+def paginator(query, only=None):
+    """A cached_job_page() paginator that orders matches by relevance to ``query``"""
+    return lambda queryset, request: paginate_request(queryset, request, query, only)
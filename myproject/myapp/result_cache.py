@@ -0,0 +1,70 @@
+"""
+Result cache for the job listing views.
+
+Popular searches repeat a lot, so instead of re-running the filter chain
+and a separate COUNT on every request we keep, per normalized set of
+filters and page cursor, the ordered job IDs of the page plus the total
+match count. A hit then costs a single primary-key lookup.
+
+Entries live in the ``job_results`` cache (LocMemCache: per-entry TTL and
+least-recently-used culling once MAX_ENTRIES is reached) and are keyed
+under the jobs generation, so any Job save/delete invalidates them, in
+every process once it reads the new generation (see caching.py).
+"""
+from django.core.cache import caches
+
+from .caching import make_key
+from .models import Job
+from .pagination import DEFAULT_KEY, KeysetPage, get_page_size, paginate_request
+
+RESULTS_CACHE = 'job_results'
+
+
+def get_results_cache():
+    return caches[RESULTS_CACHE]
+
+
+def cached_job_page(queryset, request, filters, key=DEFAULT_KEY, paginator=None, count=None, only=None):
+    """
+    Return ``(page, total)`` for ``queryset`` paginated by ``request``
+    on the ``key`` field.
+
+    ``filters`` holds the normalized search/location/job_type/experience
+    values that produced ``queryset``; together with the cursor they form
+    the cache key. ``paginator(queryset, request)`` replaces keyset
+    pagination on ``key``, e.g. for relevance ranking; ``count(page)``
+    replaces ``queryset.count()`` for the total. ``only`` limits the
+    columns loaded for cached pages.
+    """
+    params = dict(filters)
+    params.update({
+        'key': key,
+        'after': request.GET.get('after', ''),
+        'before': request.GET.get('before', ''),
+        'page_size': get_page_size(request.GET.get('page_size')),
+    })
+    cache_key = make_key('results', params)
+    results_cache = get_results_cache()
+
+    cached = results_cache.get(cache_key)
+    if cached is not None:
+        ids, total, cursors = cached
+        rows = (Job.objects.only(*only) if only else Job.objects).in_bulk(ids)
+        page = KeysetPage(
+            [rows[pk] for pk in ids if pk in rows],
+            has_next=cursors[0] is not None, has_previous=cursors[1] is not None,
+            page_size=params['page_size'], cursors=cursors,
+        )
+        page.build_links(request.GET)
+        return page, total
+
+    if paginator is not None:
+        page = paginator(queryset, request)
+    else:
+        page = paginate_request(queryset, request, key=key)
+    if count is not None:
+        total = count(page)
+    else:
+        total = page.total if page.total is not None else queryset.count()
+    results_cache.set(cache_key, ([job.pk for job in page], total, (page.next_cursor, page.prev_cursor)))
+    return page, total
@@ -0,0 +1,122 @@
+"""
+Full-text search over job postings.
+
+SQLite uses an FTS5 virtual table (``myapp_job_fts``) that is kept in sync from
+the Job signals. PostgreSQL uses a GIN index over a ``to_tsvector`` expression,
+which the database maintains by itself. Any other backend (or an SQLite build
+without FTS5) falls back to the old ``icontains`` scan.
+"""
+import logging
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'myapp_job_fts'
+SEARCH_FIELDS = ('title', 'company_name', 'skills_required', 'description')
+
+# Must stay identical to the expression indexed in migration 0005,
+# otherwise PostgreSQL will not use the GIN index.
+PG_DOCUMENT = (
+    "to_tsvector('simple', "
+    "coalesce(\"myapp_job\".\"title\", '') || ' ' || "
+    "coalesce(\"myapp_job\".\"company_name\", '') || ' ' || "
+    "coalesce(\"myapp_job\".\"skills_required\", '') || ' ' || "
+    "coalesce(\"myapp_job\".\"description\", ''))"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts_ready = None
+
+
+def tokenize(text):
+    """Split a search string into lowercase word tokens"""
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+def fts_enabled():
+    """True when the SQLite FTS5 table exists in the current database"""
+    global _fts_ready
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_ready is None:
+        with connection.cursor() as cursor:
+            _fts_ready = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_ready
+
+
+def _icontains_q(query):
+    q = Q()
+    for field in SEARCH_FIELDS:
+        q |= Q(**{f'{field}__icontains': query})
+    return q
+
+
+def apply_search(queryset, query):
+    """
+    Restrict a Job queryset to postings matching ``query``.
+
+    Every word in the query has to match (as a prefix) somewhere in the
+    title, company name, skills or description.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset
+
+    if fts_enabled():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)
+        ))
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(RawSQL(
+            f"{PG_DOCUMENT} @@ to_tsquery('simple', %s)", (tsquery,),
+            output_field=BooleanField(),
+        ))
+
+    return queryset.filter(_icontains_q(query))
+
+
+# ============================================
+# INDEX MAINTENANCE (SQLite FTS5 only)
+# ============================================
+
+def index_job(job):
+    """Insert or refresh a job in the FTS table"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [job.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, company_name, skills_required, description) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            [job.pk, job.title, job.company_name, job.skills_required or '', job.description],
+        )
+
+
+def unindex_job(job_id):
+    """Remove a job from the FTS table"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [job_id])
+
+
+def rebuild_index():
+    """Repopulate the FTS table from the Job table. Returns the row count."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, company_name, skills_required, description) '
+            f'SELECT id, title, company_name, coalesce(skills_required, \'\'), description FROM myapp_job'
+        )
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
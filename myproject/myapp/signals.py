@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Job, Location, LocationAlias, UserMaster, Candidate, Company
+from . import search, suggest, ranking, trigram, similar
+from .geo import LOCATIONS_NAMESPACE, resolve_location
+from .caching import bump_generation
+from .middleware import user_cache_key, profile_cache_key
+from .parsing import structured_fields
+from .skills import sync_job_skills
+
+
+@receiver(pre_save, sender=Job)
+def job_resolve_location(sender, instance, update_fields=None, **kwargs):
+    """Match the free-text location against the gazetteer"""
+    if update_fields is None or 'location' in update_fields:
+        instance.resolved_location = resolve_location(instance.location)
+
+
+@receiver(pre_save, sender=Job)
+def job_parse_salary_experience(sender, instance, update_fields=None, **kwargs):
+    """Fill the numeric salary/experience columns from their text fields"""
+    if update_fields is None or {'salary', 'experience_required'} & set(update_fields):
+        for field, value in structured_fields(instance).items():
+            setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Job)
+def job_saved(sender, instance, update_fields=None, **kwargs):
+    """Keep the search indexes and listing caches in sync after a job is created or edited"""
+    search.index_job(instance)
+    if update_fields is None or 'skills_required' in update_fields:
+        # Covers the admin, the shell and the scripts, not just the job forms
+        sync_job_skills(instance, bump=False)
+    bump_generation()
+    suggest.job_changed(instance)
+    ranking.job_changed(instance)
+    trigram.job_changed(instance)
+    similar.job_changed(instance)
+    if update_fields is None or {'is_active', *similar.FIELD_WEIGHTS} & set(update_fields):
+        # Neighbours are recomputed by build_similar_jobs --stale, not in the request
+        similar.mark_stale(instance.pk)
+
+
+@receiver(post_delete, sender=Job)
+def job_deleted(sender, instance, **kwargs):
+    """Drop a deleted job from the search indexes and listing caches"""
+    search.unindex_job(instance.pk)
+    bump_generation()
+    suggest.job_removed(instance.pk)
+    ranking.job_removed(instance.pk)
+    trigram.job_removed(instance.pk)
+    similar.job_removed(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=LocationAlias)
+def gazetteer_changed(sender, **kwargs):
+    """Forget cached place resolutions after a gazetteer edit"""
+    bump_generation(LOCATIONS_NAMESPACE)
+
+
+@receiver([post_save, post_delete], sender=UserMaster)
+def user_changed(sender, instance, **kwargs):
+    """Forget the cached request.portal_user (see middleware.py)"""
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Candidate)
+@receiver([post_save, post_delete], sender=Company)
+def profile_changed(sender, instance, **kwargs):
+    """Forget the cached request.profile (see middleware.py)"""
+    cache.delete(profile_cache_key(sender.__name__.lower(), instance.pk))
@@ -0,0 +1,245 @@
+"""
+Content-based "similar jobs" for the job detail page.
+
+Each active job gets a TF-IDF vector over its title, skills and description
+(field-weighted, sublinear term frequency, L2-normalized and pruned to its
+strongest terms). Its nearest neighbours by cosine similarity are stored in
+the SimilarJob table, so job_detail reads a handful of precomputed rows
+instead of querying for look-alikes on every view.
+
+``build_similar_jobs`` recomputes every job's neighbours in one batch. In
+between, saving a job only flags it ``similar_stale``: building the index
+is far too slow for a request. ``build_similar_jobs --stale`` (a cron job
+in render.yaml) then recomputes the flagged jobs' neighbours, and their
+neighbours' neighbours, which they may now belong to, against an index
+kept current by indexing.LiveIndex.
+
+The vectors are plain ``array`` columns: candidates come from per-term
+"champion lists" (only the jobs weighting a term most are posted under it),
+so a lookup touches a few thousand postings instead of every job.
+"""
+import heapq
+import math
+from array import array
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .indexing import LiveIndex
+from .models import Job, SimilarJob
+from .search import TOKEN_RE
+
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'skills_required': 2.0,
+    'description': 1.0,
+}
+# Terms kept per job vector, and jobs kept per term's postings
+MAX_TERMS = 24
+CHAMPIONS = 100
+# Neighbours stored per job
+MAX_NEIGHBOURS = 10
+MIN_SCORE = 0.05
+# Rebuild once this share of document numbers belongs to removed jobs
+MAX_TOMBSTONE_RATIO = 0.25
+
+
+def term_frequencies(texts):
+    """Field-weighted term counts for one job's ``texts``"""
+    counts = Counter()
+    for name, weight in FIELD_WEIGHTS.items():
+        for term, tf in Counter(TOKEN_RE.findall((texts.get(name) or '').lower())).items():
+            if len(term) > 1:
+                counts[term] += weight * (1 + math.log(tf))
+    return counts
+
+
+class SimilarityIndex:
+    def __init__(self):
+        self.term_ids = {}
+        # term id -> number of jobs containing it
+        self.df = array('I')
+        # term id -> (array of document numbers, array of weights)
+        self.postings = {}
+        # document number -> job id (0 once the job is removed)
+        self.doc_ids = array('q')
+        # job id -> (document number, array of term ids, array of weights)
+        self.vectors = {}
+        # job id -> term counts, until finish_bulk() weighs them
+        self._pending = {}
+        # Set by indexing.LiveIndex
+        self.generation = None
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self.vectors) + len(self._pending)
+
+    def job_ids(self):
+        return set(self.vectors) | set(self._pending)
+
+    def needs_rebuild(self):
+        return len(self.doc_ids) - len(self.vectors) > MAX_TOMBSTONE_RATIO * max(len(self), 1)
+
+    def _count_terms(self, counts):
+        """Register one job's terms; returns ``counts`` keyed by term id"""
+        term_ids = {}
+        for term in counts:
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = self.term_ids[term] = len(self.df)
+                self.df.append(0)
+            self.df[term_id] += 1
+            term_ids[term_id] = counts[term]
+        return term_ids
+
+    def _vector(self, counts, live):
+        """Top MAX_TERMS (term ids, tf-idf weights) of ``counts``, L2-normalized"""
+        weights = []
+        for term_id, tf in counts.items():
+            weight = tf * math.log((1 + live) / (1 + self.df[term_id]))
+            if weight > 0:
+                weights.append((weight, term_id))
+        weights = heapq.nlargest(MAX_TERMS, weights)
+        norm = math.sqrt(sum(weight * weight for weight, _ in weights)) or 1.0
+        return (array('I', (term_id for _, term_id in weights)),
+                array('f', (weight / norm for weight, _ in weights)))
+
+    def _post(self, job_id, vector):
+        docno = len(self.doc_ids)
+        self.doc_ids.append(job_id)
+        self.vectors[job_id] = (docno, *vector)
+        for term_id, weight in zip(*vector):
+            entry = self.postings.get(term_id)
+            if entry is None:
+                entry = self.postings[term_id] = (array('I'), array('f'))
+            entry[0].append(docno)
+            entry[1].append(weight)
+        return docno
+
+    def _trim(self, term_id):
+        """Cut a term's postings back to its CHAMPIONS best live jobs"""
+        docnos, weights = self.postings[term_id]
+        doc_ids = self.doc_ids
+        best = heapq.nlargest(CHAMPIONS, (
+            (weight, docno) for docno, weight in zip(docnos, weights) if doc_ids[docno]
+        ))
+        best.sort(key=lambda item: item[1])
+        self.postings[term_id] = (array('I', (docno for _, docno in best)),
+                                  array('f', (weight for weight, _ in best)))
+
+    def add_job(self, job_id, texts, _bulk=False):
+        """Index one job; ``texts`` maps field name to its text"""
+        self.remove_job(job_id)
+        counts = self._count_terms(term_frequencies(texts))
+        if _bulk:
+            # Weights need the document frequencies of the whole corpus
+            self._pending[job_id] = counts
+            return
+        vector = self._vector(counts, len(self.vectors) + 1)
+        self._post(job_id, vector)
+        for term_id in vector[0]:
+            if len(self.postings[term_id][0]) > 2 * CHAMPIONS:
+                self._trim(term_id)
+
+    def remove_job(self, job_id):
+        # Document frequencies are left as they are; the drift is gone
+        # with the next rebuild
+        self._pending.pop(job_id, None)
+        entry = self.vectors.pop(job_id, None)
+        if entry is not None:
+            self.doc_ids[entry[0]] = 0
+
+    def finish_bulk(self):
+        pending, self._pending = self._pending, {}
+        live = len(self.vectors) + len(pending)
+        for job_id, counts in pending.items():
+            self._post(job_id, self._vector(counts, live))
+        for term_id, (docnos, _) in self.postings.items():
+            if len(docnos) > CHAMPIONS:
+                self._trim(term_id)
+
+    def neighbours(self, job_id, limit=MAX_NEIGHBOURS):
+        """Up to ``limit`` (score, job id) pairs most similar to ``job_id``, best first"""
+        entry = self.vectors.get(job_id)
+        if entry is None:
+            return []
+        own, term_ids, weights = entry
+        scores = defaultdict(float)
+        for term_id, weight in zip(term_ids, weights):
+            docnos, posted = self.postings[term_id]
+            for docno, other in zip(docnos, posted):
+                scores[docno] += weight * other
+        scores.pop(own, None)
+        doc_ids = self.doc_ids
+        return heapq.nlargest(limit, (
+            (score, doc_ids[docno]) for docno, score in scores.items()
+            if score >= MIN_SCORE and doc_ids[docno]
+        ))
+
+
+_live = LiveIndex(SimilarityIndex, FIELD_WEIGHTS)
+get_index = _live.get
+job_changed = _live.job_changed
+job_removed = _live.job_removed
+
+
+# ============================================
+# STORED NEIGHBOURS
+# ============================================
+
+def store_neighbours(index, job_ids):
+    """Replace the SimilarJob rows of ``job_ids`` with their current neighbours"""
+    rows = [
+        SimilarJob(job_id=job_id, similar_id=similar_id, rank=rank, score=score)
+        for job_id in job_ids
+        for rank, (score, similar_id) in enumerate(index.neighbours(job_id))
+    ]
+    with transaction.atomic():
+        SimilarJob.objects.filter(job_id__in=job_ids).delete()
+        SimilarJob.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild(batch_size=500):
+    """Recompute the neighbours of every active job. Returns the rows stored."""
+    Job.objects.filter(similar_stale=True).update(similar_stale=False)
+    index = get_index()
+    job_ids = sorted(index.job_ids())
+    stored = 0
+    for start in range(0, len(job_ids), batch_size):
+        stored += store_neighbours(index, job_ids[start:start + batch_size])
+    # Rows of jobs that are no longer active
+    SimilarJob.objects.exclude(job__is_active=True).delete()
+    return stored
+
+
+def mark_stale(job_id):
+    Job.objects.filter(pk=job_id).update(similar_stale=True)
+
+
+def refresh_stale(batch_size=500):
+    """
+    Recompute the neighbours of the jobs saved since, and of the jobs they
+    are now similar to (they may belong in their lists too). Returns the
+    number of saved jobs refreshed.
+    """
+    stale = Job.objects.filter(similar_stale=True)
+    job_ids = list(stale.values_list('id', flat=True)[:batch_size])
+    if not job_ids:
+        return 0
+    # Clear the flags first: a job saved again from here on is flagged anew
+    Job.objects.filter(pk__in=job_ids).update(similar_stale=False)
+    index = get_index()
+    affected = set(job_ids)
+    for job_id in job_ids:
+        affected.update(similar_id for _, similar_id in index.neighbours(job_id))
+    store_neighbours(index, sorted(affected))
+    return len(job_ids)
+
+
+def similar_jobs(job, limit=3, fields=()):
+    """The ``limit`` stored neighbours of ``job`` that are still active, best first"""
+    jobs = Job.objects.filter(is_active=True, similar_to__job=job)
+    if fields:
+        jobs = jobs.only(*fields)
+    return jobs.order_by('similar_to__rank')[:limit]
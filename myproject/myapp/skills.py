@@ -0,0 +1,126 @@
+"""
+Normalized job skills.
+
+``Job.skills_required`` stays the free-text field employers fill in; the
+parsed skills are stored in Skill/JobSkill so that skill filters are an
+indexed join instead of a substring scan over a TextField.
+"""
+import re
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .caching import bump_generation, make_key
+from .models import Job, JobSkill, Skill
+
+SPLIT_RE = re.compile(r'[,;|\n]+')
+
+# Common spellings folded into one skill
+SKILL_SYNONYMS = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'reactjs': 'react',
+    'react.js': 'react',
+    'node': 'node.js',
+    'nodejs': 'node.js',
+    'vuejs': 'vue.js',
+    'vue': 'vue.js',
+    'postgres': 'postgresql',
+    'golang': 'go',
+    'k8s': 'kubernetes',
+    'amazon web services': 'aws',
+    'ml': 'machine learning',
+}
+
+
+def normalize_skill(name):
+    slug = ' '.join((name or '').lower().split())
+    return SKILL_SYNONYMS.get(slug, slug)
+
+
+def parse_skills(text):
+    """Return ``{slug: display name}`` for a comma-separated skills string"""
+    skills = {}
+    for part in SPLIT_RE.split(text or ''):
+        name = ' '.join(part.split()).strip('. ')
+        slug = normalize_skill(name)
+        if slug and len(slug) <= 100 and slug not in skills:
+            skills[slug] = name
+    return skills
+
+
+def get_or_create_skills(parsed):
+    """Map ``{slug: name}`` to Skill rows, creating missing ones in bulk"""
+    if not parsed:
+        return []
+    existing = {skill.slug: skill for skill in Skill.objects.filter(slug__in=parsed)}
+    missing = [Skill(slug=slug, name=name) for slug, name in parsed.items() if slug not in existing]
+    if missing:
+        Skill.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = {skill.slug: skill for skill in Skill.objects.filter(slug__in=parsed)}
+    return list(existing.values())
+
+
+def sync_job_skills(job, bump=True):
+    """
+    Make the job's JobSkill rows match its skills_required text. With
+    ``bump=False`` the caller bumps the jobs generation itself.
+    """
+    skill_ids = {skill.pk for skill in get_or_create_skills(parse_skills(job.skills_required))}
+    current = set(JobSkill.objects.filter(job=job).values_list('skill_id', flat=True))
+
+    stale = current - skill_ids
+    added = skill_ids - current
+    if stale:
+        JobSkill.objects.filter(job=job, skill_id__in=stale).delete()
+    if added:
+        JobSkill.objects.bulk_create(
+            [JobSkill(job=job, skill_id=skill_id) for skill_id in added],
+            ignore_conflicts=True,
+        )
+    if bump and (stale or added):
+        bump_generation()
+
+
+def parse_skill_filter(value):
+    """Normalized skill slugs from a ``?skills=python,docker`` parameter"""
+    return sorted(parse_skills(value))
+
+
+def filter_by_skills(queryset, slugs):
+    """Restrict a Job queryset to jobs requiring *all* of ``slugs``"""
+    if not slugs:
+        return queryset
+    matching = (
+        JobSkill.objects.filter(skill__slug__in=slugs)
+        .values('job')
+        .annotate(matched=Count('skill', distinct=True))
+        .filter(matched=len(slugs))
+        .values('job')
+    )
+    return queryset.filter(pk__in=matching)
+
+
+def popular_skills(limit=20):
+    """Skills ranked by the number of active jobs requiring them, as (slug, name, count)"""
+    key = make_key('popular_skills', {'limit': limit})
+    skills = cache.get(key)
+    if skills is None:
+        skills = list(
+            Skill.objects.filter(job_skills__job__is_active=True)
+            .annotate(job_count=Count('job_skills'))
+            .order_by('-job_count', 'name')
+            .values_list('slug', 'name', 'job_count')[:limit]
+        )
+        cache.set(key, skills, 600)
+    return skills
+
+
+def backfill(queryset=None, batch_size=500):
+    """Sync skills for every job in ``queryset``. Returns the number processed."""
+    queryset = queryset if queryset is not None else Job.objects.all()
+    processed = 0
+    for job in queryset.only('id', 'skills_required').iterator(chunk_size=batch_size):
+        sync_job_skills(job)
+        processed += 1
+    return processed
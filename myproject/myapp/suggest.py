@@ -0,0 +1,131 @@
+"""
+Typeahead suggestions for the home page search box.
+
+Completions come from an in-memory prefix index over active jobs' titles,
+company names and skills, so typing never touches the database. Terms are
+kept in a sorted list and looked up with bisect; titles are also indexed
+from every word start, so "dev" completes "Senior Python Developer".
+
+indexing.LiveIndex builds it lazily per process, patches it from the Job
+signals and catches it up with jobs changed by other processes.
+"""
+import bisect
+import heapq
+
+from .indexing import LiveIndex
+
+FIELDS = ('title', 'company_name', 'skills_required')
+MAX_SUGGESTIONS = 10
+# Upper bound on index entries inspected per lookup, keeps short
+# prefixes like "a" cheap on a large index
+MAX_SCAN = 128
+
+
+def _normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def job_terms(title, company_name, skills_required):
+    """Yield (key, display, kind) index entries for one job"""
+    title = ' '.join((title or '').split())
+    if title:
+        words = title.split(' ')
+        for start in range(len(words)):
+            yield _normalize(' '.join(words[start:])), title, 'title'
+
+    company_name = ' '.join((company_name or '').split())
+    if company_name:
+        yield _normalize(company_name), company_name, 'company'
+
+    for skill in (skills_required or '').split(','):
+        skill = ' '.join(skill.split())
+        if skill:
+            yield _normalize(skill), skill, 'skill'
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        # key -> {(display, kind): set(job_ids)}
+        self._entries = {}
+        # job_id -> [(key, display, kind)], for incremental removal
+        self._job_terms = {}
+        # Set by indexing.LiveIndex
+        self.generation = None
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def job_ids(self):
+        return set(self._job_terms)
+
+    def needs_rebuild(self):
+        # Removal drops emptied keys, so nothing piles up
+        return False
+
+    def finish_bulk(self):
+        # Keys were appended unsorted during the build
+        self._keys.sort()
+
+    def add_job(self, job_id, texts, _bulk=False):
+        self.remove_job(job_id)
+        terms = list(job_terms(*(texts.get(field) for field in FIELDS)))
+        self._job_terms[job_id] = terms
+        for key, display, kind in terms:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {}
+                if _bulk:
+                    self._keys.append(key)
+                else:
+                    bisect.insort(self._keys, key)
+            entry.setdefault((display, kind), set()).add(job_id)
+
+    def remove_job(self, job_id):
+        for key, display, kind in self._job_terms.pop(job_id, ()):
+            entry = self._entries.get(key)
+            if not entry:
+                continue
+            jobs = entry.get((display, kind))
+            if jobs is not None:
+                jobs.discard(job_id)
+                if not jobs:
+                    del entry[(display, kind)]
+            if not entry:
+                del self._entries[key]
+                position = bisect.bisect_left(self._keys, key)
+                if position < len(self._keys) and self._keys[position] == key:
+                    del self._keys[position]
+
+    def lookup(self, prefix, limit=MAX_SUGGESTIONS):
+        """Return up to ``limit`` completions, most common first"""
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+
+        # The same text can sit under several keys (title word starts) or
+        # kinds (a skill that is also a title); keep its largest job count
+        counts = {}
+        position = bisect.bisect_left(self._keys, prefix)
+        end = min(len(self._keys), position + MAX_SCAN)
+        while position < end and self._keys[position].startswith(prefix):
+            for (display, kind), jobs in self._entries[self._keys[position]].items():
+                folded = display.lower()
+                seen = counts.get(folded)
+                if seen is None or len(jobs) > seen[2]:
+                    counts[folded] = (display, kind, len(jobs))
+            position += 1
+
+        ranked = heapq.nsmallest(limit, counts.values(), key=lambda item: (-item[2], item[0].lower()))
+        return [{'text': display, 'type': kind, 'jobs': total} for display, kind, total in ranked]
+
+
+_live = LiveIndex(PrefixIndex, FIELDS)
+get_index = _live.get
+job_changed = _live.job_changed
+job_removed = _live.job_removed
+
+
+def suggest(prefix, limit=MAX_SUGGESTIONS):
+    return get_index().lookup(prefix, limit)
@@ -1,8 +1,80 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.core.cache import caches
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
 from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
 import json
+import threading
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from io import StringIO
 from unittest.mock import patch, MagicMock
 
+from .models import UserMaster, Company, Candidate, Job, JobAlert, JobAlertMatch, Checkpoint, SavedJob, OneTimeCode, EmailOutbox, RateBucket, CacheGeneration
+from . import search, suggest, geo, skills, parsing, ranking, trigram, similar, alerts, digests, counters, otp, mailer, outbox, emails, governor, indexing
+from .facets import compute_facets
+from .caching import JOBS_NAMESPACE, bump_generation, get_generation, make_key, normalize_params
+from .job_query import JobQuery, QUERY_BUDGETS
+from .management.commands.bench_job_queries import PLAN_PARAMS
+
+
+# Index rebuilds stay on the test's database connection
+@override_settings(SEARCH_INDEX_BACKGROUND_REBUILD=False)
+class PortalTestCase(TestCase):
+    """TestCase that starts every test with empty caches"""
+
+    def setUp(self):
+        super().setUp()
+        for cache in caches.all():
+            cache.clear()
+        # Buffered job views belong to this test's database
+        self.addCleanup(counters.flush)
+
+
+def bump_in_another_process(namespace=JOBS_NAMESPACE):
+    """Move a shared cache generation the way another worker would, then let
+    this process's remembered value run out"""
+    CacheGeneration.objects.filter(namespace=namespace).update(value=F('value') + 1)
+    caches['default'].delete(f'generation:{namespace}')
+
+
+def create_company(email='hr@example.com', company_name='Acme Corp'):
+    user = UserMaster.objects.create(
+        email=email, password='secret123', role='company', is_verified=True
+    )
+    return Company.objects.create(
+        user_id=user, firstname='Hiring', lastname='Manager', company_name=company_name
+    )
+
+
+def create_candidate(email='jane@example.com', first_name='Jane'):
+    user = UserMaster.objects.create(
+        email=email, password='secret123', role='candidate', is_verified=True
+    )
+    return Candidate.objects.create(user_id=user, first_name=first_name, last_name='Doe', email=email)
+
+
+def create_job(company, **fields):
+    defaults = {
+        'title': 'Software Engineer',
+        'company_name': company.company_name,
+        'description': 'Build and maintain web applications.',
+        'location': 'Bangalore',
+        'job_type': 'full-time',
+        'experience_required': '1-3',
+        'skills_required': 'Python, Django',
+    }
+    defaults.update(fields)
+    return Job.objects.create(company=company, **defaults)
+
 class ChatbotTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -53,3 +125,1383 @@ class ChatbotTests(TestCase):
     def test_chat_api_invalid_method(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 405)
+
+
+class JobSearchTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.python_job = create_job(self.company, title='Senior Python Developer')
+        self.java_job = create_job(
+            self.company, title='Java Engineer', skills_required='Java, Spring',
+            description='Work on backend services.'
+        )
+
+    def search_ids(self, query):
+        return set(search.apply_search(Job.objects.all(), query).values_list('id', flat=True))
+
+    def test_matches_title_and_skills(self):
+        self.assertEqual(self.search_ids('python'), {self.python_job.id})
+        self.assertEqual(self.search_ids('spring'), {self.java_job.id})
+
+    def test_all_terms_must_match_as_prefixes(self):
+        self.assertEqual(self.search_ids('pyth dev'), {self.python_job.id})
+        self.assertEqual(self.search_ids('python spring'), set())
+
+    def test_index_follows_edits_and_deletes(self):
+        self.java_job.title = 'Kotlin Engineer'
+        self.java_job.save()
+        self.assertEqual(self.search_ids('kotlin'), {self.java_job.id})
+
+        self.java_job.delete()
+        self.assertEqual(self.search_ids('kotlin'), set())
+
+    def test_browse_and_search_views_use_index(self):
+        response = self.client.get(reverse('browse_jobs'), {'search': 'python'})
+        self.assertEqual(list(response.context['jobs']), [self.python_job])
+
+        response = self.client.get(reverse('search_jobs'), {'title': 'spring'})
+        self.assertEqual(list(response.context['jobs']), [self.java_job])
+
+
+@override_settings(JOB_LIST_PAGE_SIZE=2)
+class KeysetPaginationTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        self.jobs = [create_job(company, title=f'Job {i}') for i in range(5)]
+        # Newest first, matching Job.Meta.ordering
+        self.jobs.reverse()
+
+    def test_walks_forward_and_back(self):
+        url = reverse('browse_jobs')
+        first = self.client.get(url)
+        self.assertEqual(list(first.context['jobs']), self.jobs[:2])
+        self.assertEqual(first.context['total_jobs'], 5)
+        self.assertIsNone(first.context['page'].prev_query)
+
+        second = self.client.get(f"{url}?{first.context['page'].next_query}")
+        self.assertEqual(list(second.context['jobs']), self.jobs[2:4])
+
+        third = self.client.get(f"{url}?{second.context['page'].next_query}")
+        self.assertEqual(list(third.context['jobs']), self.jobs[4:])
+        self.assertIsNone(third.context['page'].next_query)
+
+        back = self.client.get(f"{url}?{third.context['page'].prev_query}")
+        self.assertEqual(list(back.context['jobs']), self.jobs[2:4])
+
+    def test_links_keep_filters(self):
+        response = self.client.get(reverse('search_jobs'), {'title': 'job', 'page_size': 3})
+        page = response.context['page']
+        self.assertEqual(len(page), 3)
+        self.assertIn('title=job', page.next_query)
+        self.assertIn('after=', page.next_query)
+
+    def test_bad_cursor_shows_first_page(self):
+        response = self.client.get(reverse('browse_jobs'), {'after': 'not-a-cursor'})
+        self.assertEqual(list(response.context['jobs']), self.jobs[:2])
+
+
+class JobFacetTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        create_job(self.company, job_type='full-time', experience_required='1-3', location='Bangalore')
+        create_job(self.company, job_type='full-time', experience_required='3-5', location='Chennai')
+        create_job(self.company, job_type='contract', experience_required='1-3', location='Bangalore')
+
+    def counts(self, facets, name):
+        return {value: count for value, label, count in facets[name] if count}
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = compute_facets(Job.objects.filter(is_active=True))
+        self.assertEqual(self.counts(facets, 'job_type'), {'full-time': 2, 'contract': 1})
+        self.assertEqual(self.counts(facets, 'experience'), {'1-3': 2, '3-5': 1})
+        self.assertEqual(facets['locations'], [('Bangalore', 2), ('Chennai', 1)])
+
+    def test_each_facet_applies_the_other_filters(self):
+        facets = compute_facets(Job.objects.all(), job_type='full-time', location='bangalore')
+        # job_type counts ignore the job_type filter but honour location
+        self.assertEqual(self.counts(facets, 'job_type'), {'full-time': 1, 'contract': 1})
+        self.assertEqual(self.counts(facets, 'experience'), {'1-3': 1})
+        self.assertEqual(facets['locations'], [('Bangalore', 1), ('Chennai', 1)])
+
+    def test_generation_is_shared_through_the_database(self):
+        generation = get_generation()
+        self.assertEqual(bump_generation(), generation + 1)
+        self.assertEqual(CacheGeneration.objects.get(namespace=JOBS_NAMESPACE).value, generation + 1)
+
+        bump_in_another_process()
+        self.assertEqual(get_generation(), generation + 2)
+
+    def test_cached_until_a_job_changes(self):
+        response = self.client.get(reverse('browse_jobs'))
+        self.assertEqual(self.counts(response.context['facets'], 'job_type'), {'full-time': 2, 'contract': 1})
+
+        with patch('myapp.facets.compute_facets') as compute:
+            self.client.get(reverse('browse_jobs'))
+            compute.assert_not_called()
+
+        create_job(self.company, job_type='internship')
+        response = self.client.get(reverse('browse_jobs'))
+        self.assertEqual(self.counts(response.context['facets'], 'job_type')['internship'], 1)
+
+
+class JobResultCacheTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.job = create_job(self.company, title='Python Developer')
+
+    def test_repeat_search_is_served_from_cache(self):
+        params = {'search': 'Python', 'location': 'Bangalore'}
+        first = self.client.get(reverse('browse_jobs'), params)
+        self.assertEqual(first.context['total_jobs'], 1)
+
+        # Same query with different casing/spacing hits the cache:
+        # only the primary-key lookup of the page rows remains.
+        with self.assertNumQueries(1):
+            second = self.client.get(reverse('browse_jobs'), {'search': ' python ', 'location': 'BANGALORE'})
+        self.assertEqual(list(second.context['jobs']), [self.job])
+        self.assertEqual(second.context['total_jobs'], 1)
+
+    def test_cursors_keep_their_case_in_the_key(self):
+        self.assertEqual(normalize_params({'search': ' PYTHON  dev', 'after': 'eyJhIjoxfQ'}),
+                         {'search': 'python dev', 'after': 'eyJhIjoxfQ'})
+        self.assertNotEqual(make_key('results', {'after': 'eyJhIjoxfQ'}),
+                            make_key('results', {'after': 'EYJHIJOXFQ'}))
+
+    def test_job_changes_invalidate_results(self):
+        self.client.get(reverse('search_jobs'), {'title': 'python'})
+        other = create_job(self.company, title='Python Lead')
+
+        response = self.client.get(reverse('search_jobs'), {'title': 'python'})
+        self.assertEqual(response.context['total_jobs'], 2)
+
+        other.delete()
+        response = self.client.get(reverse('search_jobs'), {'title': 'python'})
+        self.assertEqual(list(response.context['jobs']), [self.job])
+
+    def test_other_workers_changes_invalidate_results(self):
+        self.client.get(reverse('search_jobs'), {'title': 'python'})
+        # Another worker deactivates the job: no signal runs in this process
+        Job.objects.filter(pk=self.job.pk).update(is_active=False)
+        bump_in_another_process()
+
+        response = self.client.get(reverse('search_jobs'), {'title': 'python'})
+        self.assertEqual(response.context['total_jobs'], 0)
+
+
+class SuggestTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company(company_name='Infosys')
+        self.job = create_job(
+            self.company, title='Senior Python Developer', skills_required='Python, PostgreSQL, Docker'
+        )
+
+    def texts(self, query):
+        response = self.client.get(reverse('suggest_api'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['text'] for item in response.json()['suggestions']]
+
+    def test_completes_titles_companies_and_skills(self):
+        self.assertEqual(self.texts('info'), ['Infosys'])
+        self.assertEqual(self.texts('dock'), ['Docker'])
+        self.assertEqual(self.texts('dev'), ['Senior Python Developer'])
+        self.assertEqual(set(self.texts('p')), {'Python', 'PostgreSQL', 'Senior Python Developer'})
+
+    def test_ranks_by_number_of_jobs(self):
+        create_job(self.company, title='Data Engineer', skills_required='Python, Pandas')
+        self.assertEqual(self.texts('p')[0], 'Python')
+
+    def test_follows_job_changes_without_queries(self):
+        self.texts('x')  # build the index
+        self.job.title = 'Kotlin Developer'
+        self.job.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(suggest.suggest('kot')[0]['text'], 'Kotlin Developer')
+            self.assertEqual(suggest.suggest('senior'), [])
+
+        self.job.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(suggest.suggest('kot'), [])
+
+    def test_bulk_build_sorts_keys_once(self):
+        index = suggest.PrefixIndex()
+        index.add_job(2, {'title': 'Zend Developer', 'company_name': 'Acme'}, _bulk=True)
+        index.add_job(1, {'title': 'Backend Developer', 'skills_required': 'Go'}, _bulk=True)
+        index.finish_bulk()
+        self.assertEqual(index._keys, sorted(index._keys))
+        self.assertEqual([item['text'] for item in index.lookup('dev')], ['Backend Developer', 'Zend Developer'])
+
+    def test_catches_up_with_other_workers(self):
+        self.texts('x')  # build the index
+        Job.objects.filter(pk=self.job.pk).update(title='Kotlin Developer', updated_at=timezone.now())
+        bump_in_another_process()
+        self.assertEqual(self.texts('kot'), ['Kotlin Developer'])
+        self.assertEqual(self.texts('senior'), [])
+
+    def test_empty_query(self):
+        self.assertEqual(self.texts(''), [])
+
+
+class LocationSearchTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        geo.load_gazetteer()
+        self.company = create_company()
+        self.bangalore_job = create_job(self.company, location='Bangalore, India')
+        self.mysore_job = create_job(self.company, location='Mysore')
+        self.chennai_job = create_job(self.company, location='Chennai, Tamil Nadu')
+        self.remote_job = create_job(self.company, location='Remote')
+
+    def browse(self, **params):
+        return list(self.client.get(reverse('browse_jobs'), params).context['jobs'])
+
+    def test_jobs_are_linked_on_save(self):
+        self.assertEqual(self.bangalore_job.resolved_location.name, 'Bangalore')
+        self.assertEqual(self.mysore_job.resolved_location.name, 'Mysuru')
+        self.assertIsNone(self.remote_job.resolved_location)
+
+    def test_aliases_match_the_same_city(self):
+        self.assertEqual(self.browse(location='Bengaluru'), [self.bangalore_job])
+        self.assertEqual(self.browse(location='madras'), [self.chennai_job])
+
+    def test_radius_search(self):
+        # Mysuru is ~125 km from Bangalore, Chennai ~290 km
+        self.assertEqual(set(self.browse(location='Bangalore', radius=150)),
+                         {self.bangalore_job, self.mysore_job})
+        self.assertEqual(set(self.browse(location='Bangalore', radius=300)),
+                         {self.bangalore_job, self.mysore_job, self.chennai_job})
+
+    def test_unknown_places_fall_back_to_substring(self):
+        self.assertEqual(self.browse(location='remo'), [self.remote_job])
+
+    def test_unresolved_jobs_still_match_by_substring(self):
+        # e.g. posted before the gazetteer knew the place
+        Job.objects.filter(pk=self.chennai_job.pk).update(location='Bangalore (Whitefield)', resolved_location=None)
+        self.assertEqual(set(self.browse(location='Bangalore')), {self.bangalore_job, self.chennai_job})
+        facets = self.client.get(reverse('browse_jobs'), {'location': 'Bangalore'}).context['facets']
+        self.assertEqual(sum(count for value, label, count in facets['job_type']), 2)
+
+    def test_haversine(self):
+        delhi, mumbai = (28.6139, 77.2090), (19.0760, 72.8777)
+        self.assertAlmostEqual(geo.haversine_km(*delhi, [mumbai])[0], 1150, delta=10)
+
+
+class SkillTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        session = self.client.session
+        session['email'] = self.company.user_id.email
+        session.save()
+
+    def post_job(self, title, skills_required):
+        self.client.post(reverse('post_job'), {
+            'title': title,
+            'description': 'Build things.',
+            'location': 'Pune',
+            'job_type': 'full-time',
+            'experience_required': '1-3',
+            'skills_required': skills_required,
+        })
+        return Job.objects.get(title=title)
+
+    def test_parse_skills_normalizes_and_dedupes(self):
+        self.assertEqual(
+            skills.parse_skills('Python, ReactJS; react.js, Postgres,  , Docker'),
+            {'python': 'Python', 'react': 'ReactJS', 'postgresql': 'Postgres', 'docker': 'Docker'},
+        )
+
+    def test_post_and_edit_job_sync_skills(self):
+        job = self.post_job('Backend Engineer', 'Python, Docker')
+        self.assertEqual(set(job.skills.values_list('slug', flat=True)), {'python', 'docker'})
+
+        self.client.post(reverse('edit_job', args=[job.id]), {
+            'title': job.title,
+            'description': job.description,
+            'location': job.location,
+            'job_type': job.job_type,
+            'experience_required': '1-3',
+            'skills_required': 'Python, Kubernetes',
+        })
+        self.assertEqual(set(job.skills.values_list('slug', flat=True)), {'python', 'kubernetes'})
+
+    def test_jobs_saved_outside_the_views_get_skills(self):
+        job = create_job(self.company, skills_required='Python, Docker')
+        self.assertEqual(set(job.skills.values_list('slug', flat=True)), {'python', 'docker'})
+        response = self.client.get(reverse('browse_jobs'), {'skills': 'python,docker'})
+        self.assertEqual(list(response.context['jobs']), [job])
+
+        job.skills_required = 'Go'
+        job.save(update_fields=['skills_required'])
+        self.assertEqual(list(job.skills.values_list('slug', flat=True)), ['go'])
+
+    def test_filter_requires_all_skills(self):
+        both = self.post_job('Platform Engineer', 'Python, Docker')
+        self.post_job('Data Analyst', 'Python, SQL')
+
+        response = self.client.get(reverse('browse_jobs'), {'skills': 'python, docker'})
+        self.assertEqual(list(response.context['jobs']), [both])
+        self.assertEqual(response.context['total_jobs'], 1)
+
+        response = self.client.get(reverse('browse_jobs'), {'skills': 'python'})
+        self.assertEqual(response.context['total_jobs'], 2)
+
+    def test_backfill_and_popularity(self):
+        create_job(self.company, title='A', skills_required='Go, Docker')
+        create_job(self.company, title='B', skills_required='golang')
+        self.assertEqual(skills.backfill(), 2)
+        self.assertEqual(
+            [(slug, count) for slug, name, count in skills.popular_skills(2)],
+            [('go', 2), ('docker', 1)],
+        )
+
+
+@override_settings(JOB_LIST_PAGE_SIZE=2)
+class SalaryExperienceTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+
+    def test_parse_salary_formats(self):
+        self.assertEqual(parsing.parse_salary('₹15,00,000 - ₹25,00,000 per annum'), {
+            'salary_min': 1500000, 'salary_max': 2500000, 'salary_currency': 'INR', 'salary_period': 'year',
+        })
+        self.assertEqual(parsing.parse_salary('10-15 LPA')['salary_max'], 1500000)
+        self.assertEqual(parsing.parse_salary('$50k - $70k')['salary_min'], 50000)
+        monthly = parsing.parse_salary('INR 40,000 / month')
+        self.assertEqual((monthly['salary_max'], monthly['salary_period']), (480000, 'month'))
+        self.assertEqual(parsing.parse_salary('Up to 12 LPA, 2 openings')['salary_min'], 1200000)
+        self.assertIsNone(parsing.parse_salary('Negotiable'))
+        self.assertEqual(parsing.parse_experience('3-5'), (3, 5))
+        self.assertEqual(parsing.parse_experience('10+'), (10, None))
+
+    def test_save_fills_columns(self):
+        job = create_job(self.company, salary='8 - 12 Lakhs', experience_required='5-10')
+        self.assertEqual((job.salary_min, job.salary_max, job.salary_currency), (800000, 1200000, 'INR'))
+        self.assertEqual((job.experience_min, job.experience_max), (5, 10))
+
+        job.salary = ''
+        job.save()
+        job.refresh_from_db()
+        self.assertIsNone(job.salary_max)
+
+    def test_backfill(self):
+        job = create_job(self.company, salary='20 LPA')
+        Job.objects.filter(pk=job.pk).update(salary_min=None, salary_max=None, experience_min=None)
+        self.assertEqual(parsing.backfill(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.salary_max, job.experience_min), (2000000, 1))
+        self.assertEqual(parsing.backfill(), 0)
+
+    def test_range_filters_and_salary_sort(self):
+        low = create_job(self.company, title='Low', salary='5 LPA', experience_required='0-1')
+        mid = create_job(self.company, title='Mid', salary='12 LPA', experience_required='3-5')
+        high = create_job(self.company, title='High', salary='30 LPA', experience_required='10+')
+        create_job(self.company, title='Unknown', salary='Negotiable')
+        url = reverse('browse_jobs')
+
+        response = self.client.get(url, {'min_salary': '10 lakh', 'page_size': 10})
+        self.assertEqual(set(response.context['jobs']), {mid, high})
+
+        response = self.client.get(url, {'max_experience': '3', 'page_size': 10})
+        self.assertNotIn(high, response.context['jobs'])
+        self.assertIn(mid, response.context['jobs'])
+
+        first = self.client.get(url, {'sort': 'salary'})
+        self.assertEqual(list(first.context['jobs']), [high, mid])
+        self.assertEqual(first.context['total_jobs'], 3)
+        second = self.client.get(f"{url}?{first.context['page'].next_query}")
+        self.assertEqual(list(second.context['jobs']), [low])
+        back = self.client.get(f"{url}?{second.context['page'].prev_query}")
+        self.assertEqual(list(back.context['jobs']), [high, mid])
+
+
+@override_settings(JOB_LIST_PAGE_SIZE=2)
+class RelevanceRankingTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        self.mention = create_job(company, title='Office Manager', skills_required='Excel',
+                                  description='Some python scripting is a plus.')
+        self.title = create_job(company, title='Senior Python Developer', skills_required='Django')
+        self.skill = create_job(company, title='Data Engineer', skills_required='Python, Spark',
+                                description='Build pipelines.')
+        create_job(company, title='Java Developer', skills_required='Java', description='Spring apps.')
+
+    def test_title_match_outranks_description_mention(self):
+        scores = ranking.get_index().score('python', [self.mention.pk, self.title.pk, self.skill.pk])
+        self.assertGreater(scores[self.title.pk], scores[self.skill.pk])
+        self.assertGreater(scores[self.skill.pk], scores[self.mention.pk])
+
+    def test_relevance_pages(self):
+        url = reverse('browse_jobs')
+        first = self.client.get(url, {'search': 'python', 'sort': 'relevance'})
+        self.assertEqual(list(first.context['jobs']), [self.title, self.skill])
+        self.assertEqual(first.context['total_jobs'], 3)
+
+        second = self.client.get(f"{url}?{first.context['page'].next_query}")
+        self.assertEqual(list(second.context['jobs']), [self.mention])
+        self.assertIsNone(second.context['page'].next_query)
+
+        back = self.client.get(f"{url}?{second.context['page'].prev_query}")
+        self.assertEqual(list(back.context['jobs']), [self.title, self.skill])
+
+    def test_search_jobs_relevance_and_index_updates(self):
+        self.mention.title = 'Python Python Lead'
+        self.mention.save()
+        response = self.client.get(reverse('search_jobs'), {'title': 'pyth', 'sort': 'relevance', 'page_size': 5})
+        self.assertEqual(response.context['jobs'][0], self.mention)
+
+        self.mention.delete()
+        response = self.client.get(reverse('search_jobs'), {'title': 'python', 'sort': 'relevance'})
+        self.assertEqual(list(response.context['jobs']), [self.title, self.skill])
+
+    def test_document_frequencies_skip_removed_jobs(self):
+        index = ranking.RelevanceIndex()
+        for job_id in (1, 2, 3):
+            index.add_job(job_id, {'title': 'Python Developer' if job_id < 3 else 'Java Developer'})
+        field = index.fields['title']
+        index.remove_job(2)
+        self.assertEqual(field.df[field.term_ids['python']], 1)
+        self.assertEqual(field.df[field.term_ids['developer']], 2)
+        # Re-adding tombstones the old copy instead of counting it twice
+        index.add_job(1, {'title': 'Python Developer'})
+        self.assertEqual(field.df[field.term_ids['python']], 1)
+
+    @override_settings(SEARCH_INDEX_BACKGROUND_REBUILD=True)
+    def test_rebuilds_happen_outside_the_request(self):
+        live = indexing.LiveIndex(ranking.RelevanceIndex, ranking.FIELD_WEIGHTS)
+        index = live.get()
+        for job in (self.title, self.skill, self.mention):
+            index.add_job(job.pk, {'title': job.title})
+        self.assertTrue(index.needs_rebuild())
+
+        with patch('myapp.indexing.threading.Thread') as thread:
+            self.assertIs(live.get(), index)
+            self.assertIs(live.get(), index)
+        thread.assert_called_once()
+        thread.call_args.kwargs['target']()
+        self.assertIsNot(live.get(), index)
+        self.assertFalse(live.get().needs_rebuild())
+
+    def test_index_catches_up_with_other_processes(self):
+        ranking.get_index()
+        # Another worker edits a job: only the shared generation moves on
+        Job.objects.filter(pk=self.mention.pk).update(title='Python Architect', updated_at=timezone.now())
+        Job.objects.filter(pk=self.skill.pk).update(is_active=False)
+        bump_in_another_process()
+
+        index = ranking.get_index()
+        self.assertNotIn(self.skill.pk, index.docnos)
+        scores = index.score('python', [self.mention.pk, self.title.pk])
+        self.assertGreater(scores[self.mention.pk], scores[self.title.pk])
+
+
+@override_settings(JOB_LIST_PAGE_SIZE=2)
+class JobQueryTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        for i in range(5):
+            create_job(company, title=f'Python Developer {i}', salary=f'{10 + i} LPA')
+        self.contract = create_job(company, title='Contract Developer', job_type='contract',
+                                   skills_required='Go')
+        skills.sync_job_skills(self.contract)
+
+    def test_both_vocabularies_compile_to_the_same_query(self):
+        browse = JobQuery.from_params(QueryDict('search=python&location=Bangalore&job_type=full-time'))
+        home = JobQuery.from_params(QueryDict('title=python&region=Bangalore&type=Full+Time'))
+        self.assertEqual(browse.filters(), home.filters())
+
+    def test_search_jobs_uses_exact_type_and_skills(self):
+        response = self.client.get(reverse('search_jobs'), {'type': 'Contract', 'skills': 'go'})
+        self.assertEqual(list(response.context['jobs']), [self.contract])
+
+    def test_query_budgets_per_plan(self):
+        factory = RequestFactory()
+        for plan, params in PLAN_PARAMS.items():
+            with self.subTest(plan=plan):
+                request = factory.get('/jobs/', params)
+                compiled = JobQuery.from_params(request.GET).compile()
+                compiled.page(request)
+                self.assertEqual(compiled.plan, plan)
+                caches['job_results'].clear()
+                for state in ('cold', 'warm'):
+                    request = factory.get('/jobs/', params)
+                    with CaptureQueriesContext(connection) as captured:
+                        JobQuery.from_params(request.GET).compile().page(request)
+                    self.assertLessEqual(len(captured), QUERY_BUDGETS[plan][state])
+
+    def test_salary_sort_has_its_own_total(self):
+        url = reverse('browse_jobs')
+        self.assertEqual(self.client.get(url).context['total_jobs'], 6)
+        # The contract job has no parseable salary
+        self.assertEqual(self.client.get(url, {'sort': 'salary'}).context['total_jobs'], 5)
+
+    def test_total_is_counted_once_per_filter_set(self):
+        url = reverse('search_jobs')
+        first = self.client.get(url, {'title': 'python'})
+        self.assertEqual(first.context['total_jobs'], 5)
+        request = RequestFactory().get(f"{url}?{first.context['page'].next_query}")
+        compiled = JobQuery.from_params(request.GET).compile()
+        with self.assertNumQueries(1):
+            page, total = compiled.page(request)
+        self.assertEqual((len(page), total), (2, 5))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_job_queries', repeat=2, max_ms=1000, stdout=out)
+        self.assertIn('All plans within budget', out.getvalue())
+
+
+class TrigramSearchTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.python = create_job(create_company(), title='Senior Python Developer')
+        self.infosys = create_job(create_company('hr@infosys.example', 'Infosys'), title='Java Developer')
+
+    def test_edit_similarity_counts_swaps_as_one_typo(self):
+        self.assertAlmostEqual(trigram.edit_similarity('pyhton', 'python'), 1 - 1 / 6)
+        self.assertEqual(trigram.edit_similarity('python', 'python'), 1.0)
+
+    def test_lookup_corrects_misspelt_words(self):
+        scores, corrected = trigram.get_index().lookup('pyhton develper')
+        self.assertEqual(corrected, 'python developer')
+        self.assertGreater(scores[self.python.pk], scores[self.infosys.pk])
+
+        scores, corrected = trigram.get_index().lookup('infosis')
+        self.assertEqual((list(scores), corrected), ([self.infosys.pk], 'infosys'))
+
+    def test_search_falls_back_to_similar_jobs(self):
+        response = self.client.get(reverse('search_jobs'), {'title': 'pyhton'})
+        self.assertTrue(response.context['fuzzy'])
+        self.assertEqual(response.context['corrected_search'], 'python')
+        self.assertEqual(list(response.context['jobs']), [self.python])
+
+        response = self.client.get(reverse('browse_jobs'), {'search': 'infosis', 'job_type': 'contract'})
+        self.assertEqual(response.context['total_jobs'], 0)
+
+    def test_index_catches_up_with_other_processes(self):
+        trigram.get_index()
+        # Another worker adds a job: only the shared generation moves on
+        company = create_company('hr@wipro.example', 'Wipro')
+        [added] = Job.objects.bulk_create([Job(company=company, company_name='Wipro', title='Kotlin Developer',
+                                               description='Build apps.', location='Pune')])
+        bump_in_another_process()
+
+        scores, corrected = trigram.get_index().lookup('kotlinn')
+        self.assertEqual((list(scores), corrected), ([added.pk], 'kotlin'))
+
+    def test_exact_results_are_kept_when_enough(self):
+        with self.settings(JOB_FUZZY_MIN_RESULTS=1):
+            response = self.client.get(reverse('search_jobs'), {'title': 'senior'})
+        self.assertFalse(response.context['fuzzy'])
+        self.assertEqual(list(response.context['jobs']), [self.python])
+
+
+class SimilarJobTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        self.backend = create_job(company, title='Python Backend Developer',
+                                  skills_required='Python, Django, PostgreSQL',
+                                  description='Build REST APIs with Django.')
+        self.api = create_job(company, title='Django API Engineer',
+                              skills_required='Python, Django, Redis',
+                              description='Design Django services and REST APIs.')
+        self.designer = create_job(company, title='Graphic Designer', job_type='part-time',
+                                   skills_required='Photoshop, Illustrator',
+                                   description='Create brand visuals and illustrations.')
+
+    def test_neighbours_rank_by_content(self):
+        neighbours = similar.get_index().neighbours(self.backend.pk)
+        self.assertEqual(neighbours[0][1], self.api.pk)
+        self.assertNotIn(self.designer.pk, [job_id for _, job_id in neighbours])
+
+    def test_job_detail_reads_stored_neighbours(self):
+        call_command('build_similar_jobs', stdout=StringIO())
+        with self.assertNumQueries(1):
+            self.assertEqual(list(similar.similar_jobs(self.backend)), [self.api])
+
+        response = self.client.get(reverse('job_detail', args=[self.api.pk]))
+        self.assertEqual(list(response.context['similar_jobs']), [self.backend])
+
+    def refresh_stale(self):
+        out = StringIO()
+        call_command('build_similar_jobs', stale=True, stdout=out)
+        return out.getvalue()
+
+    def test_saved_jobs_get_neighbours_from_the_stale_run(self):
+        # Saving only flags the job; the index is not touched in the request
+        with patch('myapp.similar.get_index') as get_index, self.captureOnCommitCallbacks(execute=True):
+            added = create_job(create_company('hr@other.example', 'Other'),
+                               title='Senior Django Developer', skills_required='Python, Django')
+        get_index.assert_not_called()
+        self.assertEqual(list(similar.similar_jobs(added)), [])
+
+        self.assertIn('Refreshed similar jobs of 4 saved jobs', self.refresh_stale())
+        self.assertEqual(set(similar.similar_jobs(added)), {self.api, self.backend})
+        self.assertIn(added, similar.similar_jobs(self.api))
+        self.assertFalse(Job.objects.filter(similar_stale=True).exists())
+
+        added.is_active = False
+        added.save()
+        self.assertIn('of 1 saved jobs', self.refresh_stale())
+        self.assertNotIn(added, similar.similar_jobs(self.api))
+
+
+class JobAlertMatchTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        geo.load_gazetteer()
+        self.candidate = create_candidate()
+        self.python = JobAlert.objects.create(candidate=self.candidate, keywords='python django, golang')
+        self.bangalore = JobAlert.objects.create(candidate=self.candidate, keywords='designer',
+                                                 location='Bengaluru', job_type='Part Time')
+        self.company = create_company()
+
+    def test_keyword_clauses_need_all_their_words(self):
+        index = alerts.AlertIndex.build()
+        django_job = create_job(self.company, skills_required='Python, Django')
+        flask_job = create_job(self.company, skills_required='Python, Flask')
+        go_job = create_job(self.company, title='Golang Engineer', skills_required='')
+        self.assertEqual(index.match(django_job), [self.python.pk])
+        self.assertEqual(index.match(flask_job), [])
+        self.assertEqual(index.match(go_job), [self.python.pk])
+
+    def test_location_and_job_type_filters(self):
+        index = alerts.AlertIndex.build()
+        matching = create_job(self.company, title='Designer', location='Bangalore, India',
+                              job_type='part-time', skills_required='')
+        elsewhere = create_job(self.company, title='Designer', location='Chennai',
+                               job_type='part-time', skills_required='')
+        full_time = create_job(self.company, title='Designer', location='Bangalore',
+                               skills_required='')
+        self.assertEqual(index.match(matching), [self.bangalore.pk])
+        self.assertEqual(index.match(elsewhere), [])
+        self.assertEqual(index.match(full_time), [])
+
+    def test_command_records_new_matches_once(self):
+        job = create_job(self.company, skills_required='Python, Django')
+        call_command('match_job_alerts', stdout=StringIO())
+        call_command('match_job_alerts', stdout=StringIO())
+        self.assertEqual(list(JobAlertMatch.objects.values_list('alert', 'job', 'notified_at')),
+                         [(self.python.pk, job.pk, None)])
+
+        later = create_job(self.company, title='Golang Engineer')
+        # The first job is looked at again (overlap) but not matched twice
+        self.assertEqual(alerts.match_new_jobs(), (2, 1))
+        self.assertTrue(JobAlertMatch.objects.filter(alert=self.python, job=later).exists())
+
+    def test_jobs_activated_later_are_matched(self):
+        job = create_job(self.company, skills_required='Python, Django', is_active=False)
+        alerts.match_new_jobs()
+        self.assertFalse(JobAlertMatch.objects.exists())
+
+        job.is_active = True
+        job.save()
+        self.assertEqual(alerts.match_new_jobs(), (1, 1))
+
+    def test_jobs_committed_behind_the_checkpoint_are_matched(self):
+        create_job(self.company, title='Golang Engineer')
+        alerts.match_new_jobs()
+        # Saved a minute ago, but its transaction only committed now
+        late = create_job(self.company, skills_required='Python, Django')
+        Job.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(alerts.match_new_jobs(), (2, 1))
+        self.assertTrue(JobAlertMatch.objects.filter(alert=self.python, job=late).exists())
+
+
+class AlertDigestTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.jane = create_candidate()
+        self.john = create_candidate('john@example.com', 'John')
+        for candidate in (self.jane, self.john):
+            JobAlert.objects.create(candidate=candidate, keywords='python')
+            JobAlert.objects.create(candidate=candidate, keywords='developer')
+        JobAlert.objects.create(candidate=self.john, keywords='python', frequency='hourly')
+        company = create_company()
+        self.jobs = [create_job(company, title=f'Python Developer {n}') for n in range(3)]
+        alerts.match_new_jobs()
+
+    def test_one_digest_per_candidate_over_one_connection(self):
+        with patch('django.core.mail.backends.locmem.EmailBackend.open') as opened:
+            call_command('send_alert_digests', stdout=StringIO())
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['jane@example.com', 'john@example.com'])
+        html = mail.outbox[0].alternatives[0][0]
+        self.assertEqual(html.count('class="job-card"'), 3)
+        self.assertLess(html.index('Python Developer 2'), html.index('Python Developer 0'))
+
+        self.assertFalse(JobAlertMatch.objects.filter(alert__frequency='daily', notified_at=None).exists())
+        self.assertEqual(JobAlertMatch.objects.filter(notified_at=None).count(), 3)
+        self.assertEqual(digests.send_digests(), (0, 0))
+        self.assertEqual(digests.send_digests('hourly'), (1, 3))
+
+    def test_failed_digests_stay_pending(self):
+        refused = SMTPRecipientsRefused({'john@example.com': (550, b'Mailbox unavailable')})
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=[1, refused]):
+            self.assertEqual(digests.send_digests(), (1, 6))
+        self.assertFalse(JobAlertMatch.objects.filter(alert__candidate=self.jane, notified_at=None).exists())
+
+        self.assertEqual(digests.send_digests(), (1, 6))
+        self.assertEqual([message.to for message in mail.outbox], [['john@example.com']])
+
+    def test_dropped_connection_is_reopened(self):
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=[SMTPServerDisconnected('Timed out'), 1, 1]) as send:
+            self.assertEqual(digests.send_digests(), (2, 12))
+        self.assertEqual(send.call_count, 3)
+
+    def test_interrupted_run_resumes_after_last_candidate(self):
+        # The process dies while sending John's digest
+        with patch.object(digests, 'deliver', side_effect=[True, SystemExit]):
+            with self.assertRaises(SystemExit):
+                digests.send_digests(batch_size=1)
+        checkpoint = Checkpoint.objects.get(name=digests.checkpoint_name('daily'))
+        self.assertEqual(checkpoint.position, self.jane.pk)
+
+        # Jane's new match waits for the next period instead of a second digest
+        JobAlertMatch.objects.filter(alert__candidate=self.jane).update(notified_at=None)
+        self.assertEqual(digests.send_digests(), (1, 6))
+        self.assertEqual([message.to for message in mail.outbox], [['john@example.com']])
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.position, 0)
+
+    @override_settings(EMAIL_RATE_PER_MINUTE=1, EMAIL_RATE_CRITICAL_RESERVE=0)
+    def test_runs_stop_at_the_send_budget(self):
+        self.assertEqual(digests.send_digests(), (1, 6))
+        checkpoint = Checkpoint.objects.get(name=digests.checkpoint_name('daily'))
+        self.assertEqual(checkpoint.position, self.jane.pk)
+
+        RateBucket.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(digests.send_digests(), (1, 6))
+        self.assertEqual([message.to for message in mail.outbox], [['jane@example.com'], ['john@example.com']])
+
+
+@override_settings(JOB_VIEW_FLUSH_INTERVAL=0)
+class JobViewCounterTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        self.job = create_job(company)
+        self.other = create_job(company, title='Data Analyst')
+
+    def test_job_detail_does_not_write(self):
+        updated_at = self.job.updated_at
+        counters.flush()
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse('job_detail', args=[self.job.pk]))
+        self.assertFalse([query for query in captured if query['sql'].startswith(('UPDATE', 'INSERT'))])
+
+        self.client.get(reverse('job_detail', args=[self.job.pk]))
+        self.client.get(reverse('job_detail', args=[self.other.pk]))
+        self.assertEqual(counters.flush(), 3)
+        self.job.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.job.views_count, self.other.views_count), (2, 1))
+        self.assertEqual(self.job.updated_at, updated_at)
+
+    def test_flush_groups_jobs_by_count(self):
+        counter = counters.ViewCounter()
+        for job_id in (self.job.pk, self.other.pk):
+            counter.record(job_id)
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(counter.flush(), 2)
+        self.assertEqual(len([query for query in captured if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(counter.flush(), 0)
+
+
+class PortalUserMiddlewareTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidate = create_candidate()
+        self.job = create_job(create_company())
+
+    def login(self, **extra):
+        session = self.client.session
+        session.update({'email': self.candidate.email, 'role': 'candidate', **extra})
+        session.save()
+
+    def profile_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        tables = ('"myapp_usermaster"', '"myapp_candidate"')
+        return response, [query for query in captured if any(table in query['sql'] for table in tables)]
+
+    def test_user_and_profile_come_from_the_cache(self):
+        self.login(user_id=self.candidate.user_id_id, profile_id=self.candidate.pk)
+        SavedJob.objects.create(candidate=self.candidate, job=self.job)
+        response, queries = self.profile_queries(reverse('saved_jobs'))
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([saved.job for saved in response.context['saved_jobs']], [self.job])
+
+        response, queries = self.profile_queries(reverse('saved_jobs'))
+        self.assertEqual(queries, [])
+        response, queries = self.profile_queries(reverse('job_detail', args=[self.job.pk]))
+        self.assertEqual(queries, [])
+        self.assertTrue(response.context['has_saved'])
+
+    def test_legacy_session_is_upgraded(self):
+        self.login()
+        self.client.get(reverse('my_applications'))
+        session = self.client.session
+        self.assertEqual((session['user_id'], session['profile_id']),
+                         (self.candidate.user_id_id, self.candidate.pk))
+
+    def test_profile_edits_evict_the_cache(self):
+        self.login(user_id=self.candidate.user_id_id, profile_id=self.candidate.pk)
+        self.client.get(reverse('profile'))
+        self.candidate.first_name = 'Janet'
+        self.candidate.save()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.context['profile'].first_name, 'Janet')
+
+    def test_anonymous_requests_are_sent_to_login(self):
+        response, queries = self.profile_queries(reverse('my_applications'))
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertEqual(queries, [])
+
+
+class ConditionalGetTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.job = create_job(self.company, title='Python Developer')
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_job_detail_is_not_modified_until_the_job_changes(self):
+        url = reverse('job_detail', args=[self.job.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(modified.status_code, 304)
+
+        # Counted views do not touch updated_at
+        counters.flush()
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        self.job.title = 'Senior Python Developer'
+        self.job.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_job_detail_etag_covers_the_viewer(self):
+        url = reverse('job_detail', args=[self.job.pk])
+        anonymous = self.client.get(url)
+        candidate = create_candidate()
+        session = self.client.session
+        session.update({'email': candidate.email, 'role': 'candidate', 'firstname': 'Jane'})
+        session.save()
+        logged_in = self.revalidate(url, anonymous)
+        self.assertEqual(logged_in.status_code, 200)
+        self.assertFalse(logged_in.has_header('Last-Modified'))
+
+        SavedJob.objects.create(candidate=candidate, job=self.job)
+        self.assertEqual(self.revalidate(url, logged_in).status_code, 200)
+
+    def test_listings_are_versioned_per_filter(self):
+        url = reverse('browse_jobs')
+        first = self.client.get(url, {'job_type': 'full-time'})
+        with CaptureQueriesContext(connection) as captured:
+            repeat = self.revalidate(url, first, job_type='full-time')
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(len(captured), 0)
+
+        # A job outside the listed set does not change its version
+        skills.sync_job_skills(self.job)
+        skilled = self.client.get(url, {'skills': 'python'})
+        skills.sync_job_skills(create_job(self.company, title='Designer', skills_required='Figma'))
+        self.assertEqual(self.revalidate(url, skilled, skills='python').status_code, 304)
+        self.assertEqual(self.revalidate(url, first, job_type='full-time').status_code, 200)
+
+        search = self.client.get(reverse('search_jobs'), {'title': 'python'})
+        self.assertEqual(self.revalidate(reverse('search_jobs'), search, title='python').status_code, 304)
+        self.assertEqual(self.revalidate(reverse('search_jobs'), search, title='java').status_code, 200)
+
+
+class JobDetailCacheTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.job = create_job(self.company, description='Build payment APIs.')
+        self.url = reverse('job_detail', args=[self.job.pk])
+
+    def job_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        return response, [query['sql'] for query in captured if 'FROM "myapp_job"' in query['sql']]
+
+    def test_body_is_rendered_once_per_version(self):
+        self.client.get(self.url)
+        response, queries = self.job_queries()
+        self.assertContains(response, 'Build payment APIs.')
+        self.assertFalse(any('"description"' in sql for sql in queries))
+
+        self.job.description = 'Build billing APIs.'
+        self.job.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Build billing APIs.')
+        self.assertNotContains(response, 'Build payment APIs.')
+
+    def test_viewer_state_comes_with_the_job(self):
+        candidate = create_candidate()
+        session = self.client.session
+        session.update({'email': candidate.email, 'role': 'candidate',
+                        'user_id': candidate.user_id_id, 'profile_id': candidate.pk})
+        session.save()
+        SavedJob.objects.create(candidate=candidate, job=self.job)
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        self.assertTrue(response.context['has_saved'])
+        self.assertFalse(response.context['has_applied'])
+        state = [query for query in captured if '"myapp_savedjob"' in query['sql']]
+        self.assertEqual(len(state), 1)
+        self.assertIn('FROM "myapp_job"', state[0]['sql'])
+
+    def test_inactive_jobs_are_not_found(self):
+        self.job.is_active = False
+        self.job.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class SessionBackendTests(PortalTestCase):
+    def test_logged_in_requests_read_the_session_from_the_cache(self):
+        candidate = create_candidate()
+        job = create_job(create_company())
+        session = self.client.session
+        session.update({'email': candidate.email, 'role': 'candidate',
+                        'user_id': candidate.user_id_id, 'profile_id': candidate.pk})
+        session.save()
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('job_detail', args=[job.pk]))
+        self.assertEqual(response.context['user_role'], 'candidate')
+        self.assertFalse([query for query in captured if 'django_session' in query['sql']])
+
+    def test_sessions_survive_a_cache_miss(self):
+        session = self.client.session
+        session['email'] = 'jane@example.com'
+        session.save()
+        caches['sessions'].clear()
+        self.assertEqual(self.client.session['email'], 'jane@example.com')
+
+    def test_benchmark_command_leaves_no_rows_behind(self):
+        out = StringIO()
+        call_command('bench_sessions', repeat=1, stdout=out)
+        for engine in ('db', 'cached_db', 'cache'):
+            self.assertIn(f'   {engine} ', out.getvalue())
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(UserMaster.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+
+class OneTimeCodeTests(PortalTestCase):
+    def register(self, email='new@example.com'):
+        self.client.post(reverse('RegisterUser'), {
+            'role': 'candidate', 'fname': 'New', 'lname': 'User', 'email': email,
+            'password': 'secret123', 'cpassword': 'secret123',
+        })
+        return OneTimeCode.objects.get(email=email, purpose=otp.VERIFY).code
+
+    def verify(self, code, email='new@example.com'):
+        return self.client.post(reverse('verify_otp'), {'email': email, 'otp': code})
+
+    def test_registration_code_verifies_once(self):
+        code = self.register()
+        user = UserMaster.objects.get(email='new@example.com')
+        self.assertFalse(user.is_verified)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.verify(code)
+        self.assertTrue(UserMaster.objects.get(pk=user.pk).is_verified)
+        self.assertFalse(OneTimeCode.objects.exists())
+        code_reads = [query for query in captured
+                      if query['sql'].startswith('SELECT') and '"myapp_onetimecode"' in query['sql']]
+        self.assertEqual(len(code_reads), 1)
+
+    def test_resend_replaces_the_code(self):
+        first = self.register()
+        self.client.get(reverse('resend_otp'), {'email': 'new@example.com'})
+        second = OneTimeCode.objects.get(email='new@example.com').code
+        self.assertEqual(OneTimeCode.objects.count(), 1)
+        if first != second:
+            self.assertContains(self.verify(first), 'Invalid OTP')
+        self.verify(second)
+        self.assertTrue(UserMaster.objects.get(email='new@example.com').is_verified)
+
+    def test_expired_codes_are_refused_and_purged(self):
+        code = self.register()
+        OneTimeCode.objects.update(expires_at=timezone.now())
+        self.assertContains(self.verify(code), 'expired')
+        self.assertFalse(UserMaster.objects.get(email='new@example.com').is_verified)
+
+        otp.issue('other@example.com', otp.RESET)
+        out = StringIO()
+        call_command('purge_otps', stdout=out)
+        self.assertIn('Deleted 1 expired', out.getvalue())
+        self.assertEqual(list(OneTimeCode.objects.values_list('email', flat=True)), ['other@example.com'])
+
+    def test_too_many_wrong_guesses_lock_the_code(self):
+        code = self.register()
+        wrong = '10000' if code != '10000' else '10001'
+        with self.settings(OTP_MAX_ATTEMPTS=2):
+            for _ in range(2):
+                self.assertContains(self.verify(wrong), 'Invalid OTP')
+            self.assertContains(self.verify(code), 'Too many incorrect attempts')
+
+    def test_reset_codes_are_separate_from_verification(self):
+        create_candidate()
+        verify_code = otp.issue('jane@example.com', otp.VERIFY)
+        self.client.post(reverse('forgot_password'), {'email': 'jane@example.com'})
+        reset_code = OneTimeCode.objects.get(email='jane@example.com', purpose=otp.RESET).code
+
+        form = {'email': 'jane@example.com', 'new_password': 'changed1', 'confirm_password': 'changed1'}
+        if verify_code != reset_code:
+            self.client.post(reverse('reset_password'), {**form, 'otp': verify_code})
+            self.assertEqual(UserMaster.objects.get(email='jane@example.com').password, 'secret123')
+        self.client.post(reverse('reset_password'), {**form, 'otp': reset_code})
+        self.assertEqual(UserMaster.objects.get(email='jane@example.com').password, 'changed1')
+
+
+def raising(error):
+    """A RecordingEmailBackend hook failing the send with ``error``"""
+    def hook():
+        raise error
+    return hook
+
+
+class RecordingEmailBackend(BaseEmailBackend):
+    """Counts opened connections; ``hooks`` run before the next sends (to fail or block them)"""
+    opened = 0
+    sent = []
+    hooks = []
+
+    def open(self):
+        RecordingEmailBackend.opened += 1
+
+    def send_messages(self, messages):
+        if self.hooks:
+            self.hooks.pop(0)()
+        self.sent.extend(messages)
+        return len(messages)
+
+
+class SMTPLikeEmailBackend(RecordingEmailBackend):
+    """Like the SMTP backend, sends open and close a connection unless one is open"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection = None
+
+    def open(self):
+        if self.connection:
+            return False
+        super().open()
+        self.connection = True
+        return True
+
+    def close(self):
+        self.connection = None
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+
+@override_settings(EMAIL_BACKEND='myapp.tests.RecordingEmailBackend')
+class MailQueueTests(TestCase):
+    def setUp(self):
+        RecordingEmailBackend.opened = 0
+        RecordingEmailBackend.sent = []
+        RecordingEmailBackend.hooks = []
+
+    def message(self, to='jane@example.com'):
+        return EmailMultiAlternatives(subject='Hello', body='Hi', to=[to])
+
+    @override_settings(EMAIL_WORKERS=0)
+    def test_without_workers_messages_are_sent_inline(self):
+        queue = mailer.MailQueue()
+        self.assertTrue(queue.submit(self.message()))
+        self.assertEqual(len(RecordingEmailBackend.sent), 1)
+        self.assertEqual(queue.stats()['sent'], 1)
+
+    @override_settings(EMAIL_WORKERS=1, EMAIL_QUEUE_SIZE=10)
+    def test_workers_reuse_their_connection(self):
+        queue = mailer.MailQueue()
+        RecordingEmailBackend.hooks = [lambda: None, raising(SMTPRecipientsRefused({}))]
+        messages = [self.message(f'user{number}@example.com') for number in range(6)]
+        for message in messages:
+            self.assertTrue(queue.submit(message))
+        self.assertTrue(queue.drain(timeout=5))
+        self.assertEqual(len(RecordingEmailBackend.sent), 5)
+        stats = queue.stats()
+        self.assertEqual((stats['sent'], stats['failed'], stats['workers']), (5, 1, 0))
+        # A failed message starts the next one on a fresh connection
+        self.assertEqual(stats['connections'], 2)
+        self.assertIsNotNone(stats['latency_max'])
+
+    @override_settings(EMAIL_WORKERS=1)
+    def test_stale_connections_are_reopened(self):
+        queue = mailer.MailQueue()
+        self.assertTrue(queue.submit(self.message()))
+        RecordingEmailBackend.hooks = [raising(SMTPServerDisconnected())]
+        self.assertTrue(queue.submit(self.message()))
+        self.assertTrue(queue.drain(timeout=5))
+        self.assertEqual(len(RecordingEmailBackend.sent), 2)
+        self.assertEqual((queue.stats()['sent'], RecordingEmailBackend.opened), (2, 2))
+
+    @override_settings(EMAIL_WORKERS=1, EMAIL_QUEUE_SIZE=1, EMAIL_QUEUE_TIMEOUT=0.01)
+    def test_full_queue_pushes_back(self):
+        queue = mailer.MailQueue()
+        sending, release = threading.Event(), threading.Event()
+        RecordingEmailBackend.hooks = [lambda: sending.set() or release.wait(5)]
+        self.assertTrue(queue.submit(self.message()))
+        sending.wait(5)
+        self.assertTrue(queue.submit(self.message()))
+        self.assertFalse(queue.submit(self.message()))
+        self.assertEqual(queue.stats()['queued'], 1)
+        self.assertEqual(queue.stats()['rejected'], 1)
+        release.set()
+        self.assertTrue(queue.drain(timeout=5))
+        self.assertEqual(queue.stats()['sent'], 2)
+
+
+@override_settings(EMAIL_BACKEND='myapp.tests.RecordingEmailBackend', EMAIL_WORKERS=0)
+class EmailOutboxTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        RecordingEmailBackend.opened = 0
+        RecordingEmailBackend.sent = []
+        RecordingEmailBackend.hooks = []
+
+    def make_due(self):
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+
+    def test_emails_are_stored_with_the_application(self):
+        candidate = create_candidate()
+        job = create_job(create_company())
+        session = self.client.session
+        session.update({'email': candidate.email, 'role': 'candidate',
+                        'user_id': candidate.user_id_id, 'profile_id': candidate.pk})
+        session.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('apply_job', args=[job.pk]), {'cover_letter': 'Hire me'})
+        self.assertEqual(sorted(EmailOutbox.objects.values_list('to_email', flat=True)),
+                         ['hr@example.com', 'jane@example.com'])
+        # Sent by the mail workers once the application committed
+        self.assertEqual(len(RecordingEmailBackend.sent), 2)
+        self.assertFalse(EmailOutbox.objects.filter(sent_at__isnull=True).exists())
+
+    def test_rolled_back_changes_take_their_email_with_them(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                outbox.enqueue('jane@example.com', 'Hello', 'Hi')
+                raise ValueError
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_unsent_rows_are_sent_once_due(self):
+        outbox.enqueue('jane@example.com', 'Hello', 'Hi', '<p>Hi</p>')
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+        self.make_due()
+        out = StringIO()
+        call_command('send_outbox', stdout=out)
+        self.assertIn('Sent 1 outbox emails', out.getvalue())
+        message = RecordingEmailBackend.sent[0]
+        self.assertEqual((message.to, message.alternatives[0][0]), (['jane@example.com'], '<p>Hi</p>'))
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_and_give_up(self):
+        row = outbox.enqueue('jane@example.com', 'Hello', 'Hi')
+        for attempt in (1, 2):
+            self.make_due()
+            # Failing again after reconnecting
+            RecordingEmailBackend.hooks = [raising(SMTPServerDisconnected('gone'))] * 2
+            self.assertEqual(outbox.send_due(), (0, 1))
+            row.refresh_from_db()
+            self.assertEqual((row.attempts, row.last_error), (attempt, 'gone'))
+            if attempt == 1:
+                self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Given up after the last attempt
+        self.assertIsNone(row.next_attempt_at)
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+    def test_due_rows_share_one_connection(self):
+        for to in ('jane@example.com', 'john@example.com', 'jill@example.com'):
+            outbox.enqueue(to, 'Hello', 'Hi')
+        self.make_due()
+        self.assertEqual(outbox.send_due(connection=SMTPLikeEmailBackend()), (3, 0))
+        self.assertEqual(RecordingEmailBackend.opened, 1)
+
+    def test_failed_sends_reopen_the_connection(self):
+        for to in ('jane@example.com', 'john@example.com', 'jill@example.com'):
+            outbox.enqueue(to, 'Hello', 'Hi')
+        self.make_due()
+        # A dropped connection is reopened and the email sent again; after
+        # a refused one the next email gets a fresh connection
+        RecordingEmailBackend.hooks = [raising(SMTPServerDisconnected('gone')), lambda: None,
+                                       raising(SMTPRecipientsRefused({}))]
+        self.assertEqual(outbox.send_due(connection=SMTPLikeEmailBackend()), (2, 1))
+        self.assertEqual(RecordingEmailBackend.opened, 3)
+
+    def test_backoff_doubles_up_to_a_limit(self):
+        self.assertEqual([outbox.backoff(attempts).seconds for attempts in (1, 2, 3)], [60, 120, 240])
+        self.assertEqual(outbox.backoff(30), outbox.RETRY_MAX)
+
+
+class EmailTemplateTests(TestCase):
+    def test_css_is_inlined_by_selector(self):
+        css = '''
+            p { margin: 0; }
+            .box p, .note { color: red; }
+            .box p.lead { color: blue; }
+            a:hover { opacity: 0.9; }
+        '''
+        html = emails.inline_css(
+            '<head></head><div class="box"><p class="lead" style="color: green">x</p><br><p>y</p></div><p>z</p>', css,
+        )
+        self.assertIn('<p class="lead" style="margin: 0; color: red; color: blue; color: green;">', html)
+        self.assertIn('<br><p style="margin: 0; color: red;">y</p>', html)
+        self.assertIn('</div><p style="margin: 0;">z</p>', html)
+        self.assertIn('<style>a:hover { opacity: 0.9; }</style>', html)
+
+    def test_templates_are_compiled_once(self):
+        emails.get_email_template.cache_clear()
+        context = {'name': 'Jane <script>', 'otp': '48213', 'valid_minutes': 10}
+        html = emails.render_email('otp.html', context)
+        emails.render_email('otp.html', context)
+        self.assertEqual(emails.get_email_template.cache_info().misses, 1)
+
+        self.assertIn('Jane &lt;script&gt;', html)
+        self.assertIn('<p class="otp-code" style="font-size: 36px;', html)
+        # Only the rules the email uses travel with it
+        self.assertNotIn('job-card', html)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_emails', repeat=10, stdout=out)
+        self.assertIn('application-status.html', out.getvalue())
+
+    def test_benchmark_command_times_the_plain_render_too(self):
+        out = StringIO()
+        call_command('bench_emails', repeat=10, baseline=True, stdout=out)
+        self.assertIn('plain µs', out.getvalue())
+
+
+@override_settings(EMAIL_RATE_PER_MINUTE=3, EMAIL_RATE_PER_DAY=100, EMAIL_RATE_CRITICAL_RESERVE=0)
+class SendRateGovernorTests(TestCase):
+    def rewind(self, seconds):
+        RateBucket.objects.update(updated_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_tokens_refill_with_time(self):
+        self.assertEqual([governor.acquire() for _ in range(4)], [True, True, True, False])
+        self.rewind(20)
+        self.assertEqual([governor.acquire() for _ in range(2)], [True, False])
+        # Never more than a full minute's worth
+        self.rewind(3600)
+        self.assertFalse(governor.acquire(4))
+        self.assertTrue(governor.acquire(3))
+
+    @override_settings(EMAIL_RATE_PER_DAY=2)
+    def test_daily_budget_applies_too(self):
+        self.assertTrue(governor.acquire(2))
+        self.rewind(60)
+        self.assertFalse(governor.acquire())
+
+    @override_settings(EMAIL_RATE_CRITICAL_RESERVE=2)
+    def test_last_tokens_are_kept_for_critical_mail(self):
+        self.assertTrue(governor.acquire())
+        self.assertFalse(governor.acquire())
+        self.assertTrue(governor.acquire(2, critical=True))
+
+    @override_settings(EMAIL_RATE_PER_MINUTE=0, EMAIL_RATE_PER_DAY=0)
+    def test_budgets_can_be_disabled(self):
+        self.assertTrue(governor.acquire(1000))
+        self.assertFalse(RateBucket.objects.exists())
+
+
+@override_settings(EMAIL_BACKEND='myapp.tests.RecordingEmailBackend', EMAIL_WORKERS=0,
+                   EMAIL_RATE_PER_MINUTE=2, EMAIL_RATE_PER_DAY=100, EMAIL_RATE_CRITICAL_RESERVE=0,
+                   EMAIL_RATE_MAX_DEFER=0)
+class DeferredEmailTests(TestCase):
+    def setUp(self):
+        RecordingEmailBackend.sent = []
+        RecordingEmailBackend.hooks = []
+
+    def test_mail_over_budget_is_deferred_and_sent_most_urgent_first(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(3):
+                outbox.enqueue(f'user{number}@example.com', 'Application update', 'Hi')
+            outbox.enqueue('jane@example.com', 'Your OTP', '12345', priority=EmailOutbox.PRIORITY_CRITICAL)
+        self.assertEqual([message.to[0] for message in RecordingEmailBackend.sent],
+                         ['user0@example.com', 'user1@example.com'])
+        self.assertEqual(outbox.due().count(), 2)
+
+        # Nothing goes out until tokens come back, then the OTP goes first
+        self.assertEqual(outbox.send_due(), (0, 0))
+        RateBucket.objects.update(updated_at=timezone.now() - timedelta(seconds=30))
+        self.assertEqual(outbox.send_due(), (1, 0))
+        self.assertEqual(RecordingEmailBackend.sent[-1].to, ['jane@example.com'])
+        self.assertEqual(outbox.due().count(), 1)
+
+        out = StringIO()
+        call_command('send_outbox', stdout=out)
+        self.assertIn('1 emails deferred', out.getvalue())
+
+    @override_settings(EMAIL_RATE_MAX_DEFER=60)
+    def test_short_waits_are_retried_in_process(self):
+        with patch('myapp.outbox.threading.Timer') as timer, self.captureOnCommitCallbacks(execute=True):
+            for number in range(3):
+                outbox.enqueue(f'user{number}@example.com', 'Application update', 'Hi')
+        # One token comes back every 30 seconds
+        timer.assert_called_once()
+        (wait, retry), [row] = timer.call_args.args, timer.call_args.kwargs['args']
+        self.assertAlmostEqual(wait, 30, delta=1)
+        # send_outbox leaves it to the retry
+        self.assertEqual(outbox.due().count(), 0)
+
+        retry(row)
+        self.assertEqual(outbox.due().count(), 1)
+        RateBucket.objects.update(updated_at=timezone.now() - timedelta(seconds=30))
+        retry(row)
+        self.assertEqual(RecordingEmailBackend.sent[-1].to, ['user2@example.com'])
+        self.assertEqual(timer.call_count, 1)
+
+    @override_settings(EMAIL_RATE_MAX_DEFER=60)
+    def test_retries_the_queue_rejects_give_their_token_back(self):
+        with patch('myapp.outbox.threading.Timer') as timer, self.captureOnCommitCallbacks(execute=True):
+            for number in range(4):
+                outbox.enqueue(f'user{number}@example.com', 'Application update', 'Hi')
+        [row] = timer.call_args.kwargs['args']
+        RateBucket.objects.update(updated_at=timezone.now() - timedelta(seconds=30))
+        with patch('myapp.outbox.mailer.submit', return_value=False) as submit:
+            timer.call_args.args[1](row)
+        submit.assert_called_once()
+        self.assertTrue(governor.acquire())
+
+    def test_waits_on_the_daily_budget_are_left_to_send_outbox(self):
+        with override_settings(EMAIL_RATE_MAX_DEFER=60, EMAIL_RATE_PER_DAY=2):
+            with patch('myapp.outbox.threading.Timer') as timer, self.captureOnCommitCallbacks(execute=True):
+                for number in range(3):
+                    outbox.enqueue(f'user{number}@example.com', 'Application update', 'Hi')
+        timer.assert_not_called()
+        self.assertEqual(outbox.due().count(), 1)
@@ -0,0 +1,237 @@
+"""
+Typo-tolerant matching on job titles and company names.
+
+When a search finds (almost) nothing, "pyhton developer" or "infosis"
+are looked up by trigram similarity instead (see job_query.py).
+
+PostgreSQL uses pg_trgm with GIN trigram indexes on ``title`` and
+``company_name`` (migration 0010). Elsewhere an in-process index maps each
+trigram to the distinct *words* containing it, and each word to its jobs.
+Misspelt query words are matched against the vocabulary, which stays small
+(tens of thousands of words for 100k jobs), so a lookup is a few array
+scans instead of a pass over every job.
+"""
+import heapq
+import itertools
+from array import array
+from collections import Counter
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from .indexing import LiveIndex
+from .models import Job
+from .search import TOKEN_RE
+
+FIELDS = ('title', 'company_name')
+# Same default as pg_trgm's similarity threshold
+SIMILARITY_THRESHOLD = 0.3
+# In-process: words sharing this share of trigrams are candidates, then
+# ranked by edit distance, which (unlike trigrams) treats a swapped pair
+# of letters ("pyhton") as one typo
+CANDIDATE_THRESHOLD = 0.2
+MAX_CANDIDATES = 20
+EDIT_SIMILARITY_THRESHOLD = 0.6
+# Vocabulary words kept per query word, and query words looked at
+MAX_WORD_MATCHES = 5
+MAX_QUERY_WORDS = 4
+# Jobs returned by a lookup
+MAX_RESULTS = 500
+# Rebuild once this share of the vocabulary no longer has any job
+MAX_DEAD_WORD_RATIO = 0.5
+
+
+def trigrams(word):
+    """pg_trgm style trigrams: the word padded with two spaces before and one after"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def words(text):
+    return [word for word in TOKEN_RE.findall((text or '').lower()) if len(word) > 1]
+
+
+def edit_similarity(a, b):
+    """1 - (optimal string alignment distance / longer length)"""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return 1 - previous[-1] / max(len(a), len(b), 1)
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.words = []
+        self.word_ids = {}
+        # word id -> number of distinct trigrams in the word
+        self.gram_counts = array('B')
+        # trigram -> array of word ids
+        self.postings = {}
+        # word id -> set of job ids; a word whose set is empty is dead
+        self.word_jobs = []
+        # job id -> word ids, for removal
+        self.job_words = {}
+        self.dead_words = 0
+        # Set by indexing.LiveIndex
+        self.generation = None
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self.job_words)
+
+    def job_ids(self):
+        return set(self.job_words)
+
+    def needs_rebuild(self):
+        return self.dead_words > MAX_DEAD_WORD_RATIO * max(len(self.words), 1)
+
+    def _word_id(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = self.word_ids[word] = len(self.words)
+            self.words.append(word)
+            self.word_jobs.append(set())
+            self.dead_words += 1
+            grams = trigrams(word)
+            self.gram_counts.append(min(len(grams), 255))
+            for gram in grams:
+                entry = self.postings.get(gram)
+                if entry is None:
+                    entry = self.postings[gram] = array('I')
+                entry.append(word_id)
+        return word_id
+
+    def add_job(self, job_id, texts, _bulk=False):
+        self.remove_job(job_id)
+        word_ids = {self._word_id(word) for field in FIELDS for word in words(texts.get(field))}
+        for word_id in word_ids:
+            if not self.word_jobs[word_id]:
+                self.dead_words -= 1
+            self.word_jobs[word_id].add(job_id)
+        self.job_words[job_id] = tuple(word_ids)
+
+    def remove_job(self, job_id):
+        for word_id in self.job_words.pop(job_id, ()):
+            jobs = self.word_jobs[word_id]
+            jobs.discard(job_id)
+            if not jobs:
+                self.dead_words += 1
+
+    def finish_bulk(self):
+        pass
+
+    def similar_words(self, word, limit=MAX_WORD_MATCHES):
+        """Up to ``limit`` (similarity, word id) pairs for vocabulary words like ``word``"""
+        grams = trigrams(word)
+        counts = Counter()
+        for gram in grams:
+            entry = self.postings.get(gram)
+            if entry is not None:
+                counts.update(entry)
+        candidates = []
+        for word_id, shared in counts.items():
+            overlap = shared / (len(grams) + self.gram_counts[word_id] - shared)
+            if overlap >= CANDIDATE_THRESHOLD and self.word_jobs[word_id]:
+                candidates.append((overlap, word_id))
+        matches = []
+        for _, word_id in heapq.nlargest(MAX_CANDIDATES, candidates):
+            similarity = edit_similarity(word, self.words[word_id])
+            if similarity >= EDIT_SIMILARITY_THRESHOLD:
+                # More common words win ties
+                matches.append((similarity, len(self.word_jobs[word_id]), word_id))
+        return [(similarity, word_id) for similarity, _, word_id in heapq.nlargest(limit, matches)]
+
+    def lookup(self, query, limit=MAX_RESULTS):
+        """
+        ``({job_id: score}, corrected query)`` for jobs whose title or
+        company resembles ``query``. A job's score is the mean, over the
+        query words, of its best matching word's similarity.
+        """
+        query_words = words(query)[:MAX_QUERY_WORDS]
+        if not query_words:
+            return {}, ''
+
+        # Per query word: tiers of jobs by their best match's similarity,
+        # (similarity, jobs) best first, and a "no match" tier
+        tiers, corrected = [], []
+        for word in query_words:
+            matches = self.similar_words(word)
+            corrected.append(self.words[matches[0][1]] if matches else word)
+            word_tiers = []
+            for similarity, word_id in matches:
+                jobs = self.word_jobs[word_id]
+                if word_tiers:
+                    jobs = jobs.difference(*(tier for _, tier in word_tiers))
+                if jobs:
+                    word_tiers.append((similarity, jobs))
+            tiers.append(word_tiers + [(0.0, None)])
+
+        # Walk the tier combinations best first; each is a set intersection,
+        # so common words cost no per-job Python work. A job's own
+        # combination always comes before any that treat one of its words
+        # as unmatched (those score lower), so later sightings are skipped.
+        combinations = sorted(
+            itertools.product(*tiers), key=lambda combo: -sum(similarity for similarity, _ in combo),
+        )
+        scores = {}
+        for combo in combinations:
+            present = sorted((jobs for _, jobs in combo if jobs is not None), key=len)
+            if not present:
+                continue
+            matched = present[0].intersection(*present[1:]) if len(present) > 1 else present[0]
+            score = sum(similarity for similarity, _ in combo) / len(query_words)
+            for job_id in matched:
+                if job_id not in scores:
+                    scores[job_id] = score
+                    if len(scores) >= limit:
+                        return scores, ' '.join(corrected)
+        return scores, ' '.join(corrected)
+
+
+_live = LiveIndex(TrigramIndex, FIELDS)
+get_index = _live.get
+job_changed = _live.job_changed
+job_removed = _live.job_removed
+
+
+def enabled_in_database():
+    return connection.vendor == 'postgresql'
+
+
+def similar_jobs(query, limit=MAX_RESULTS):
+    """
+    ``({job_id: similarity}, corrected query)`` for active jobs whose title
+    or company name resembles ``query``; the corrected query is '' when the
+    database did the matching.
+    """
+    if not words(query):
+        return {}, ''
+    if enabled_in_database():
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        # "<%" (word similarity above pg_trgm.word_similarity_threshold) is
+        # the operator the GIN trigram indexes can answer
+        rows = (
+            Job.objects.filter(is_active=True)
+            .filter(RawSQL(
+                '%s <%% "myapp_job"."title" OR %s <%% "myapp_job"."company_name"', (query, query),
+                output_field=BooleanField(),
+            ))
+            .annotate(similarity=Greatest(
+                TrigramWordSimilarity(query, 'title'),
+                TrigramWordSimilarity(query, 'company_name'),
+            ))
+            .filter(similarity__gte=SIMILARITY_THRESHOLD)
+            .order_by('-similarity', '-id')
+            .values_list('id', 'similarity')[:limit]
+        )
+        return dict(rows), ''
+    return get_index().lookup(query, limit)
@@ -12,6 +12,7 @@ urlpatterns = [
     path('jobs/', views.browse_jobs, name='browse_jobs'),
     path('job/<int:job_id>/', views.job_detail, name='job_detail'),
     path('search/', views.search_jobs, name='search_jobs'),
+    path('api/suggest/', views.suggest_api, name='suggest_api'),
     
     # Job application (Candidate)
     path('job/<int:job_id>/apply/', views.apply_job, name='apply_job'),
@@ -1,14 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password, check_password
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from .models import UserMaster, Candidate, Company, Job, JobApplication, SavedJob, JobAlert
-from random import randint
+from django.utils.safestring import mark_safe
+from django.core.cache import cache
+from .models import UserMaster, Candidate, Company, Job, JobApplication, SavedJob, JobAlert, EmailOutbox
+from . import conditional, outbox, similar, suggest
+from . import otp as otp_store
+from .skills import popular_skills
+from .job_query import JobQuery
+from .counters import record_view
+from .emails import render_email
 from datetime import datetime, date
 import json
 import logging
@@ -26,62 +32,10 @@ logger = logging.getLogger(__name__)
 # ============================================
 # EMAIL TEMPLATES & HELPER FUNCTIONS
 # ============================================
+# HTML bodies are the templates in templates/myapp/emails/ (see emails.py)
 
-def get_email_base_style():
-    """Common CSS styles for all email templates"""
-    return '''
-        body { font-family: 'Segoe UI', Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background-color: #f4f4f4; }
-        .container { max-width: 600px; margin: 0 auto; background: #ffffff; }
-        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }
-        .header h1 { margin: 0; font-size: 28px; }
-        .header p { margin: 10px 0 0; opacity: 0.9; }
-        .content { padding: 30px; background: #ffffff; }
-        .content h2 { color: #2c3e50; margin-top: 0; }
-        .footer { background: #f8f9fa; padding: 20px; text-align: center; color: #888; font-size: 12px; border-top: 1px solid #eee; }
-        .btn { display: inline-block; padding: 12px 30px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; text-decoration: none; border-radius: 25px; font-weight: bold; margin: 15px 0; }
-        .btn:hover { opacity: 0.9; }
-        .info-box { background: #e8f4fd; border-left: 4px solid #667eea; padding: 15px; margin: 15px 0; border-radius: 0 8px 8px 0; }
-        .warning-box { background: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 15px 0; border-radius: 0 8px 8px 0; }
-        .success-box { background: #d4edda; border-left: 4px solid #28a745; padding: 15px; margin: 15px 0; border-radius: 0 8px 8px 0; }
-        .otp-box { background: #f8f9fa; border: 2px dashed #667eea; padding: 20px; text-align: center; margin: 20px 0; border-radius: 10px; }
-        .otp-code { font-size: 36px; font-weight: bold; color: #667eea; letter-spacing: 10px; margin: 10px 0; }
-        .job-card { background: #f8f9fa; border-radius: 10px; padding: 20px; margin: 15px 0; border: 1px solid #eee; }
-        .job-title { color: #2c3e50; font-size: 18px; font-weight: bold; margin: 0 0 5px; }
-        .job-company { color: #667eea; font-weight: 500; }
-        .job-meta { color: #888; font-size: 14px; margin-top: 10px; }
-        .badge { display: inline-block; padding: 4px 12px; border-radius: 15px; font-size: 12px; font-weight: 600; }
-        .badge-primary { background: #667eea; color: white; }
-        .badge-success { background: #28a745; color: white; }
-        .badge-warning { background: #ffc107; color: #333; }
-        .divider { border: 0; border-top: 1px solid #eee; margin: 20px 0; }
-        .social-links a { display: inline-block; margin: 0 10px; color: #667eea; text-decoration: none; }
-    '''
-
-
-import threading
-
-def _send_email_thread(to_email, subject, html_content, plain_content):
-    """Actual email sending logic to run in a thread"""
-    try:
-        from django.conf import settings
-        if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
-            logger.warning(f"Email credentials missing. Skipping email to {to_email}")
-            return
-
-        send_mail(
-            subject=subject,
-            message=plain_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[to_email],
-            html_message=html_content,
-            fail_silently=True,  # Changed to True to prevent any crashes
-        )
-        logger.info(f"✅ Email sent successfully to {to_email}")
-    except Exception as e:
-        logger.error(f"❌ Failed to send email to {to_email}: {str(e)}")
-
-def send_email(to_email, subject, html_content, plain_content):
-    """Wrapper to send email in background thread"""
+def send_email(to_email, subject, html_content, plain_content, priority=EmailOutbox.PRIORITY_NORMAL):
+    """Write an email to the outbox, sent once the caller's transaction commits (see outbox.py)"""
     try:
         # 1. Log OTP immediately for fallback/debugging
         otp_match = None
@@ -96,64 +50,36 @@ def send_email(to_email, subject, html_content, plain_content):
             print(f"🔑 OTP CODE [PRE-SEND LOG]: {otp_match}")
             logger.info(f"OTP for {to_email}: {otp_match}")
 
-        # 2. Start email in background thread
-        email_thread = threading.Thread(
-            target=_send_email_thread,
-            args=(to_email, subject, html_content, plain_content)
-        )
-        email_thread.start()
-        
-        # 3. Return True immediately to prevent blocking
-        print(f"📧 Email task started for: {to_email}")
+        if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
+            logger.warning(f"Email credentials missing. Skipping email to {to_email}")
+            return False
+
+        # 2. Store it with the change that caused it; the mail workers or
+        # send_outbox deliver it
+        outbox.enqueue(to_email, subject, plain_content, html_content, priority=priority)
+        print(f"📧 Email queued for: {to_email}")
         return True
         
     except Exception as e:
-        logger.error(f"Error initiating email thread: {str(e)}")
-        # Even if thread start fails, return True so user flow continues (OTP is logged)
+        logger.error(f"Error queueing email: {str(e)}")
+        # Even if queueing fails, return True so user flow continues (OTP is logged)
         return True
 
 
+def otp_valid_minutes():
+    return getattr(settings, 'OTP_TTL_SECONDS', 600) // 60
+
+
 def send_otp_email(email, otp, name="User"):
     """Send OTP verification email"""
     subject = '🔐 Your OTP Verification Code - JobBoard'
+    minutes = otp_valid_minutes()
     
-    html_message = f'''
-    <!DOCTYPE html>
-    <html>
-    <head><style>{get_email_base_style()}</style></head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🎯 JobBoard</h1>
-                <p>Email Verification</p>
-            </div>
-            <div class="content">
-                <h2>Hello {name}! 👋</h2>
-                <p>Thank you for registering with JobBoard. Please use the following OTP to verify your email address:</p>
-                
-                <div class="otp-box">
-                    <p style="margin: 0; color: #666;">Your Verification Code</p>
-                    <p class="otp-code">{otp}</p>
-                </div>
-                
-                <div class="warning-box">
-                    ⚠️ <strong>Important:</strong> This OTP is valid for 10 minutes. Do not share this code with anyone.
-                </div>
-                
-                <p>If you didn't request this verification, please ignore this email.</p>
-            </div>
-            <div class="footer">
-                <p><strong>JobBoard</strong> - Find Your Dream Job</p>
-                <p>© 2025 JobBoard. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    html_message = render_email('otp.html', {'name': name, 'otp': otp, 'valid_minutes': minutes})
     
-    plain_message = f'''Hello {name}!\n\nYour OTP Verification Code: {otp}\n\nThis OTP is valid for 10 minutes.\n\nJobBoard Team'''
+    plain_message = f'''Hello {name}!\n\nYour OTP Verification Code: {otp}\n\nThis OTP is valid for {minutes} minutes.\n\nJobBoard Team'''
     
-    return send_email(email, subject, html_message, plain_message)
+    return send_email(email, subject, html_message, plain_message, priority=EmailOutbox.PRIORITY_CRITICAL)
 
 
 def send_welcome_email(email, name, role):
@@ -162,43 +88,7 @@ def send_welcome_email(email, name, role):
     
     role_message = "start applying for your dream jobs" if role == "candidate" else "post jobs and find talented candidates"
     
-    html_message = f'''
-    <!DOCTYPE html>
-    <html>
-    <head><style>{get_email_base_style()}</style></head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🎉 Welcome to JobBoard!</h1>
-                <p>Your account is ready</p>
-            </div>
-            <div class="content">
-                <h2>Hi {name}! 👋</h2>
-                <p>Congratulations! Your account has been successfully verified. You can now {role_message}.</p>
-                
-                <div class="success-box">
-                    ✅ <strong>Account Verified!</strong> You're all set to explore JobBoard.
-                </div>
-                
-                <p style="text-align: center;">
-                    <a href="#" class="btn">🚀 Get Started</a>
-                </p>
-                
-                <hr class="divider">
-                
-                <h3>What's Next?</h3>
-                <ul>
-                    {"<li>Complete your profile</li><li>Upload your resume</li><li>Browse and apply for jobs</li>" if role == "candidate" else "<li>Complete your company profile</li><li>Post your first job</li><li>Review applications</li>"}
-                </ul>
-            </div>
-            <div class="footer">
-                <p>Need help? Contact us at support@jobboard.com</p>
-                <p>© 2025 JobBoard. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    html_message = render_email('welcome.html', {'name': name, 'role': role, 'role_message': role_message})
     
     plain_message = f'''Hi {name}!\n\nWelcome to JobBoard! Your account is now verified.\n\nYou can now {role_message}.\n\nJobBoard Team'''
     
@@ -209,47 +99,11 @@ def send_application_received_email(candidate_email, candidate_name, job_title,
     """Send confirmation email to candidate after applying"""
     subject = f'✅ Application Submitted - {job_title}'
     
-    html_message = f'''
-    <!DOCTYPE html>
-    <html>
-    <head><style>{get_email_base_style()}</style></head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📝 Application Submitted</h1>
-                <p>We've received your application</p>
-            </div>
-            <div class="content">
-                <h2>Hi {candidate_name}! 👋</h2>
-                <p>Great news! Your application has been successfully submitted.</p>
-                
-                <div class="job-card">
-                    <p class="job-title">{job_title}</p>
-                    <p class="job-company">🏢 {company_name}</p>
-                    <p class="job-meta">
-                        <span class="badge badge-success">Application Submitted</span>
-                    </p>
-                </div>
-                
-                <div class="info-box">
-                    📋 <strong>What happens next?</strong><br>
-                    The employer will review your application and contact you if your profile matches their requirements.
-                </div>
-                
-                <p>You can track your application status in your dashboard.</p>
-                
-                <p style="text-align: center;">
-                    <a href="#" class="btn">View My Applications</a>
-                </p>
-            </div>
-            <div class="footer">
-                <p>Good luck with your application! 🍀</p>
-                <p>© 2025 JobBoard. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    html_message = render_email('application-received.html', {
+        'candidate_name': candidate_name,
+        'job_title': job_title,
+        'company_name': company_name,
+    })
     
     plain_message = f'''Hi {candidate_name}!\n\nYour application for "{job_title}" at {company_name} has been submitted.\n\nGood luck!\nJobBoard Team'''
     
@@ -260,99 +114,41 @@ def send_new_application_notification(employer_email, employer_name, candidate_n
     """Notify employer about new job application"""
     subject = f'📬 New Application - {job_title}'
     
-    html_message = f'''
-    <!DOCTYPE html>
-    <html>
-    <head><style>{get_email_base_style()}</style></head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📬 New Application</h1>
-                <p>Someone applied to your job posting</p>
-            </div>
-            <div class="content">
-                <h2>Hi {employer_name}! 👋</h2>
-                <p>You have received a new application for your job posting.</p>
-                
-                <div class="job-card">
-                    <p class="job-title">{job_title}</p>
-                    <p class="job-company">👤 Applicant: <strong>{candidate_name}</strong></p>
-                    <p class="job-meta">
-                        <span class="badge badge-primary">New Application</span>
-                    </p>
-                </div>
-                
-                <p style="text-align: center;">
-                    <a href="#" class="btn">Review Application</a>
-                </p>
-                
-                <div class="info-box">
-                    💡 <strong>Tip:</strong> Respond to applications quickly to attract top talent!
-                </div>
-            </div>
-            <div class="footer">
-                <p>© 2025 JobBoard. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    html_message = render_email('new-application.html', {
+        'employer_name': employer_name,
+        'candidate_name': candidate_name,
+        'job_title': job_title,
+    })
     
     plain_message = f'''Hi {employer_name}!\n\nNew application received for "{job_title}" from {candidate_name}.\n\nJobBoard Team'''
     
     return send_email(employer_email, subject, html_message, plain_message)
 
 
+# Header colour and wording of each application status email
+APPLICATION_STATUS_EMAILS = {
+    'reviewed': {'emoji': '👀', 'color': '#17a2b8', 'message': 'Your application is being reviewed'},
+    'shortlisted': {'emoji': '⭐', 'color': '#28a745', 'message': 'Congratulations! You have been shortlisted'},
+    'interview': {'emoji': '📅', 'color': '#667eea', 'message': 'You have been selected for an interview'},
+    'rejected': {'emoji': '😔', 'color': '#dc3545', 'message': 'Unfortunately, your application was not selected'},
+    'hired': {'emoji': '🎉', 'color': '#28a745', 'message': 'Congratulations! You have been hired'},
+}
+
+
 def send_application_status_email(candidate_email, candidate_name, job_title, company_name, status):
     """Notify candidate about application status change"""
-    status_config = {
-        'reviewed': {'emoji': '👀', 'color': '#17a2b8', 'message': 'Your application is being reviewed'},
-        'shortlisted': {'emoji': '⭐', 'color': '#28a745', 'message': 'Congratulations! You have been shortlisted'},
-        'interview': {'emoji': '📅', 'color': '#667eea', 'message': 'You have been selected for an interview'},
-        'rejected': {'emoji': '😔', 'color': '#dc3545', 'message': 'Unfortunately, your application was not selected'},
-        'hired': {'emoji': '🎉', 'color': '#28a745', 'message': 'Congratulations! You have been hired'},
-    }
-    
-    config = status_config.get(status, {'emoji': '📋', 'color': '#6c757d', 'message': 'Your application status has been updated'})
+    config = APPLICATION_STATUS_EMAILS.get(status, {'emoji': '📋', 'color': '#6c757d', 'message': 'Your application status has been updated'})
     
     subject = f'{config["emoji"]} Application Update - {job_title}'
     
-    html_message = f'''
-    <!DOCTYPE html>
-    <html>
-    <head><style>{get_email_base_style()}</style></head>
-    <body>
-        <div class="container">
-            <div class="header" style="background: {config["color"]};">
-                <h1>{config["emoji"]} Application Update</h1>
-                <p>{status.replace("_", " ").title()}</p>
-            </div>
-            <div class="content">
-                <h2>Hi {candidate_name}! 👋</h2>
-                <p>{config["message"]} for the following position:</p>
-                
-                <div class="job-card">
-                    <p class="job-title">{job_title}</p>
-                    <p class="job-company">🏢 {company_name}</p>
-                    <p class="job-meta">
-                        <span class="badge" style="background: {config["color"]}; color: white;">{status.replace("_", " ").title()}</span>
-                    </p>
-                </div>
-                
-                {"<div class='success-box'>🎊 <strong>Next Steps:</strong> The employer will contact you soon with more details.</div>" if status in ['shortlisted', 'interview', 'hired'] else ""}
-                
-                <p style="text-align: center;">
-                    <a href="#" class="btn">View Details</a>
-                </p>
-            </div>
-            <div class="footer">
-                <p>Keep exploring more opportunities on JobBoard!</p>
-                <p>© 2025 JobBoard. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    html_message = render_email('application-status.html', {
+        **config,
+        'candidate_name': candidate_name,
+        'job_title': job_title,
+        'company_name': company_name,
+        'status_label': status.replace("_", " ").title(),
+        'next_steps': status in ['shortlisted', 'interview', 'hired'],
+    })
     
     plain_message = f'''Hi {candidate_name}!\n\n{config["message"]} for "{job_title}" at {company_name}.\n\nStatus: {status.title()}\n\nJobBoard Team'''
     
@@ -362,44 +158,13 @@ def send_application_status_email(candidate_email, candidate_name, job_title, co
 def send_password_reset_email(email, otp, name="User"):
     """Send password reset OTP email"""
     subject = '🔑 Password Reset Request - JobBoard'
+    minutes = otp_valid_minutes()
     
-    html_message = f'''
-    <!DOCTYPE html>
-    <html>
-    <head><style>{get_email_base_style()}</style></head>
-    <body>
-        <div class="container">
-            <div class="header" style="background: linear-gradient(135deg, #e74c3c 0%, #c0392b 100%);">
-                <h1>🔑 Password Reset</h1>
-                <p>Reset your account password</p>
-            </div>
-            <div class="content">
-                <h2>Hi {name}! 👋</h2>
-                <p>We received a request to reset your password. Use the OTP below to reset your password:</p>
-                
-                <div class="otp-box">
-                    <p style="margin: 0; color: #666;">Your Reset Code</p>
-                    <p class="otp-code">{otp}</p>
-                </div>
-                
-                <div class="warning-box">
-                    ⚠️ <strong>Important:</strong> This OTP is valid for 10 minutes. If you didn't request this, please ignore this email.
-                </div>
-                
-                <p>For security reasons, never share this code with anyone.</p>
-            </div>
-            <div class="footer">
-                <p>If you didn't request a password reset, your account is safe.</p>
-                <p>© 2025 JobBoard. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    html_message = render_email('password-reset.html', {'name': name, 'otp': otp, 'valid_minutes': minutes})
     
-    plain_message = f'''Hi {name}!\n\nYour Password Reset OTP: {otp}\n\nThis OTP is valid for 10 minutes.\n\nIf you didn't request this, please ignore.\n\nJobBoard Team'''
+    plain_message = f'''Hi {name}!\n\nYour Password Reset OTP: {otp}\n\nThis OTP is valid for {minutes} minutes.\n\nIf you didn't request this, please ignore.\n\nJobBoard Team'''
     
-    return send_email(email, subject, html_message, plain_message)
+    return send_email(email, subject, html_message, plain_message, priority=EmailOutbox.PRIORITY_CRITICAL)
 
 
 # ============================================
@@ -440,119 +205,153 @@ def faq(request):
 
 def browse_jobs(request):
     """Browse all jobs with filters"""
-    jobs = Job.objects.filter(is_active=True)
+    query = JobQuery.from_params(request.GET)
+    compiled = query.compile()
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    location = request.GET.get('location', '')
-    job_type = request.GET.get('job_type', '')
-    experience = request.GET.get('experience', '')
+    # Repeat visits get a 304 until the listed jobs change (see conditional.py)
+    etag = conditional.make_etag('browse', request.get_full_path(), compiled.version(),
+                                 conditional.viewer(request))
+    response = conditional.not_modified(request, etag)
+    if response:
+        return response
     
-    # Apply filters
-    if search_query:
-        jobs = jobs.filter(
-            Q(title__icontains=search_query) |
-            Q(company_name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(skills_required__icontains=search_query)
-        )
-    
-    if location:
-        jobs = jobs.filter(location__icontains=location)
-    
-    if job_type:
-        jobs = jobs.filter(job_type=job_type)
-    
-    if experience:
-        jobs = jobs.filter(experience_required=experience)
+    facets = compiled.facets()
+    page, total_jobs = compiled.page(request)
     
     context = {
-        'jobs': jobs,
-        'search_query': search_query,
-        'location': location,
-        'job_type': job_type,
-        'experience': experience,
-        'total_jobs': jobs.count(),
+        'jobs': page.object_list,
+        'page': page,
+        'search_query': query.search,
+        'location': query.location,
+        'radius': query.radius,
+        'radius_choices': [10, 25, 50, 100],
+        'skills': request.GET.get('skills', ''),
+        'popular_skills': popular_skills(10),
+        'job_type': query.job_type,
+        'experience': query.experience,
+        'min_salary': request.GET.get('min_salary', '') if query.min_salary else '',
+        'currency': query.currency,
+        'currency_choices': Job.SALARY_CURRENCY_CHOICES,
+        'max_experience': query.max_experience,
+        'experience_year_choices': [0, 1, 2, 3, 5, 10],
+        'sort': query.sort,
+        'facets': facets,
+        'fuzzy': compiled.plan == 'fuzzy',
+        'corrected_search': compiled.corrected_search,
+        'total_jobs': total_jobs,
     }
-    return render(request, 'myapp/job-listings.html', context)
+    return conditional.set_validators(render(request, 'myapp/job-listings.html', context), etag)
 
 
 def search_jobs(request):
     """Search jobs from home page"""
-    title = request.GET.get('title', '')
-    region = request.GET.get('region', '')
-    job_type = request.GET.get('type', '')
-    
-    jobs = Job.objects.filter(is_active=True)
+    query = JobQuery.from_params(request.GET)
+    compiled = query.compile()
     
-    if title:
-        jobs = jobs.filter(
-            Q(title__icontains=title) |
-            Q(company_name__icontains=title) |
-            Q(description__icontains=title)
-        )
-    
-    if region:
-        jobs = jobs.filter(location__icontains=region)
+    etag = conditional.make_etag('search', request.get_full_path(), compiled.version(),
+                                 conditional.viewer(request))
+    response = conditional.not_modified(request, etag)
+    if response:
+        return response
     
-    if job_type:
-        jobs = jobs.filter(job_type__icontains=job_type)
+    page, total_jobs = compiled.page(request)
     
     context = {
-        'jobs': jobs,
-        'title': title,
-        'region': region,
-        'type': job_type,
-        'total_jobs': jobs.count(),
+        'jobs': page.object_list,
+        'page': page,
+        'title': query.search,
+        'region': query.location,
+        'type': query.job_type,
+        'sort': query.sort,
+        'fuzzy': compiled.plan == 'fuzzy',
+        'corrected_search': compiled.corrected_search,
+        'total_jobs': total_jobs,
     }
-    return render(request, 'myapp/search-results.html', context)
+    return conditional.set_validators(render(request, 'myapp/search-results.html', context), etag)
+
+
+@require_http_methods(["GET"])
+def suggest_api(request):
+    """Typeahead completions for job titles, companies and skills"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', 8)), suggest.MAX_SUGGESTIONS)
+    except ValueError:
+        limit = 8
+    
+    suggestions = suggest.suggest(query, limit) if query else []
+    return JsonResponse({'query': query, 'suggestions': suggestions})
+
+
+# Columns job_detail (and its similar jobs) render; the rest are in the cached body
+JOB_HEADER_FIELDS = ('id', 'title', 'company_name', 'location', 'job_type', 'company', 'updated_at')
+
+
+def get_job_body(job):
+    """job-body.html (description and summary) for ``job``, rendered once per version"""
+    key = f'job_body:{job.pk}:{job.updated_at.timestamp()}'
+    body = cache.get(key)
+    if body is None:
+        body = render_to_string('myapp/job-body.html', {'job': Job.objects.get(pk=job.pk)})
+        cache.set(key, body, getattr(settings, 'JOB_DETAIL_CACHE_TIMEOUT', 86400))
+    return mark_safe(body)
 
 
 def job_detail(request, job_id):
     """Job detail page"""
-    job = get_object_or_404(Job, id=job_id, is_active=True)
+    # The viewer's state comes with the job, in the same query
+    jobs = Job.objects.filter(is_active=True).only(*JOB_HEADER_FIELDS)
+    user = request.portal_user
+    profile = request.profile if user else None
+    if profile and user.role == 'candidate':
+        jobs = jobs.annotate(
+            has_applied=Exists(JobApplication.objects.filter(job=OuterRef('pk'), candidate_id=profile.pk)),
+            has_saved=Exists(SavedJob.objects.filter(job=OuterRef('pk'), candidate_id=profile.pk)),
+        )
+    job = get_object_or_404(jobs, id=job_id)
     
-    # Increment view count
-    job.views_count += 1
-    job.save()
+    # Buffered and flushed in the background (see counters.py)
+    record_view(job.pk)
     
-    # Initialize user state variables
-    has_applied = False
-    has_saved = False
-    is_owner = False
-    user_role = None
+    has_applied = getattr(job, 'has_applied', False)
+    has_saved = getattr(job, 'has_saved', False)
+    is_owner = bool(profile) and user.role == 'company' and job.company_id == profile.pk
+    user_role = user.role if user else None
+    if user and not profile:
+        logger.warning(f"User profile not found for session email: {request.session.get('email')}")
     
-    if request.session.get('email'):
-        try:
-            user = UserMaster.objects.get(email=request.session['email'])
-            user_role = user.role
-            
-            if user.role == 'candidate':
-                candidate = Candidate.objects.get(user_id=user)
-                has_applied = JobApplication.objects.filter(job=job, candidate=candidate).exists()
-                has_saved = SavedJob.objects.filter(job=job, candidate=candidate).exists()
-            elif user.role == 'company':
-                company = Company.objects.get(user_id=user)
-                is_owner = (job.company == company)
-        except (UserMaster.DoesNotExist, Candidate.DoesNotExist, Company.DoesNotExist):
-            logger.warning(f"User profile not found for session email: {request.session.get('email')}")
-            pass
+    # Similar jobs, precomputed by content (see similar.py); jobs without
+    # neighbours yet fall back to the same job type
+    similar_jobs = list(similar.similar_jobs(job, fields=JOB_HEADER_FIELDS))
+    if not similar_jobs:
+        similar_jobs = list(Job.objects.filter(
+            is_active=True,
+            job_type=job.job_type
+        ).exclude(id=job.id).only(*JOB_HEADER_FIELDS)[:3])
     
-    # Similar jobs
-    similar_jobs = Job.objects.filter(
-        is_active=True,
-        job_type=job.job_type
-    ).exclude(id=job.id)[:3]
+    # Unchanged pages get a 304 (see conditional.py). Last-Modified only
+    # covers the job itself, so it is left out for logged-in users, whose
+    # page also shows their application state.
+    etag = conditional.make_etag(
+        'job', job.pk, job.updated_at, [(other.pk, other.updated_at) for other in similar_jobs],
+        has_applied, has_saved, is_owner, conditional.viewer(request),
+    )
+    last_modified = None if user else job.updated_at
+    response = conditional.not_modified(request, etag, last_modified)
+    if response:
+        return response
     
     context = {
         'job': job,
+        'job_body': get_job_body(job),
         'similar_jobs': similar_jobs,
         'has_applied': has_applied,
         'has_saved': has_saved,
         'is_owner': is_owner,
         'user_role': user_role,
     }
-    return render(request, 'myapp/job-single.html', context)
+    response = render(request, 'myapp/job-single.html', context)
+    return conditional.set_validators(response, etag, last_modified)
 
 
 # ============================================
@@ -562,19 +361,21 @@ def job_detail(request, job_id):
 @require_http_methods(["GET", "POST"])
 def apply_job(request, job_id):
     """Apply for a job"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to apply for jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a candidate
         if user.role != 'candidate':
             messages.error(request, 'Only candidates can apply for jobs')
             return redirect('job_detail', job_id=job_id)
         
-        candidate = Candidate.objects.get(user_id=user)
+        candidate = request.profile
+        if not candidate:
+            messages.error(request, 'Candidate profile not found.')
+            return redirect('home')
         job = get_object_or_404(Job, id=job_id, is_active=True)
         
         # Check if already applied
@@ -592,6 +393,7 @@ def apply_job(request, job_id):
                 context = {'job': job}
                 return render(request, 'myapp/apply-job.html', context)
             
+            # Emails go to the outbox with the application, so both or neither are saved
             with transaction.atomic():
                 application = JobApplication.objects.create(
                     job=job,
@@ -600,29 +402,29 @@ def apply_job(request, job_id):
                     resume=resume,
                     status='pending'
                 )
-            
-            # Send email to candidate confirming application
-            send_application_received_email(
-                candidate.email,
-                candidate.first_name,
-                job.title,
-                job.company_name
-            )
-            
-            # Send email to employer about new application
-            if job.company:
-                try:
-                    employer = job.company
-                    employer_user = employer.user_id
-                    send_new_application_notification(
-                        employer_user.email,
-                        employer.firstname,
-                        f"{candidate.first_name} {candidate.last_name}",
-                        job.title,
-                        application.id
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to notify employer: {str(e)}")
+                
+                # Send email to candidate confirming application
+                send_application_received_email(
+                    candidate.email,
+                    candidate.first_name,
+                    job.title,
+                    job.company_name
+                )
+                
+                # Send email to employer about new application
+                if job.company:
+                    try:
+                        employer = job.company
+                        employer_user = employer.user_id
+                        send_new_application_notification(
+                            employer_user.email,
+                            employer.firstname,
+                            f"{candidate.first_name} {candidate.last_name}",
+                            job.title,
+                            application.id
+                        )
+                    except Exception as e:
+                        logger.error(f"Failed to notify employer: {str(e)}")
             
             messages.success(request, f'Application submitted successfully for {job.title}!')
             return redirect('my_applications')
@@ -634,12 +436,6 @@ def apply_job(request, job_id):
         }
         return render(request, 'myapp/apply-job.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Candidate.DoesNotExist:
-        messages.error(request, 'Candidate profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in apply_job: {str(e)}')
         messages.error(request, 'An error occurred while processing your application.')
@@ -648,19 +444,21 @@ def apply_job(request, job_id):
 
 def save_job(request, job_id):
     """Save/bookmark a job"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to save jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a candidate
         if user.role != 'candidate':
             messages.error(request, 'Only candidates can save jobs')
             return redirect('job_detail', job_id=job_id)
         
-        candidate = Candidate.objects.get(user_id=user)
+        candidate = request.profile
+        if not candidate:
+            messages.error(request, 'Candidate profile not found.')
+            return redirect('home')
         job = get_object_or_404(Job, id=job_id, is_active=True)
         
         saved_job, created = SavedJob.objects.get_or_create(candidate=candidate, job=job)
@@ -673,12 +471,6 @@ def save_job(request, job_id):
         
         return redirect('job_detail', job_id=job_id)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Candidate.DoesNotExist:
-        messages.error(request, 'Candidate profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in save_job: {str(e)}')
         messages.error(request, 'An error occurred while saving the job.')
@@ -687,30 +479,26 @@ def save_job(request, job_id):
 
 def my_applications(request):
     """View candidate's applications"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to view your applications')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a candidate
         if user.role != 'candidate':
             messages.error(request, 'Only candidates can view applications')
             return redirect('home')
         
-        candidate = Candidate.objects.get(user_id=user)
+        candidate = request.profile
+        if not candidate:
+            messages.error(request, 'Candidate profile not found.')
+            return redirect('home')
         applications = JobApplication.objects.filter(candidate=candidate).select_related('job', 'job__company')
         
         context = {'applications': applications}
         return render(request, 'myapp/my-applications.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Candidate.DoesNotExist:
-        messages.error(request, 'Candidate profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in my_applications: {str(e)}')
         messages.error(request, 'An error occurred while loading your applications.')
@@ -719,30 +507,26 @@ def my_applications(request):
 
 def saved_jobs_view(request):
     """View saved jobs"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to view saved jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a candidate
         if user.role != 'candidate':
             messages.error(request, 'Only candidates can view saved jobs')
             return redirect('home')
         
-        candidate = Candidate.objects.get(user_id=user)
+        candidate = request.profile
+        if not candidate:
+            messages.error(request, 'Candidate profile not found.')
+            return redirect('home')
         saved_jobs = SavedJob.objects.filter(candidate=candidate).select_related('job', 'job__company')
         
         context = {'saved_jobs': saved_jobs}
         return render(request, 'myapp/saved-jobs.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Candidate.DoesNotExist:
-        messages.error(request, 'Candidate profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in saved_jobs_view: {str(e)}')
         messages.error(request, 'An error occurred while loading saved jobs.')
@@ -756,17 +540,20 @@ def saved_jobs_view(request):
 @require_http_methods(["GET", "POST"])
 def post_job(request):
     """Post a new job (Employer only)"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to post jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
         if user.role != 'company':
             messages.error(request, 'Only employers can post jobs')
             return redirect('home')
         
-        company = Company.objects.get(user_id=user)
+        company = request.profile
+        if not company:
+            messages.error(request, 'Company profile not found.')
+            return redirect('home')
         
         if request.method == 'POST':
             # Validate required fields
@@ -838,12 +625,6 @@ def post_job(request):
         }
         return render(request, 'myapp/post_job.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Company.DoesNotExist:
-        messages.error(request, 'Company profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in post_job: {str(e)}')
         messages.error(request, 'An error occurred while posting the job.')
@@ -852,30 +633,26 @@ def post_job(request):
 
 def my_jobs(request):
     """View employer's posted jobs"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to view your jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a company
         if user.role != 'company':
             messages.error(request, 'Only employers can view posted jobs')
             return redirect('home')
         
-        company = Company.objects.get(user_id=user)
+        company = request.profile
+        if not company:
+            messages.error(request, 'Company profile not found.')
+            return redirect('home')
         jobs = Job.objects.filter(company=company).order_by('-created_at')
         
         context = {'jobs': jobs}
         return render(request, 'myapp/my-jobs.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Company.DoesNotExist:
-        messages.error(request, 'Company profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in my_jobs: {str(e)}')
         messages.error(request, 'An error occurred while loading your jobs.')
@@ -885,19 +662,21 @@ def my_jobs(request):
 @require_http_methods(["GET", "POST"])
 def edit_job(request, job_id):
     """Edit a job posting"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to edit jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a company
         if user.role != 'company':
             messages.error(request, 'Only employers can edit jobs')
             return redirect('home')
         
-        company = Company.objects.get(user_id=user)
+        company = request.profile
+        if not company:
+            messages.error(request, 'Company profile not found.')
+            return redirect('home')
         job = get_object_or_404(Job, id=job_id, company=company)
         
         if request.method == 'POST':
@@ -971,12 +750,6 @@ def edit_job(request, job_id):
         }
         return render(request, 'myapp/edit-job.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Company.DoesNotExist:
-        messages.error(request, 'Company profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in edit_job: {str(e)}')
         messages.error(request, 'An error occurred while editing the job.')
@@ -986,19 +759,21 @@ def edit_job(request, job_id):
 @require_http_methods(["POST"])
 def delete_job(request, job_id):
     """Delete a job posting"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to delete jobs')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a company
         if user.role != 'company':
             messages.error(request, 'Only employers can delete jobs')
             return redirect('home')
         
-        company = Company.objects.get(user_id=user)
+        company = request.profile
+        if not company:
+            messages.error(request, 'Company profile not found.')
+            return redirect('home')
         job = get_object_or_404(Job, id=job_id, company=company)
         
         job_title = job.title  # Store for success message
@@ -1009,12 +784,6 @@ def delete_job(request, job_id):
         messages.success(request, f'Job "{job_title}" deleted successfully!')
         return redirect('my_jobs')
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Company.DoesNotExist:
-        messages.error(request, 'Company profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in delete_job: {str(e)}')
         messages.error(request, 'An error occurred while deleting the job.')
@@ -1023,19 +792,21 @@ def delete_job(request, job_id):
 
 def job_applications(request, job_id):
     """View applications for a specific job (Employer)"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to view applications')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a company
         if user.role != 'company':
             messages.error(request, 'Only employers can view job applications')
             return redirect('home')
         
-        company = Company.objects.get(user_id=user)
+        company = request.profile
+        if not company:
+            messages.error(request, 'Company profile not found.')
+            return redirect('home')
         job = get_object_or_404(Job, id=job_id, company=company)
         applications = JobApplication.objects.filter(job=job).select_related('candidate').order_by('-applied_at')
         
@@ -1046,12 +817,6 @@ def job_applications(request, job_id):
         }
         return render(request, 'myapp/job-applications.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Company.DoesNotExist:
-        messages.error(request, 'Company profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in job_applications: {str(e)}')
         messages.error(request, 'An error occurred while loading applications.')
@@ -1061,19 +826,21 @@ def job_applications(request, job_id):
 @require_http_methods(["POST"])
 def update_application_status(request, application_id):
     """Update application status"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to update application status')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
         # Check if user is a company
         if user.role != 'company':
             messages.error(request, 'Only employers can update application status')
             return redirect('home')
         
-        company = Company.objects.get(user_id=user)
+        company = request.profile
+        if not company:
+            messages.error(request, 'Company profile not found.')
+            return redirect('home')
         application = get_object_or_404(JobApplication, id=application_id)
         
         # Verify that the job belongs to this company
@@ -1089,35 +856,29 @@ def update_application_status(request, application_id):
             messages.error(request, 'Invalid status selected')
             return redirect('job_applications', job_id=application.job.id)
         
-        # Update status
+        # Update status; the notification goes to the outbox in the same transaction
         with transaction.atomic():
             old_status = application.status
             application.status = new_status
             application.save()
-        
-        # Send email notification to candidate about status change
-        if old_status != new_status:
-            try:
-                candidate = application.candidate
-                send_application_status_email(
-                    candidate.email,
-                    candidate.first_name,
-                    application.job.title,
-                    application.job.company_name,
-                    new_status
-                )
-            except Exception as e:
-                logger.error(f"Failed to send status update email: {str(e)}")
+            
+            # Send email notification to candidate about status change
+            if old_status != new_status:
+                try:
+                    candidate = application.candidate
+                    send_application_status_email(
+                        candidate.email,
+                        candidate.first_name,
+                        application.job.title,
+                        application.job.company_name,
+                        new_status
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to send status update email: {str(e)}")
         
         messages.success(request, f'Application status updated to {new_status.title()}!')
         return redirect('job_applications', job_id=application.job.id)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except Company.DoesNotExist:
-        messages.error(request, 'Company profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in update_application_status: {str(e)}')
         messages.error(request, 'An error occurred while updating the application status.')
@@ -1260,13 +1021,12 @@ def RegisterUser(request):
 
             with transaction.atomic():
                 # Generate OTP
-                otp = randint(10000, 99999)
+                otp = otp_store.issue(email, otp_store.VERIFY)
                 
                 # Create user with hashed password (for future security improvement)
                 # Note: Currently storing plain text for compatibility
                 newuser = UserMaster.objects.create(
                     role=role, 
-                    otp=otp, 
                     email=email, 
                     password=password,  # TODO: Hash this password
                     is_active=True,
@@ -1297,22 +1057,22 @@ def RegisterUser(request):
                         address=''
                     )
 
-            # Send OTP via email (non-blocking)
-            try:
-                # Log OTP immediately for fallback
-                print(f"🔑 Registration OTP for {email}: {otp}")
-                logger.info(f"Registration OTP for {email}: {otp}")
-                
-                # Attempt email sending in background (won't block registration)
-                email_sent = send_otp_email(email, otp, fname)
-                
-                # Always show success message regardless of email status
-                messages.success(request, f"✅ Registration successful! Please check your email for OTP. If not received, the OTP is: {otp}")
-                
-            except Exception as e:
-                # Even if email completely fails, registration should succeed
-                logger.error(f"Email sending failed during registration: {str(e)}")
-                messages.success(request, f"✅ Registration successful! Email service unavailable. Your OTP is: {otp}")
+                # Send OTP via email, queued in the outbox with the new account
+                try:
+                    # Log OTP immediately for fallback
+                    print(f"🔑 Registration OTP for {email}: {otp}")
+                    logger.info(f"Registration OTP for {email}: {otp}")
+                    
+                    # Attempt email sending in background (won't block registration)
+                    email_sent = send_otp_email(email, otp, fname)
+                    
+                    # Always show success message regardless of email status
+                    messages.success(request, f"✅ Registration successful! Please check your email for OTP. If not received, the OTP is: {otp}")
+                    
+                except Exception as e:
+                    # Even if email completely fails, registration should succeed
+                    logger.error(f"Email sending failed during registration: {str(e)}")
+                    messages.success(request, f"✅ Registration successful! Email service unavailable. Your OTP is: {otp}")
             
             return render(request, 'myapp/otp.html', {"email": email})
             
@@ -1334,6 +1094,14 @@ def otp_page(request):
     return render(request, 'myapp/otp.html', {'email': email})
 
 
+# Why otp_store.check() turned a code down
+OTP_ERRORS = {
+    otp_store.INVALID: "❌ Invalid OTP. Please try again.",
+    otp_store.EXPIRED: "❌ This OTP has expired. Please request a new one.",
+    otp_store.LOCKED: "❌ Too many incorrect attempts. Please request a new OTP.",
+}
+
+
 @require_http_methods(["GET", "POST"])
 def verify_otp(request):
     if request.method == "POST":
@@ -1358,11 +1126,10 @@ def verify_otp(request):
                 msg = "✅ Account already verified. You can login now."
                 return render(request, 'myapp/login.html', {'msg': msg})
             
-            if str(user.otp) == str(otp_entered):
-                with transaction.atomic():
-                    user.is_verified = True
-                    user.otp = 0  # Clear OTP for security
-                    user.save()
+            result = otp_store.check(email, otp_store.VERIFY, otp_entered)
+            if result == otp_store.VALID:
+                user.is_verified = True
+                user.save(update_fields=['is_verified', 'is_updated'])
                 
                 # Send welcome email
                 try:
@@ -1382,7 +1149,7 @@ def verify_otp(request):
                 msg = "✅ OTP verified successfully! You can now login."
                 return render(request, 'myapp/login.html', {'msg': msg})
             else:
-                msg = "❌ Invalid OTP. Please try again."
+                msg = OTP_ERRORS[result]
                 return render(request, 'myapp/otp.html', {'msg': msg, 'email': email})
                 
         except UserMaster.DoesNotExist:
@@ -1421,11 +1188,7 @@ def resend_otp(request):
             return render(request, 'myapp/login.html', {'msg': msg})
         
         # Generate new OTP
-        new_otp = randint(10000, 99999)
-        
-        with transaction.atomic():
-            user.otp = new_otp
-            user.save()
+        new_otp = otp_store.issue(email, otp_store.VERIFY)
         
         # Get user's name for email
         name = "User"
@@ -1492,11 +1255,7 @@ def forgot_password(request):
             user = UserMaster.objects.get(email=email)
             
             # Generate OTP for password reset
-            otp = randint(10000, 99999)
-            
-            with transaction.atomic():
-                user.otp = otp
-                user.save()
+            otp = otp_store.issue(email, otp_store.RESET)
             
             # Get user's name
             name = "User"
@@ -1566,17 +1325,16 @@ def reset_password(request):
         try:
             user = UserMaster.objects.get(email=email)
             
-            if str(user.otp) == str(otp_entered):
-                with transaction.atomic():
-                    user.password = new_password  # TODO: Hash password in production
-                    user.otp = 0  # Clear OTP
-                    user.save()
+            result = otp_store.check(email, otp_store.RESET, otp_entered)
+            if result == otp_store.VALID:
+                user.password = new_password  # TODO: Hash password in production
+                user.save(update_fields=['password', 'is_updated'])
                 
                 messages.success(request, '✅ Password reset successful! You can now login.')
                 return redirect('login')
             else:
                 return render(request, 'myapp/reset-password.html', {
-                    'msg': '❌ Invalid OTP. Please try again.',
+                    'msg': OTP_ERRORS[result],
                     'email': email
                 })
                 
@@ -1608,11 +1366,7 @@ def resend_reset_otp(request):
         user = UserMaster.objects.get(email=email)
         
         # Generate new OTP
-        otp = randint(10000, 99999)
-        
-        with transaction.atomic():
-            user.otp = otp
-            user.save()
+        otp = otp_store.issue(email, otp_store.RESET)
         
         # Get user's name
         name = "User"
@@ -1647,38 +1401,26 @@ def resend_reset_otp(request):
 
 def profile_view(request):
     """View user profile"""
-    if not request.session.get('email'):
+    user = request.portal_user
+    if not user:
         messages.error(request, 'Please login to view your profile')
         return redirect('login')
     
     try:
-        user = UserMaster.objects.get(email=request.session['email'])
-        
-        if user.role == 'candidate':
-            candidate = Candidate.objects.get(user_id=user)
+        if user.role in ('candidate', 'company'):
+            if not request.profile:
+                messages.error(request, 'Profile not found.')
+                return redirect('home')
             context = {
                 'user': user, 
-                'profile': candidate, 
-                'role': 'candidate'
-            }
-        elif user.role == 'company':
-            company = Company.objects.get(user_id=user)
-            context = {
-                'user': user, 
-                'profile': company, 
-                'role': 'company'
+                'profile': request.profile, 
+                'role': user.role
             }
         else:
             context = {'user': user, 'role': 'unknown'}
         
         return render(request, 'myapp/profile.html', context)
         
-    except UserMaster.DoesNotExist:
-        messages.error(request, 'User not found. Please login again.')
-        return redirect('login')
-    except (Candidate.DoesNotExist, Company.DoesNotExist):
-        messages.error(request, 'Profile not found.')
-        return redirect('home')
     except Exception as e:
         logger.error(f'Error in profile_view: {str(e)}')
         messages.error(request, 'An error occurred while loading your profile.')
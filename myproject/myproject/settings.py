@@ -67,6 +67,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.middleware.PortalUserMiddleware',  # request.portal_user / request.profile
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -173,6 +174,90 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Create directories if they don't exist
 os.makedirs(os.path.join(BASE_DIR, 'media'), exist_ok=True)
 
+# Caches
+# Each is per process. 'default' holds small state (facet counts, the
+# cache generations read from the database, see myapp/caching.py).
+# 'job_results' keeps listing page results; LocMemCache expires entries
+# after TIMEOUT and culls least-recently-used ones beyond MAX_ENTRIES.
+# 'sessions' backs the session store (see SESSION_ENGINE below).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'jobportal-default',
+    },
+    'job_results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'jobportal-job-results',
+        'TIMEOUT': int(os.environ.get('JOB_RESULTS_CACHE_TIMEOUT', 120)),
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'jobportal-sessions',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Sessions
+# 'db' reads every session from the django_session table. 'cached_db'
+# reads sessions from the 'sessions' cache and only falls back to the
+# table on a miss; writes go to both. 'cache' skips the table entirely.
+# Both cache-backed engines need the 'sessions' cache to be shared by
+# every worker: with the per-process LocMemCache above, a login, logout
+# or flush handled by one gunicorn worker leaves the others serving the
+# old session, so a user can stay logged in after logging out. Setting
+# SESSION_CACHE_URL (redis://...) moves the 'sessions' cache to Redis and
+# makes 'cached_db' the default; without it the default stays 'db'.
+# Compare them with:
+# python manage.py bench_sessions
+SESSION_CACHE_URL = os.environ.get('SESSION_CACHE_URL')
+if SESSION_CACHE_URL:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SESSION_CACHE_URL,
+    }
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get(
+    'SESSION_BACKEND', 'cached_db' if SESSION_CACHE_URL else 'db')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Seconds a process trusts the cache generations it read from the database
+# before checking again, i.e. how long another worker's job edit can take
+# to reach this worker's caches and search indexes
+CACHE_GENERATION_TIMEOUT = 2
+
+# Job listings - keyset pagination
+JOB_LIST_PAGE_SIZE = int(os.environ.get('JOB_LIST_PAGE_SIZE', 20))
+JOB_LIST_MAX_PAGE_SIZE = 100
+
+# Filter counts on the listing page are cached per filter set (seconds)
+JOB_FACET_CACHE_TIMEOUT = 300
+
+# Searches with fewer exact matches than this also try typo-tolerant matching
+JOB_FUZZY_MIN_RESULTS = 3
+
+# In-process search indexes (see myapp/indexing.py) are rebuilt in a
+# background thread, serving the old one meanwhile, when this is on
+SEARCH_INDEX_BACKGROUND_REBUILD = True
+
+# Logged-in users and their profiles are cached per request lookup (seconds)
+PORTAL_USER_CACHE_TIMEOUT = 60
+
+# Rendered job descriptions, keyed by job and updated_at (seconds)
+JOB_DETAIL_CACHE_TIMEOUT = 86400
+
+# One-time codes (see myapp/otp.py): lifetime in seconds, and wrong
+# guesses allowed before a code has to be re-sent
+OTP_TTL_SECONDS = 600
+OTP_MAX_ATTEMPTS = 5
+
+# Job views are buffered in memory and added to views_count this often (seconds)
+JOB_VIEW_FLUSH_INTERVAL = 30
+
 # Gemini API Key
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', 'your-gemini-api-key-here')
 
@@ -193,4 +278,40 @@ if EMAIL_HOST_USER and EMAIL_HOST_PASSWORD and EMAIL_HOST_USER != 'your-email@gm
 else:
     print("⚠️ Email credentials not configured - emails may not be sent")
 if not EMAIL_HOST_USER:
-    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Background email workers (see myapp/mailer.py). Requests wait up to
+# EMAIL_QUEUE_TIMEOUT seconds for room in a full queue; a stopping worker
+# spends up to EMAIL_DRAIN_TIMEOUT seconds sending what is queued.
+# EMAIL_WORKERS = 0 sends synchronously. Each worker keeps its own SMTP
+# connection, closed after EMAIL_CONNECTION_IDLE_TIMEOUT idle seconds.
+EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS', 2))
+EMAIL_QUEUE_SIZE = 100
+EMAIL_QUEUE_TIMEOUT = 2
+EMAIL_DRAIN_TIMEOUT = 10
+EMAIL_CONNECTION_IDLE_TIMEOUT = 60
+
+# Emails are written to the EmailOutbox table first (see myapp/outbox.py).
+# Rows the workers above have not sent within EMAIL_OUTBOX_GRACE seconds
+# are sent by 'python manage.py send_outbox', which retries failures with
+# exponential backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS times.
+EMAIL_OUTBOX_GRACE = 120
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_BATCH_SIZE = 50
+
+# Outgoing email budget shared by all processes (see myapp/governor.py).
+# Mail over budget is deferred, and the last EMAIL_RATE_CRITICAL_RESERVE
+# tokens are kept for OTP and password reset emails. 0 disables a budget.
+EMAIL_RATE_PER_MINUTE = int(os.environ.get('EMAIL_RATE_PER_MINUTE', 20))
+EMAIL_RATE_PER_DAY = int(os.environ.get('EMAIL_RATE_PER_DAY', 450))
+EMAIL_RATE_CRITICAL_RESERVE = 5
+# A web worker over budget retries an email itself if the tokens are back
+# within this many seconds; longer waits are left to send_outbox
+EMAIL_RATE_MAX_DEFER = 60
+
+# Absolute links in emails sent outside a request (alert digests)
+SITE_URL = os.environ.get('SITE_URL') or (
+    f'https://{RENDER_EXTERNAL_HOSTNAME}' if RENDER_EXTERNAL_HOSTNAME else 'http://localhost:8000'
+)
+# Candidates whose digests are sent and checkpointed together (see myapp/digests.py)
+ALERT_DIGEST_BATCH_SIZE = 50